@@ -2,53 +2,182 @@
 Bizzer Agent - Main Agent for Bizzer Platform
 """
 
-from typing import Dict, Any, Optional, List
+import hashlib
+import json
+from typing import Dict, Any, Optional, List, Tuple, AsyncIterator
+from app.config import settings
 from app.agents.base_agent import BaseAgent
 from app.llm.llm_factory import LLMFactory
+from app.llm.prompt_budget import PromptAssembler
 from app.rag.retriever import RAGRetriever
 from app.memory.session_manager import SessionManager
 from app.memory.user_context import UserContextManager
+from app.memory.semantic_cache import get_semantic_cache
+from app.tracing import trace_span
+
+# User context fields in the system prompt besides language and solution
+_PROFILE_FIELDS = ("company", "industry", "company_size", "main_pain_point")
 
 
 class BizzerAgent(BaseAgent):
     """Main Bizzer Agent with RAG capabilities"""
 
-    def __init__(self):
+    def __init__(self, retriever: Optional[RAGRetriever] = None):
         self.llm = LLMFactory.get_client()
-        self.retriever = RAGRetriever()
+        self.retriever = retriever or RAGRetriever()
         self.session_manager = SessionManager()
         self.context_manager = UserContextManager()
+        self.semantic_cache = get_semantic_cache()
 
-    async def chat(
+    async def close(self):
+        """Close Redis connections held by the agent"""
+        await self.session_manager.close()
+        await self.context_manager.close()
+        response_cache = getattr(self.llm, "cache", None)
+        if response_cache is not None:
+            await response_cache.close()
+
+    async def _load_context(
         self,
         user_id: str,
         session_id: str,
-        message: str,
         user_context: Optional[Dict[str, Any]] = None,
-    ) -> str:
-        """Process a chat message and return a response"""
+    ) -> Tuple[Dict[str, Any], List[Dict]]:
+        """Get the user context and recent conversation history"""
         # Get or update user context
         if not user_context:
             user_context = await self.context_manager.get_context(user_id)
 
+        # Get conversation history
+        history = await self.session_manager.get_conversation_history(session_id)
+
+        # The prompt assembler trims history further to fit the token budget
+        return user_context or {}, history[-settings.prompt_max_history_messages:]
+
+    async def _build_prompt(
+        self,
+        message: str,
+        user_context: Dict[str, Any],
+        history: List[Dict],
+        query_embedding: Optional[List[float]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Retrieve relevant documents and assemble the prompt within the
+        model's token budget. Returns the keyword arguments for the LLM call.
+        """
         # Search relevant documents
-        relevant_docs = await self.retriever.search(message, top_k=3)
+        with trace_span("rag_search"):
+            relevant_docs = await self.retriever.search_partitioned(
+                message,
+                self._retrieval_partitions(user_context),
+                top_k=settings.prompt_max_documents,
+                query_embedding=query_embedding,
+            )
         doc_contents = [doc.get("content", "") for doc in relevant_docs]
 
-        # Build system prompt
-        system_prompt = self._build_system_prompt(user_context or {}, doc_contents)
+        assembler = PromptAssembler.for_model(self.llm.provider, self.llm.model)
+        assembled = assembler.assemble(
+            system_prompt=self._build_system_prompt(user_context, []),
+            message=message,
+            history=history,
+            documents=doc_contents,
+        )
+        if assembled.truncated:
+            print(f"Prompt truncated to fit {assembler.context_window} tokens: {assembled.truncated}")
 
-        # Get conversation history
-        history = await self.session_manager.get_conversation_history(session_id)
+        return {
+            "system_prompt": self._build_system_prompt(user_context, assembled.documents),
+            "system_prefix": self._build_static_prompt(user_context.get("preferred_language", "es")),
+            "conversation_history": assembled.history,
+            "max_tokens": assembled.max_output_tokens,
+        }
 
-        # Generate response
-        response = await self.llm.generate(
-            system_prompt=system_prompt,
-            user_message=message,
-            conversation_history=history[-10:],  # Last 10 messages
+    @staticmethod
+    def _retrieval_partitions(user_context: Dict[str, Any]) -> List[Optional[Dict]]:
+        """
+        Knowledge base partitions to search, narrowest first: the user's
+        language and recommended solution, their language, then everything
+        """
+        if not settings.rag_partitioned_search:
+            return [None]
+
+        language = user_context.get("preferred_language", "es")
+        solution = user_context.get("recommended_solution")
+        partitions: List[Optional[Dict]] = []
+        if solution:
+            partitions.append({"$and": [{"language": language}, {"solution": solution}]})
+        partitions.append({"language": language})
+        partitions.append(None)
+        return partitions
+
+    async def _semantic_lookup(
+        self,
+        message: str,
+        user_context: Dict[str, Any],
+        history: List[Dict],
+        llm_options: Dict[str, Any],
+    ) -> Tuple[Optional[str], Optional[List[float]]]:
+        """
+        Look up a cached answer for a near-duplicate first question.
+        Returns the cached answer (if any) and the message embedding.
+        """
+        if (
+            not settings.semantic_cache_enabled
+            or history
+            or not llm_options.get("use_cache", True)
+        ):
+            return None, None
+
+        try:
+            # Same embedding as retrieval, so the search can reuse it
+            embedding = await self.retriever.embeddings.embed_query(message)
+        except Exception as e:
+            print(f"Semantic cache embedding error: {e}")
+            return None, None
+        if not embedding:
+            return None, None
+
+        answer = self.semantic_cache.lookup(
+            embedding,
+            message,
+            language=user_context.get("preferred_language", "es"),
+            solution=user_context.get("recommended_solution"),
+            profile=self._profile_key(user_context),
         )
+        return answer, embedding
 
-        # Save to history
+    @staticmethod
+    def _profile_key(user_context: Dict[str, Any]) -> str:
+        """
+        Hash of the user context the system prompt is personalized with,
+        besides language and solution, so cached answers are only shared
+        between users with the same profile
+        """
+        profile = [user_context.get(field) for field in _PROFILE_FIELDS]
+        return hashlib.sha256(
+            json.dumps(profile, ensure_ascii=False, default=str).encode("utf-8")
+        ).hexdigest()
+
+    def _semantic_store(
+        self,
+        embedding: Optional[List[float]],
+        message: str,
+        response: str,
+        user_context: Dict[str, Any],
+    ):
+        """Cache an answer for future near-duplicate questions"""
+        if embedding:
+            self.semantic_cache.store(
+                embedding,
+                message,
+                response,
+                language=user_context.get("preferred_language", "es"),
+                solution=user_context.get("recommended_solution"),
+                profile=self._profile_key(user_context),
+            )
+
+    async def _save_exchange(self, session_id: str, message: str, response: str):
+        """Save a user message and the assistant response to history"""
         await self.session_manager.add_to_history(
             session_id,
             {"role": "user", "content": message},
@@ -58,38 +187,86 @@ class BizzerAgent(BaseAgent):
             {"role": "assistant", "content": response},
         )
 
+    async def chat(
+        self,
+        user_id: str,
+        session_id: str,
+        message: str,
+        user_context: Optional[Dict[str, Any]] = None,
+        **llm_options,
+    ) -> str:
+        """
+        Process a chat message and return a response.
+        llm_options are passed to the LLM client (e.g. use_cache=False, deadline).
+        """
+        user_context, history = await self._load_context(user_id, session_id, user_context)
+
+        # Reuse the answer to a near-duplicate question if there is one
+        cached, embedding = await self._semantic_lookup(
+            message, user_context, history, llm_options
+        )
+        if cached is not None:
+            await self._save_exchange(session_id, message, cached)
+            return cached
+
+        prompt = await self._build_prompt(message, user_context, history, embedding)
+
+        # Generate response
+        response = await self.llm.generate(
+            user_message=message,
+            **prompt,
+            **llm_options,
+        )
+
+        # Save to history
+        await self._save_exchange(session_id, message, response)
+        self._semantic_store(embedding, message, response, user_context)
+
         return response
 
-    def _build_system_prompt(
+    async def chat_stream(
         self,
-        user_context: Dict[str, Any],
-        relevant_docs: List[str],
-    ) -> str:
-        """Build the system prompt with user context and relevant documents"""
-        # Extract context values
-        company = user_context.get("company", "No especificada")
-        industry = user_context.get("industry", "No especificada")
-        company_size = user_context.get("company_size", "No especificado")
-        recommended_solution = user_context.get("recommended_solution", "Pendiente de diagnóstico")
-        main_pain_point = user_context.get("main_pain_point", "No identificado")
-        language = user_context.get("preferred_language", "es")
+        user_id: str,
+        session_id: str,
+        message: str,
+        user_context: Optional[Dict[str, Any]] = None,
+        **llm_options,
+    ) -> AsyncIterator[str]:
+        """Process a chat message and stream the response as text chunks"""
+        user_context, history = await self._load_context(user_id, session_id, user_context)
 
-        # Format relevant docs
-        docs_text = "\n\n".join(relevant_docs) if relevant_docs else "No hay documentación relevante disponible."
+        cached, embedding = await self._semantic_lookup(
+            message, user_context, history, llm_options
+        )
+        if cached is not None:
+            yield cached
+            await self._save_exchange(session_id, message, cached)
+            return
 
-        # Build prompt based on language
-        if language == "es":
-            prompt = f"""Eres el asistente virtual de Bizzer, especialista en soluciones tecnológicas de compliance y gobernanza corporativa.
+        prompt = await self._build_prompt(message, user_context, history, embedding)
 
-CONTEXTO DEL USUARIO:
-- Empresa: {company}
-- Industria: {industry}
-- Tamaño: {company_size}
-- Solución recomendada: {recommended_solution}
-- Pain point principal: {main_pain_point}
+        chunks = []
+        async for chunk in self.llm.generate_stream(
+            user_message=message,
+            **prompt,
+            **llm_options,
+        ):
+            chunks.append(chunk)
+            yield chunk
 
-DOCUMENTACIÓN RELEVANTE:
-{docs_text}
+        # Save to history once the stream has finished
+        response = "".join(chunks)
+        await self._save_exchange(session_id, message, response)
+        self._semantic_store(embedding, message, response, user_context)
+
+    def _build_static_prompt(self, language: str) -> str:
+        """
+        Build the static part of the system prompt (instructions and solutions).
+        It does not depend on the user or the retrieved documents, so it is
+        sent first as a stable, cacheable prefix.
+        """
+        if language == "es":
+            return """Eres el asistente virtual de Bizzer, especialista en soluciones tecnológicas de compliance y gobernanza corporativa.
 
 INSTRUCCIONES:
 1. Responde de forma profesional pero cercana
@@ -108,18 +285,8 @@ SOLUCIONES DISPONIBLES:
 - Data Room Prep: Para due diligence
 - Deal Visor: Para monitoreo de contratos
 - Smart Data Room: Para contratos delicados con firma digital"""
-        else:
-            prompt = f"""You are Bizzer's virtual assistant, specializing in corporate compliance and governance technology solutions.
 
-USER CONTEXT:
-- Company: {company}
-- Industry: {industry}
-- Size: {company_size}
-- Recommended solution: {recommended_solution}
-- Main pain point: {main_pain_point}
-
-RELEVANT DOCUMENTATION:
-{docs_text}
+        return """You are Bizzer's virtual assistant, specializing in corporate compliance and governance technology solutions.
 
 INSTRUCTIONS:
 1. Respond professionally but approachably
@@ -139,4 +306,46 @@ AVAILABLE SOLUTIONS:
 - Deal Visor: For contract monitoring
 - Smart Data Room: For sensitive contracts with digital signature"""
 
-        return prompt
+    def _build_system_prompt(
+        self,
+        user_context: Dict[str, Any],
+        relevant_docs: List[str],
+    ) -> str:
+        """
+        Build the system prompt with user context and relevant documents.
+        The static prefix comes first; per-user context and documents follow.
+        """
+        # Extract context values
+        company = user_context.get("company", "No especificada")
+        industry = user_context.get("industry", "No especificada")
+        company_size = user_context.get("company_size", "No especificado")
+        recommended_solution = user_context.get("recommended_solution", "Pendiente de diagnóstico")
+        main_pain_point = user_context.get("main_pain_point", "No identificado")
+        language = user_context.get("preferred_language", "es")
+
+        # Format relevant docs
+        docs_text = "\n\n".join(relevant_docs) if relevant_docs else "No hay documentación relevante disponible."
+
+        # Build prompt based on language
+        if language == "es":
+            context = f"""CONTEXTO DEL USUARIO:
+- Empresa: {company}
+- Industria: {industry}
+- Tamaño: {company_size}
+- Solución recomendada: {recommended_solution}
+- Pain point principal: {main_pain_point}
+
+DOCUMENTACIÓN RELEVANTE:
+{docs_text}"""
+        else:
+            context = f"""USER CONTEXT:
+- Company: {company}
+- Industry: {industry}
+- Size: {company_size}
+- Recommended solution: {recommended_solution}
+- Main pain point: {main_pain_point}
+
+RELEVANT DOCUMENTATION:
+{docs_text}"""
+
+        return f"{self._build_static_prompt(language)}\n\n{context}"
@@ -2,13 +2,15 @@
 API Dependencies for Bizzer Agents
 """
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import jwt
 from typing import Optional
 
 from app.config import settings
+from app.agents.bizzer_agent import BizzerAgent
 from app.memory.user_context import UserContextManager
+from app.rag.retriever import RAGRetriever
 
 security = HTTPBearer()
 
@@ -81,3 +83,17 @@ def get_optional_user(
         return str(payload.get("user_id"))
     except:
         return None
+
+
+def get_retriever(request: Request) -> RAGRetriever:
+    """
+    Application-scoped retriever created at startup
+    """
+    return request.app.state.retriever
+
+
+def get_agent(request: Request) -> BizzerAgent:
+    """
+    Application-scoped Bizzer agent created at startup
+    """
+    return request.app.state.agent
@@ -2,14 +2,21 @@
 Chat Routes for Bizzer Agents
 """
 
+import json
 import uuid
-from fastapi import APIRouter, Depends, HTTPException
+import httpx
+from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List
 
-from app.api.dependencies import get_current_user, get_user_context
+from app.config import settings
+from app.api.dependencies import get_current_user, get_user_context, get_agent
 from app.agents.bizzer_agent import BizzerAgent
-from app.memory.session_manager import SessionManager
+from app.llm.admission import LLMQueueFullError
+from app.llm.composite_client import LLMUnavailableError
+from app.llm.deadline import LLMDeadlineExceededError, deadline_after
+from app.tracing import get_current_trace
 from app.schemas.chat import ChatRequest, ChatResponse, ChatMessage
 
 router = APIRouter()
@@ -25,21 +32,30 @@ class ChatResponse(BaseModel):
     session_id: str
 
 
+def _use_cache(cache_control: Optional[str]) -> bool:
+    """Whether the request allows cached LLM responses"""
+    return "no-cache" not in (cache_control or "").lower()
+
+
 @router.post("/", response_model=ChatResponse)
 async def chat(
     request: ChatRequest,
     user_id: str = Depends(get_current_user),
     user_context: dict = Depends(get_user_context),
+    cache_control: Optional[str] = Header(None),
+    agent: BizzerAgent = Depends(get_agent),
 ):
     """
     Chat endpoint for communicating with Bizzer Agent
+
+    Send `Cache-Control: no-cache` to bypass the LLM response cache.
+    LLM work is bounded by `llm_request_timeout`; past it the request fails with 504.
     """
+    deadline = deadline_after(settings.llm_request_timeout)
+
     # Get or create session
     session_id = request.session_id or str(uuid.uuid4())
 
-    # Initialize agent
-    agent = BizzerAgent()
-
     # Generate response
     try:
         response = await agent.chat(
@@ -47,26 +63,100 @@ async def chat(
             session_id=session_id,
             message=request.message,
             user_context=user_context,
+            use_cache=_use_cache(cache_control),
+            deadline=deadline,
         )
 
         return ChatResponse(
             response=response,
             session_id=session_id,
         )
+    except LLMQueueFullError as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    except LLMUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except (LLMDeadlineExceededError, httpx.TimeoutException) as e:
+        raise HTTPException(status_code=504, detail=str(e) or "LLM request timed out")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _sse_event(data: dict, event: Optional[str] = None) -> str:
+    """Format a server-sent event"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+
+@router.post("/stream")
+async def chat_stream(
+    request: ChatRequest,
+    user_id: str = Depends(get_current_user),
+    user_context: dict = Depends(get_user_context),
+    cache_control: Optional[str] = Header(None),
+    agent: BizzerAgent = Depends(get_agent),
+):
+    """
+    Streaming chat endpoint (server-sent events)
+
+    Emits a `session` event, one `data` event per text chunk
+    and a final `done` (or `error`) event. `done` carries the request's
+    timing breakdown in milliseconds.
+    """
+    deadline = deadline_after(settings.llm_request_timeout)
+
+    # Get or create session
+    session_id = request.session_id or str(uuid.uuid4())
+
+    async def event_stream():
+        yield _sse_event({"session_id": session_id}, event="session")
+        try:
+            async for chunk in agent.chat_stream(
+                user_id=user_id,
+                session_id=session_id,
+                message=request.message,
+                user_context=user_context,
+                use_cache=_use_cache(cache_control),
+                deadline=deadline,
+            ):
+                yield _sse_event({"delta": chunk})
+            done = {"session_id": session_id}
+            trace = get_current_trace()
+            if trace is not None:
+                done["timing"] = {
+                    name: round(seconds * 1000, 1) for name, seconds in trace.totals().items()
+                }
+            yield _sse_event(done, event="done")
+        except LLMQueueFullError as e:
+            yield _sse_event(
+                {"detail": str(e), "retry_after": e.retry_after}, event="error"
+            )
+        except Exception as e:
+            yield _sse_event({"detail": str(e)}, event="error")
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # Disable nginx proxy buffering
+        },
+    )
+
+
 @router.get("/history/{session_id}")
 async def get_chat_history(
     session_id: str,
     user_id: str = Depends(get_current_user),
+    agent: BizzerAgent = Depends(get_agent),
 ):
     """
     Get chat history for a session
     """
-    session_manager = SessionManager()
-    history = await session_manager.get_conversation_history(session_id)
+    history = await agent.session_manager.get_conversation_history(session_id)
 
     return {
         "session_id": session_id,
@@ -78,11 +168,11 @@ async def get_chat_history(
 async def clear_chat_history(
     session_id: str,
     user_id: str = Depends(get_current_user),
+    agent: BizzerAgent = Depends(get_agent),
 ):
     """
     Clear chat history for a session
     """
-    session_manager = SessionManager()
-    await session_manager.clear_history(session_id)
+    await agent.session_manager.clear_history(session_id)
 
     return {"status": "cleared"}
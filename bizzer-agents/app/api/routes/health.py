@@ -2,8 +2,11 @@
 Health Check Routes
 """
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Request, Response
+from fastapi.responses import JSONResponse
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
 from app.config import settings
+from app.llm.warmup import warmup_required, ensure_model_loaded
 
 router = APIRouter()
 
@@ -19,9 +22,21 @@ async def health_check():
 
 
 @router.get("/ready")
-async def readiness_check():
+async def readiness_check(request: Request):
     """Readiness check endpoint"""
     # Add checks for dependencies (Redis, DB, etc.)
-    return {
-        "status": "ready",
-    }
+    llm_ready = getattr(request.app.state, "llm_ready", None)
+    if llm_ready is not None and not llm_ready.is_set():
+        return JSONResponse(status_code=503, content={"status": "warming_up"})
+
+    result = {"status": "ready"}
+    if warmup_required():
+        # Re-warm in the background if Ollama unloaded the model
+        result["model_loaded"] = await ensure_model_loaded()
+    return result
+
+
+@router.get("/metrics")
+async def metrics():
+    """Prometheus metrics endpoint"""
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
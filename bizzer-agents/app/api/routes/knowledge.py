@@ -2,13 +2,14 @@
 Knowledge Base Routes for Bizzer Agents
 """
 
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends, Header
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Dict, Any
 
-from app.api.dependencies import get_current_user
+from app.api.dependencies import get_current_user, get_retriever
+from app.config import settings
 from app.rag.document_processor import DocumentProcessor
-from app.rag.retriever import RAGRetriever
+from app.rag.retriever import RAGRetriever, SEARCH_MODES
 
 router = APIRouter()
 
@@ -29,13 +30,29 @@ class SearchResponse(BaseModel):
     query: str
 
 
+class BatchSearchQuery(BaseModel):
+    query: str
+    top_k: int = 5
+    filter: Optional[Dict[str, Any]] = None
+
+
+class BatchSearchRequest(BaseModel):
+    queries: List[BatchSearchQuery]
+    mode: Optional[str] = None
+
+
 @router.post("/upload")
 async def upload_document(
     file: UploadFile = File(...),
+    language: Optional[str] = Form(None),
+    solution: Optional[str] = Form(None),
     user_id: str = Depends(get_current_user),
+    retriever: RAGRetriever = Depends(get_retriever),
 ):
     """
     Upload a document to the knowledge base
+    language (es, en) is detected from the text when omitted; solution tags
+    the document for users with that recommended solution.
     """
     # Validate file type
     allowed_types = [
@@ -51,8 +68,10 @@ async def upload_document(
         )
 
     try:
-        processor = DocumentProcessor()
-        result = await processor.process_file(file)
+        processor = DocumentProcessor(retriever=retriever)
+        result = await processor.process_file(
+            file, metadata={"language": language, "solution": solution}
+        )
 
         return {
             "status": "success",
@@ -67,13 +86,30 @@ async def upload_document(
 async def search_knowledge(
     query: str,
     top_k: int = 5,
+    mode: Optional[str] = None,
+    cache_control: Optional[str] = Header(None),
     user_id: str = Depends(get_current_user),
+    retriever: RAGRetriever = Depends(get_retriever),
 ):
     """
     Search the knowledge base
+    mode: vector, lexical or hybrid (defaults to RAG_SEARCH_MODE)
+    score is the cosine similarity in vector mode, the BM25 score in
+    lexical mode and the rank-fusion score (1.0 at best) in hybrid mode.
+    Send `Cache-Control: no-cache` to bypass the retrieval result cache.
     """
-    retriever = RAGRetriever()
-    results = await retriever.search(query, top_k=top_k)
+    if mode is not None and mode not in SEARCH_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported search mode: {mode}"
+        )
+
+    results = await retriever.search(
+        query,
+        top_k=top_k,
+        mode=mode,
+        use_cache="no-cache" not in (cache_control or "").lower(),
+    )
 
     return {
         "query": query,
@@ -88,14 +124,63 @@ async def search_knowledge(
     }
 
 
+@router.post("/search/batch")
+async def search_knowledge_batch(
+    request: BatchSearchRequest,
+    cache_control: Optional[str] = Header(None),
+    user_id: str = Depends(get_current_user),
+    retriever: RAGRetriever = Depends(get_retriever),
+):
+    """
+    Search the knowledge base for many queries at once
+    Each query has its own top_k and metadata filter (Chroma `where` syntax).
+    Results are returned in query order.
+    """
+    if len(request.queries) > settings.knowledge_batch_max_queries:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.knowledge_batch_max_queries} queries per batch"
+        )
+    if request.mode is not None and request.mode not in SEARCH_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported search mode: {request.mode}"
+        )
+    if any(q.top_k < 1 for q in request.queries):
+        raise HTTPException(status_code=400, detail="top_k must be at least 1")
+
+    batch = await retriever.search_batch(
+        [q.model_dump() for q in request.queries],
+        mode=request.mode,
+        use_cache="no-cache" not in (cache_control or "").lower(),
+    )
+
+    return {
+        "results": [
+            {
+                "query": q.query,
+                "results": [
+                    {
+                        "content": r.get("content", ""),
+                        "metadata": r.get("metadata", {}),
+                        "score": r.get("score", 0.0),
+                    }
+                    for r in results
+                ],
+            }
+            for q, results in zip(request.queries, batch)
+        ],
+    }
+
+
 @router.get("/stats")
 async def knowledge_stats(
     user_id: str = Depends(get_current_user),
+    retriever: RAGRetriever = Depends(get_retriever),
 ):
     """
     Get knowledge base statistics
     """
-    retriever = RAGRetriever()
     stats = await retriever.get_stats()
 
     return stats
@@ -4,6 +4,7 @@ Configuration for Bizzer Agents
 
 import os
 from enum import Enum
+from typing import Optional
 from pydantic_settings import BaseSettings
 from functools import lru_cache
 
@@ -12,6 +13,7 @@ class LLMProvider(str, Enum):
     OLLAMA = "ollama"
     CLAUDE = "claude"
     OPENAI = "openai"
+    FAKE = "fake"  # In-process stand-in for offline testing
 
 
 class Settings(BaseSettings):
@@ -25,18 +27,118 @@ class Settings(BaseSettings):
     # Ollama (default - free)
     ollama_base_url: str = "http://ollama:11434"
     ollama_model: str = "gemma2:2b"
+    ollama_keep_alive: str = "30m"
+    ollama_num_ctx: Optional[int] = 4096
+    ollama_num_predict: Optional[int] = None
+    ollama_num_thread: Optional[int] = None
+    ollama_warmup_enabled: bool = True
 
     # Claude (paid)
     anthropic_api_key: str = ""
+    anthropic_base_url: str = "https://api.anthropic.com/v1"
     claude_model: str = "claude-sonnet-4-20250514"
 
     # OpenAI (paid)
     openai_api_key: str = ""
+    openai_base_url: str = "https://api.openai.com/v1"
     openai_model: str = "gpt-4o-mini"
 
+    # LLM response cache (exact match, Redis)
+    llm_cache_enabled: bool = True
+    llm_cache_ttl: int = 3600
+    llm_cache_max_entries: int = 10000
+
+    # Semantic answer cache (near-duplicate first questions)
+    semantic_cache_enabled: bool = True
+    semantic_cache_threshold: float = 0.92
+    semantic_cache_max_entries: int = 2000
+    semantic_cache_ttl: int = 86400
+    semantic_cache_sample_rate: float = 0.05
+
+    # Embeddings
+    embedding_provider: str = "local"  # local (in-process CPU), ollama, openai
+    embedding_batch_size: int = 64
+    embedding_max_concurrency: int = 4
+    ollama_embedding_model: str = "nomic-embed-text"
+
+    # Persistent embedding cache (model + content hash)
+    embedding_cache_enabled: bool = True
+    embedding_cache_path: str = "/app/data/embedding_cache.db"
+    embedding_cache_max_entries: int = 200000
+
+    # Fallback chain (comma-separated providers tried after llm_provider)
+    llm_fallback_providers: str = ""
+    llm_hedging_enabled: bool = False
+    llm_hedge_delay: float = 0.0  # seconds; 0 uses the provider's observed p95
+
+    # Circuit breaker (per provider)
+    circuit_breaker_window: int = 20
+    circuit_breaker_min_calls: int = 10
+    circuit_breaker_error_rate: float = 0.5
+    circuit_breaker_slow_call_seconds: float = 30.0
+    circuit_breaker_slow_call_rate: float = 0.8
+    circuit_breaker_open_seconds: float = 30.0
+
+    # Deadlines and retries
+    llm_request_timeout: float = 60.0  # total LLM budget for one chat request
+    llm_max_retries: int = 2
+    llm_retry_base_delay: float = 0.5
+    llm_retry_max_delay: float = 8.0
+    llm_retry_min_attempt_seconds: float = 1.0  # assumed attempt time before any is measured
+
+    # Fake provider (offline testing)
+    fake_llm_latency: float = 0.05
+    fake_llm_failure_rate: float = 0.0
+
+    # Prompt budget
+    llm_max_output_tokens: int = 1024
+    prompt_max_history_messages: int = 20
+    prompt_max_documents: int = 5
+
+    # HTTP connection pool (shared per LLM provider)
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry: float = 30.0
+
     # Vector DB
-    vector_db_type: str = "chroma"
+    vector_db_type: str = "chroma"  # chroma, numpy (in-process, under ~100k chunks)
     chroma_persist_dir: str = "/app/data/chroma"
+    numpy_index_dir: str = "/app/data/vectors"
+    rag_query_threads: int = 4  # live searches and query embeddings
+    rag_ingest_threads: int = 2  # uploads and bulk embeddings
+
+    # Retrieval
+    # vector, lexical, hybrid (both, rank-fused). Result scores follow the
+    # mode: cosine similarity, BM25, or RRF normalized to 1.0 at best
+    rag_search_mode: str = "vector"
+    rag_hybrid_candidates: int = 20  # taken from each list before fusion
+    rag_rrf_k: int = 60
+    lexical_index_dir: str = "/app/data/lexical"
+    lexical_save_changes: int = 1000  # saved once this many documents changed...
+    lexical_save_interval: int = 300  # ...or seconds passed since the last save, and at shutdown
+    rag_merge_adjacent_chunks: bool = True  # join overlapping chunks of one file
+    rag_mmr_enabled: bool = False
+    rag_mmr_lambda: float = 0.7  # 1.0 is pure relevance, lower favours diversity
+    rag_candidate_multiplier: int = 2  # results retrieved per result kept, for merging and MMR
+    # Agent searches the user's language/solution partition, widening when
+    # it has fewer results than this
+    rag_partitioned_search: bool = True
+    rag_partition_min_results: int = 3
+    rag_partition_cache_ttl: int = 60  # seconds partition ids are reused for lexical search
+    knowledge_batch_max_queries: int = 500  # per POST /knowledge/search/batch
+
+    # Reranking (candidates rescored before the top k is taken)
+    reranker: str = ""  # off, lexical, cross-encoder (needs sentence-transformers)
+    rerank_model: str = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+    rerank_candidates: int = 20
+    rerank_budget_ms: float = 50.0
+    rerank_batch_budget_ms: float = 1000.0  # shared by all queries of a batch search
+
+    # Retrieval result cache (invalidated whenever documents change)
+    retrieval_cache_enabled: bool = True
+    retrieval_cache_shared: bool = True  # share results and version across workers via Redis
+    retrieval_cache_max_entries: int = 2000
+    retrieval_cache_ttl: int = 86400
 
     # Redis
     redis_url: str = "redis://redis:6379/1"
@@ -55,6 +157,14 @@ class Settings(BaseSettings):
     rate_limit_requests: int = 100
     rate_limit_window: int = 60
 
+    # LLM admission control (per-provider concurrency and wait queue)
+    llm_max_concurrency: int = 4
+    ollama_max_concurrency: int = 2
+    claude_max_concurrency: int = 16
+    openai_max_concurrency: int = 16
+    llm_max_queue_size: int = 20
+    llm_queue_timeout: float = 30.0
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -0,0 +1,208 @@
+"""
+Admission Control for LLM calls
+"""
+
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import List, Dict, Optional, AsyncIterator
+
+from app.config import settings
+from app.llm.llm_factory import BaseLLMClient
+from app.llm.deadline import LLMDeadlineExceededError, time_left
+from app.metrics import (
+    LLM_QUEUE_DEPTH,
+    LLM_ACTIVE_CALLS,
+    LLM_QUEUE_WAIT_SECONDS,
+    LLM_ADMISSION_REJECTED,
+)
+from app.tracing import record_span
+
+
+class LLMQueueFullError(Exception):
+    """Raised when an LLM call cannot be admitted"""
+
+    def __init__(self, provider: str, retry_after: int):
+        self.provider = provider
+        self.retry_after = retry_after
+        super().__init__(
+            f"{provider} is at capacity, retry after {retry_after}s"
+        )
+
+
+class AdmissionController:
+    """
+    Limits concurrent calls to one provider.
+    Calls beyond the limit wait in a bounded queue; when the queue is full,
+    or a call waits longer than the queue timeout, it is rejected.
+    """
+
+    def __init__(
+        self,
+        provider: str,
+        max_concurrency: int,
+        max_queue_size: int,
+        queue_timeout: float,
+    ):
+        self.provider = provider
+        self.max_concurrency = max_concurrency
+        self.max_queue_size = max_queue_size
+        self.queue_timeout = queue_timeout
+        self.waiting = 0
+        self.active = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._avg_call_seconds = 5.0
+
+    def retry_after(self) -> int:
+        """Estimate how long until a queued call would be admitted"""
+        backlog = (self.waiting + 1) / self.max_concurrency
+        return max(1, math.ceil(backlog * self._avg_call_seconds))
+
+    def _reject(self, reason: str):
+        LLM_ADMISSION_REJECTED.labels(provider=self.provider, reason=reason).inc()
+        raise LLMQueueFullError(self.provider, self.retry_after())
+
+    def _release_if_acquired(self, acquire: asyncio.Future):
+        if not acquire.cancelled() and acquire.exception() is None:
+            self._semaphore.release()
+
+    async def _acquire(self, timeout: float):
+        """
+        Wait up to timeout for a slot. The acquire is shielded from the
+        timeout, so a permit granted just as the wait ends (timeout or
+        cancellation) is given back instead of lost.
+        """
+        acquire = asyncio.ensure_future(self._semaphore.acquire())
+        try:
+            await asyncio.wait_for(asyncio.shield(acquire), timeout=timeout)
+        except BaseException:
+            if acquire.done():
+                self._release_if_acquired(acquire)
+            else:
+                acquire.cancel()
+                acquire.add_done_callback(self._release_if_acquired)
+            raise
+
+    @asynccontextmanager
+    async def slot(self, deadline: Optional[float] = None):
+        """
+        Hold a concurrency slot for the duration of one call.
+        The wait for a slot ends at the queue timeout or the call's deadline,
+        whichever comes first.
+        """
+        if self.waiting + self.active >= self.max_concurrency + self.max_queue_size:
+            self._reject("queue_full")
+
+        timeout = self.queue_timeout
+        left = time_left(deadline)
+        deadline_bound = left is not None and left < timeout
+        if deadline_bound:
+            if left <= 0:
+                raise LLMDeadlineExceededError("Request deadline exceeded before the LLM call")
+            timeout = left
+
+        self.waiting += 1
+        LLM_QUEUE_DEPTH.labels(provider=self.provider).set(self.waiting)
+        started = time.perf_counter()
+        try:
+            if self._semaphore.locked():
+                await self._acquire(timeout)
+            else:
+                await self._semaphore.acquire()
+        except asyncio.TimeoutError:
+            if deadline_bound:
+                LLM_ADMISSION_REJECTED.labels(provider=self.provider, reason="deadline").inc()
+                raise LLMDeadlineExceededError("Request deadline exceeded waiting for an LLM slot")
+            self._reject("queue_timeout")
+        finally:
+            self.waiting -= 1
+            waited = time.perf_counter() - started
+            LLM_QUEUE_DEPTH.labels(provider=self.provider).set(self.waiting)
+            LLM_QUEUE_WAIT_SECONDS.labels(provider=self.provider).observe(waited)
+            record_span("llm_queue", waited, provider=self.provider)
+
+        self.active += 1
+        LLM_ACTIVE_CALLS.labels(provider=self.provider).set(self.active)
+        call_started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.active -= 1
+            LLM_ACTIVE_CALLS.labels(provider=self.provider).set(self.active)
+            self._semaphore.release()
+            # Moving average of call time, used for Retry-After
+            elapsed = time.perf_counter() - call_started
+            self._avg_call_seconds = 0.8 * self._avg_call_seconds + 0.2 * elapsed
+
+
+_controllers: Dict[str, AdmissionController] = {}
+
+
+def get_admission_controller(provider: str) -> AdmissionController:
+    """Get the process-wide admission controller for a provider"""
+    controller = _controllers.get(provider)
+    if controller is None:
+        controller = AdmissionController(
+            provider=provider,
+            max_concurrency=getattr(
+                settings, f"{provider}_max_concurrency", settings.llm_max_concurrency
+            ),
+            max_queue_size=settings.llm_max_queue_size,
+            queue_timeout=settings.llm_queue_timeout,
+        )
+        _controllers[provider] = controller
+    return controller
+
+
+class AdmissionControlledClient(BaseLLMClient):
+    """Wraps an LLM client so every call goes through its provider's admission controller"""
+
+    def __init__(self, client: BaseLLMClient):
+        self.client = client
+        self.controller = get_admission_controller(client.provider)
+
+    @property
+    def provider(self) -> str:
+        return self.client.provider
+
+    @property
+    def model(self) -> str:
+        return getattr(self.client, "model", "")
+
+    def __getattr__(self, name: str):
+        return getattr(self.client, name)
+
+    async def generate(
+        self,
+        system_prompt: str,
+        user_message: str,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        **kwargs,
+    ) -> str:
+        async with self.controller.slot(kwargs.get("deadline")):
+            return await self.client.generate(
+                system_prompt, user_message, conversation_history, **kwargs
+            )
+
+    async def generate_stream(
+        self,
+        system_prompt: str,
+        user_message: str,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        **kwargs,
+    ) -> AsyncIterator[str]:
+        # The slot is held until the stream is fully consumed
+        async with self.controller.slot(kwargs.get("deadline")):
+            async for chunk in self.client.generate_stream(
+                system_prompt, user_message, conversation_history, **kwargs
+            ):
+                yield chunk
+
+    async def embed(self, text: str) -> List[float]:
+        async with self.controller.slot():
+            return await self.client.embed(text)
+
+    async def embed_many(self, texts: List[str], **kwargs) -> List[List[float]]:
+        async with self.controller.slot():
+            return await self.client.embed_many(texts, **kwargs)
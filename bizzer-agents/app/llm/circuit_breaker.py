@@ -0,0 +1,134 @@
+"""
+Circuit Breaker for LLM providers
+"""
+
+import time
+from collections import deque
+from typing import Dict, Optional
+
+from app.config import settings
+from app.metrics import LLM_CIRCUIT_STATE
+
+
+class CircuitBreaker:
+    """
+    Tracks recent call outcomes for one provider.
+    The circuit opens when the error rate or the slow-call rate over the
+    rolling window crosses its threshold. After a cool-down one trial call
+    is let through (half-open); its outcome closes or re-opens the circuit.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        provider: str,
+        window_size: int,
+        min_calls: int,
+        error_rate_threshold: float,
+        slow_call_seconds: float,
+        slow_call_rate_threshold: float,
+        open_seconds: float,
+    ):
+        self.provider = provider
+        self.min_calls = min_calls
+        self.error_rate_threshold = error_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.open_seconds = open_seconds
+
+        self.state = self.CLOSED
+        self._outcomes: deque = deque(maxlen=window_size)  # (ok, seconds)
+        self._latencies: deque = deque(maxlen=window_size)  # successful calls only
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._set_state(self.CLOSED)
+
+    def _set_state(self, state: str):
+        self.state = state
+        for value in (self.CLOSED, self.OPEN, self.HALF_OPEN):
+            LLM_CIRCUIT_STATE.labels(provider=self.provider, state=value).set(
+                1 if value == state else 0
+            )
+
+    def allow(self) -> bool:
+        """Whether a call may be sent to the provider now"""
+        if self.state == self.OPEN:
+            if time.monotonic() - self._opened_at < self.open_seconds:
+                return False
+            self._set_state(self.HALF_OPEN)
+            self._trial_in_flight = False
+
+        if self.state == self.HALF_OPEN:
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+
+        return True
+
+    def record_success(self, seconds: float):
+        self._latencies.append(seconds)
+        if self.state == self.HALF_OPEN:
+            self._outcomes.clear()
+            self._trial_in_flight = False
+            self._set_state(self.CLOSED)
+        self._outcomes.append((True, seconds))
+        self._evaluate()
+
+    def record_failure(self, seconds: float = 0.0):
+        if self.state == self.HALF_OPEN:
+            self._trip()
+            return
+        self._outcomes.append((False, seconds))
+        self._evaluate()
+
+    def release_trial(self):
+        """Give back a half-open trial that ended without an outcome"""
+        self._trial_in_flight = False
+
+    def _evaluate(self):
+        if self.state != self.CLOSED or len(self._outcomes) < self.min_calls:
+            return
+        total = len(self._outcomes)
+        errors = sum(1 for ok, _ in self._outcomes if not ok)
+        slow = sum(1 for ok, seconds in self._outcomes if ok and seconds > self.slow_call_seconds)
+        if (
+            errors / total >= self.error_rate_threshold
+            or slow / total >= self.slow_call_rate_threshold
+        ):
+            self._trip()
+
+    def _trip(self):
+        self._opened_at = time.monotonic()
+        self._trial_in_flight = False
+        self._set_state(self.OPEN)
+
+    def latency_quantile(self, quantile: float) -> Optional[float]:
+        """Latency quantile of recent successful calls, once enough are recorded"""
+        if len(self._latencies) < self.min_calls:
+            return None
+        ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(quantile * len(ordered)))
+        return ordered[index]
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_circuit_breaker(provider: str) -> CircuitBreaker:
+    """Get the process-wide circuit breaker for a provider"""
+    breaker = _breakers.get(provider)
+    if breaker is None:
+        breaker = CircuitBreaker(
+            provider=provider,
+            window_size=settings.circuit_breaker_window,
+            min_calls=settings.circuit_breaker_min_calls,
+            error_rate_threshold=settings.circuit_breaker_error_rate,
+            slow_call_seconds=settings.circuit_breaker_slow_call_seconds,
+            slow_call_rate_threshold=settings.circuit_breaker_slow_call_rate,
+            open_seconds=settings.circuit_breaker_open_seconds,
+        )
+        _breakers[provider] = breaker
+    return breaker
@@ -2,29 +2,52 @@
 Claude Client for Bizzer Agents
 """
 
+import json
 import httpx
-from typing import List, Dict, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator
+from app.config import settings
 from app.llm.llm_factory import BaseLLMClient
+from app.llm.http_pool import get_http_client
+from app.llm.deadline import request_timeout
+from app.llm.instrumentation import LLMCallTracker, track_llm_call
+from app.metrics import LLM_PROMPT_CACHE_TOKENS
 
 
 class ClaudeClient(BaseLLMClient):
     """Client for Anthropic Claude API"""
 
-    def __init__(self, api_key: str, model: str):
+    provider = "claude"
+
+    def __init__(self, api_key: str, model: str, base_url: str = "https://api.anthropic.com/v1"):
         self.api_key = api_key
         self.model = model
-        self.base_url = "https://api.anthropic.com/v1"
+        self.base_url = base_url.rstrip("/")
         self.timeout = 120.0
 
-    async def generate(
+    @property
+    def http(self) -> httpx.AsyncClient:
+        """Shared pooled HTTP client"""
+        return get_http_client("claude")
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        """Request headers for the Messages API"""
+        return {
+            "x-api-key": self.api_key,
+            "anthropic-version": "2023-06-01",
+            "content-type": "application/json",
+        }
+
+    def _build_payload(
         self,
         system_prompt: str,
         user_message: str,
         conversation_history: Optional[List[Dict[str, str]]] = None,
-        **kwargs,
-    ) -> str:
-        """Generate a response using Claude"""
-        # Build messages
+        stream: bool = False,
+        max_tokens: Optional[int] = None,
+        system_prefix: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Build the Messages API request body"""
         messages = []
 
         # Add conversation history
@@ -34,30 +57,128 @@ class ClaudeClient(BaseLLMClient):
         # Add current message
         messages.append({"role": "user", "content": user_message})
 
-        # Make request
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.post(
+        payload = {
+            "model": self.model,
+            "max_tokens": max_tokens or settings.llm_max_output_tokens,
+            "system": self._build_system(system_prompt, system_prefix),
+            "messages": messages,
+        }
+        if stream:
+            payload["stream"] = True
+        return payload
+
+    @staticmethod
+    def _build_system(
+        system_prompt: str,
+        system_prefix: Optional[str] = None,
+    ) -> Any:
+        """
+        Build the system parameter. When the prompt starts with a stable
+        prefix, the prefix is sent as its own block marked for prompt caching.
+        """
+        if not system_prefix or not system_prompt.startswith(system_prefix):
+            return system_prompt
+
+        blocks = [{
+            "type": "text",
+            "text": system_prefix,
+            "cache_control": {"type": "ephemeral"},
+        }]
+        rest = system_prompt[len(system_prefix):].strip()
+        if rest:
+            blocks.append({"type": "text", "text": rest})
+        return blocks
+
+    def _record_usage(self, call: LLMCallTracker, usage: Dict[str, Any]):
+        """Report token counts and prompt cache reads and writes from a usage block"""
+        cache_read = usage.get("cache_read_input_tokens") or 0
+        cache_write = usage.get("cache_creation_input_tokens") or 0
+        input_tokens = usage.get("input_tokens")
+        call.record_usage(
+            prompt_tokens=input_tokens + cache_read + cache_write if input_tokens is not None else None,
+            completion_tokens=usage.get("output_tokens") or None,
+        )
+        if cache_read:
+            LLM_PROMPT_CACHE_TOKENS.labels(provider="claude", kind="read").inc(cache_read)
+        if cache_write:
+            LLM_PROMPT_CACHE_TOKENS.labels(provider="claude", kind="write").inc(cache_write)
+
+    async def generate(
+        self,
+        system_prompt: str,
+        user_message: str,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        **kwargs,
+    ) -> str:
+        """Generate a response using Claude"""
+        with track_llm_call(self.provider, self.model, "generate") as call:
+            response = await self.http.post(
                 f"{self.base_url}/messages",
-                headers={
-                    "x-api-key": self.api_key,
-                    "anthropic-version": "2023-06-01",
-                    "content-type": "application/json",
-                },
-                json={
-                    "model": self.model,
-                    "max_tokens": 4096,
-                    "system": system_prompt,
-                    "messages": messages,
-                },
+                headers=self.headers,
+                json=self._build_payload(
+                    system_prompt,
+                    user_message,
+                    conversation_history,
+                    max_tokens=kwargs.get("max_tokens"),
+                    system_prefix=kwargs.get("system_prefix"),
+                ),
+                timeout=request_timeout(self.timeout, kwargs.get("deadline")),
             )
             response.raise_for_status()
             data = response.json()
+            self._record_usage(call, data.get("usage", {}))
 
-            # Extract text from response
-            content = data.get("content", [])
-            if content and len(content) > 0:
-                return content[0].get("text", "")
-            return ""
+        # Extract text from response
+        content = data.get("content", [])
+        if content and len(content) > 0:
+            return content[0].get("text", "")
+        return ""
+
+    async def generate_stream(
+        self,
+        system_prompt: str,
+        user_message: str,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        **kwargs,
+    ) -> AsyncIterator[str]:
+        """Stream a response from Claude (server-sent events)"""
+        with track_llm_call(self.provider, self.model, "stream") as call:
+            async with self.http.stream(
+                "POST",
+                f"{self.base_url}/messages",
+                headers=self.headers,
+                json=self._build_payload(
+                    system_prompt,
+                    user_message,
+                    conversation_history,
+                    stream=True,
+                    max_tokens=kwargs.get("max_tokens"),
+                    system_prefix=kwargs.get("system_prefix"),
+                ),
+                timeout=request_timeout(self.timeout, kwargs.get("deadline")),
+            ) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    event = json.loads(line[len("data:"):].strip())
+                    event_type = event.get("type")
+                    if event_type == "message_start":
+                        self._record_usage(call, event.get("message", {}).get("usage", {}))
+                    elif event_type == "content_block_delta":
+                        delta = event.get("delta", {})
+                        if delta.get("type") == "text_delta" and delta.get("text"):
+                            call.first_token()
+                            yield delta["text"]
+                    elif event_type == "message_delta":
+                        # Final output token count
+                        call.record_usage(
+                            completion_tokens=event.get("usage", {}).get("output_tokens")
+                        )
+                    elif event_type == "message_stop":
+                        break
+                    elif event_type == "error":
+                        raise RuntimeError(event.get("error", {}).get("message", "Stream error"))
 
     async def embed(self, text: str) -> List[float]:
         """
@@ -67,3 +188,7 @@ class ClaudeClient(BaseLLMClient):
         # In production, you would use a separate embedding service
         # like Voyage AI or OpenAI embeddings
         return []
+
+    async def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """No embedding API; return empty vectors without extra calls"""
+        return [[] for _ in texts]
@@ -0,0 +1,129 @@
+"""
+Single-flight Coalescing of identical in-flight LLM calls
+"""
+
+import asyncio
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, Dict, List, Optional, AsyncIterator
+
+from app.llm.llm_factory import BaseLLMClient
+from app.metrics import LLM_COALESCED_CALLS
+
+
+class _Flight:
+    """One shared in-flight call and the number of callers awaiting it"""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time; concurrent callers with the same
+    key share its result or exception. A caller that is cancelled only stops
+    waiting; the shared call is cancelled once no caller is waiting for it.
+    """
+
+    def __init__(self, operation: str):
+        self.operation = operation
+        self._flights: Dict[str, _Flight] = {}
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(func()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+        else:
+            LLM_COALESCED_CALLS.labels(operation=self.operation).inc()
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                # Later callers must start a new call, not join the dying one
+                self._forget(key, flight)
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def _forget(self, key: str, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+
+def _make_key(*parts: Any) -> str:
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# Process-wide, so calls from different client instances are coalesced
+_generate_flights = SingleFlight("generate")
+_embed_flights = SingleFlight("embed")
+
+
+class CoalescingLLMClient(BaseLLMClient):
+    """
+    Wraps an LLM client so identical concurrent generate and embed calls
+    share one request. Streams are not coalesced.
+    """
+
+    def __init__(self, client: BaseLLMClient):
+        self.client = client
+
+    @property
+    def provider(self) -> str:
+        return self.client.provider
+
+    @property
+    def model(self) -> str:
+        return getattr(self.client, "model", "")
+
+    def __getattr__(self, name: str):
+        return getattr(self.client, name)
+
+    async def generate(
+        self,
+        system_prompt: str,
+        user_message: str,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        **kwargs,
+    ) -> str:
+        # The deadline is per caller; the shared call runs under the first one's
+        key = _make_key(
+            self.provider, self.model, system_prompt,
+            conversation_history or [], user_message,
+            {name: value for name, value in kwargs.items() if name != "deadline"},
+        )
+        return await _generate_flights.do(
+            key,
+            lambda: self.client.generate(
+                system_prompt, user_message, conversation_history, **kwargs
+            ),
+        )
+
+    async def generate_stream(
+        self,
+        system_prompt: str,
+        user_message: str,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        **kwargs,
+    ) -> AsyncIterator[str]:
+        async for chunk in self.client.generate_stream(
+            system_prompt, user_message, conversation_history, **kwargs
+        ):
+            yield chunk
+
+    async def embed(self, text: str) -> List[float]:
+        key = _make_key(self.provider, self.model, "embed", text)
+        return await _embed_flights.do(key, lambda: self.client.embed(text))
+
+    async def embed_many(self, texts: List[str], **kwargs) -> List[List[float]]:
+        key = _make_key(self.provider, self.model, "embed_many", texts, kwargs)
+        return await _embed_flights.do(
+            key, lambda: self.client.embed_many(texts, **kwargs)
+        )
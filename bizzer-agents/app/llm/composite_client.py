@@ -0,0 +1,229 @@
+"""
+Composite LLM Client with fallback chain, circuit breakers and hedging
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, List, Dict, Optional, Set, AsyncIterator
+
+from app.config import settings
+from app.llm.llm_factory import BaseLLMClient
+from app.llm.admission import LLMQueueFullError
+from app.llm.deadline import LLMDeadlineExceededError
+from app.llm.circuit_breaker import get_circuit_breaker
+from app.metrics import LLM_PROVIDER_OUTCOMES, LLM_HEDGED_REQUESTS
+
+
+class LLMUnavailableError(Exception):
+    """Raised when no provider in the chain can take the call"""
+    pass
+
+
+class FallbackLLMClient(BaseLLMClient):
+    """
+    Tries an ordered chain of providers, skipping those whose circuit is open.
+    Optionally hedges a slow call by starting the next provider after a delay
+    and using whichever answers first.
+    Embeddings always use the first provider so vectors share one space.
+    """
+
+    def __init__(
+        self,
+        clients: List[BaseLLMClient],
+        hedging: Optional[bool] = None,
+        hedge_delay: Optional[float] = None,
+    ):
+        self.clients = clients
+        self.breakers = [get_circuit_breaker(client.provider) for client in clients]
+        self.hedging = settings.llm_hedging_enabled if hedging is None else hedging
+        self.hedge_delay = settings.llm_hedge_delay if hedge_delay is None else hedge_delay
+
+    @property
+    def provider(self) -> str:
+        return self.clients[0].provider
+
+    @property
+    def model(self) -> str:
+        return getattr(self.clients[0], "model", "")
+
+    def __getattr__(self, name: str):
+        return getattr(self.clients[0], name)
+
+    def _outcome(self, index: int, outcome: str):
+        LLM_PROVIDER_OUTCOMES.labels(
+            provider=self.clients[index].provider, outcome=outcome
+        ).inc()
+
+    async def _call(
+        self,
+        index: int,
+        func: Callable[[BaseLLMClient], Awaitable[Any]],
+    ) -> Any:
+        """Run one provider call and record its outcome on the breaker"""
+        breaker = self.breakers[index]
+        started = time.perf_counter()
+        try:
+            result = await func(self.clients[index])
+        except LLMQueueFullError:
+            breaker.release_trial()
+            self._outcome(index, "rejected")
+            raise
+        except LLMDeadlineExceededError:
+            breaker.release_trial()
+            self._outcome(index, "deadline")
+            raise
+        except asyncio.CancelledError:
+            breaker.release_trial()
+            self._outcome(index, "cancelled")
+            raise
+        except Exception:
+            breaker.record_failure(time.perf_counter() - started)
+            self._outcome(index, "failure")
+            raise
+
+        breaker.record_success(time.perf_counter() - started)
+        self._outcome(index, "success")
+        return result
+
+    def _hedge_after(self, index: int) -> Optional[float]:
+        """Delay before hedging a call: configured, or the provider's recent p95"""
+        if not self.hedging:
+            return None
+        if self.hedge_delay > 0:
+            return self.hedge_delay
+        return self.breakers[index].latency_quantile(0.95)
+
+    def _next_available(self, after: int, tried: Set[int]) -> Optional[int]:
+        for index in range(after + 1, len(self.clients)):
+            if index not in tried and self.breakers[index].allow():
+                return index
+        return None
+
+    async def _hedged_call(
+        self,
+        index: int,
+        func: Callable[[BaseLLMClient], Awaitable[Any]],
+        tried: Set[int],
+    ) -> Any:
+        """Call a provider, hedging with the next available one if it is slow"""
+        delay = self._hedge_after(index)
+        primary = asyncio.ensure_future(self._call(index, func))
+        if delay is None:
+            return await primary
+
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+
+        hedge_index = self._next_available(index, tried)
+        if hedge_index is None:
+            return await primary
+
+        tried.add(hedge_index)
+        LLM_HEDGED_REQUESTS.labels(provider=self.clients[index].provider).inc()
+        pending = {primary, asyncio.ensure_future(self._call(hedge_index, func))}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.cancelled():
+                        # exception() would raise; count it as a failed attempt.
+                        # Not CancelledError, which would skip the fallback chain
+                        error = error or LLMUnavailableError("hedged attempt cancelled")
+                    elif task.exception() is None:
+                        return task.result()
+                    else:
+                        error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def generate(
+        self,
+        system_prompt: str,
+        user_message: str,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        **kwargs,
+    ) -> str:
+        """Generate a response from the first provider that succeeds"""
+        def call(client: BaseLLMClient) -> Awaitable[str]:
+            return client.generate(
+                system_prompt, user_message, conversation_history, **kwargs
+            )
+
+        tried: Set[int] = set()
+        last_error: Optional[Exception] = None
+        for index in range(len(self.clients)):
+            if index in tried:
+                continue
+            if not self.breakers[index].allow():
+                self._outcome(index, "skipped")
+                continue
+            tried.add(index)
+            try:
+                return await self._hedged_call(index, call, tried)
+            except LLMDeadlineExceededError:
+                # No time left for another provider
+                raise
+            except Exception as e:
+                last_error = e
+
+        raise last_error or LLMUnavailableError("All LLM providers are unavailable")
+
+    async def generate_stream(
+        self,
+        system_prompt: str,
+        user_message: str,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        **kwargs,
+    ) -> AsyncIterator[str]:
+        """Stream from the first provider that starts; no fallback after the first chunk"""
+        last_error: Optional[Exception] = None
+        for index, client in enumerate(self.clients):
+            breaker = self.breakers[index]
+            if not breaker.allow():
+                self._outcome(index, "skipped")
+                continue
+
+            started = time.perf_counter()
+            streamed = False
+            try:
+                async for chunk in client.generate_stream(
+                    system_prompt, user_message, conversation_history, **kwargs
+                ):
+                    streamed = True
+                    yield chunk
+            except LLMQueueFullError as e:
+                breaker.release_trial()
+                self._outcome(index, "rejected")
+                last_error = e
+                continue
+            except LLMDeadlineExceededError:
+                breaker.release_trial()
+                self._outcome(index, "deadline")
+                raise
+            except (asyncio.CancelledError, GeneratorExit):
+                breaker.release_trial()
+                self._outcome(index, "cancelled")
+                raise
+            except Exception as e:
+                breaker.record_failure(time.perf_counter() - started)
+                self._outcome(index, "failure")
+                if streamed:
+                    raise
+                last_error = e
+                continue
+
+            breaker.record_success(time.perf_counter() - started)
+            self._outcome(index, "success")
+            return
+
+        raise last_error or LLMUnavailableError("All LLM providers are unavailable")
+
+    async def embed(self, text: str) -> List[float]:
+        return await self.clients[0].embed(text)
+
+    async def embed_many(self, texts: List[str], **kwargs) -> List[List[float]]:
+        return await self.clients[0].embed_many(texts, **kwargs)
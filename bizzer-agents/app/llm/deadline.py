@@ -0,0 +1,36 @@
+"""
+Request Deadlines for LLM calls
+
+A deadline is an absolute time.monotonic() value passed down the client
+chain as the `deadline` keyword argument.
+"""
+
+import time
+from typing import Optional
+
+
+class LLMDeadlineExceededError(Exception):
+    """Raised when an LLM call cannot finish before the request deadline"""
+    pass
+
+
+def deadline_after(seconds: float) -> float:
+    """Deadline a number of seconds from now"""
+    return time.monotonic() + seconds
+
+
+def time_left(deadline: Optional[float]) -> Optional[float]:
+    """Seconds until the deadline, or None when there is no deadline"""
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def request_timeout(timeout: float, deadline: Optional[float]) -> float:
+    """HTTP timeout for one request: the client timeout capped by the deadline"""
+    left = time_left(deadline)
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise LLMDeadlineExceededError("Request deadline exceeded")
+    return min(timeout, left)
@@ -0,0 +1,90 @@
+"""
+Fake LLM Client for offline testing
+"""
+
+import asyncio
+import hashlib
+import random
+from typing import List, Dict, Optional, AsyncIterator
+from app.llm.llm_factory import BaseLLMClient
+from app.llm.instrumentation import track_llm_call
+from app.llm.prompt_budget import estimate_tokens
+
+
+class FakeLLMClient(BaseLLMClient):
+    """
+    In-process stand-in provider with configurable latency and failure rate.
+    Useful to exercise fallback and circuit-breaker paths without a network.
+    """
+
+    provider = "fake"
+    max_embed_batch_size = 256
+
+    def __init__(
+        self,
+        model: str = "fake-model",
+        latency: float = 0.05,
+        failure_rate: float = 0.0,
+        embedding_dim: int = 64,
+    ):
+        self.model = model
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.embedding_dim = embedding_dim
+
+    async def _simulate(self):
+        await asyncio.sleep(self.latency)
+        if random.random() < self.failure_rate:
+            raise RuntimeError(f"Fake provider {self.model} failed")
+
+    async def generate(
+        self,
+        system_prompt: str,
+        user_message: str,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        **kwargs,
+    ) -> str:
+        """Return a canned response after the configured latency"""
+        with track_llm_call(self.provider, self.model, "generate") as call:
+            await self._simulate()
+            response = f"[{self.model}] {user_message}"
+            call.record_usage(
+                prompt_tokens=estimate_tokens(system_prompt) + estimate_tokens(user_message),
+                completion_tokens=estimate_tokens(response),
+            )
+        return response
+
+    async def generate_stream(
+        self,
+        system_prompt: str,
+        user_message: str,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        **kwargs,
+    ) -> AsyncIterator[str]:
+        """Stream the canned response word by word"""
+        with track_llm_call(self.provider, self.model, "stream") as call:
+            await self._simulate()
+            words = f"[{self.model}] {user_message}".split(" ")
+            call.record_usage(
+                prompt_tokens=estimate_tokens(system_prompt) + estimate_tokens(user_message),
+                completion_tokens=len(words),
+            )
+            for i, word in enumerate(words):
+                call.first_token()
+                yield word if i == 0 else f" {word}"
+
+    async def embed(self, text: str) -> List[float]:
+        """Deterministic pseudo-embedding derived from the text hash"""
+        with track_llm_call(self.provider, self.model, "embed"):
+            await self._simulate()
+        return self._fake_vector(text)
+
+    async def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        with track_llm_call(self.provider, self.model, "embed"):
+            await self._simulate()
+        return [self._fake_vector(text) for text in texts]
+
+    def _fake_vector(self, text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+        rng = random.Random(seed)
+        return [rng.uniform(-1.0, 1.0) for _ in range(self.embedding_dim)]
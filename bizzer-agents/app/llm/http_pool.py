@@ -0,0 +1,43 @@
+"""
+Shared HTTP Connection Pool for LLM Providers
+"""
+
+from typing import Dict
+import httpx
+from app.config import settings
+
+# One long-lived pooled client per provider, owned by the app lifespan
+_clients: Dict[str, httpx.AsyncClient] = {}
+
+
+def _build_client() -> httpx.AsyncClient:
+    """Create a pooled client using the configured connection limits"""
+    limits = httpx.Limits(
+        max_connections=settings.http_max_connections,
+        max_keepalive_connections=settings.http_max_keepalive_connections,
+        keepalive_expiry=settings.http_keepalive_expiry,
+    )
+    return httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(120.0))
+
+
+def get_http_client(provider: str) -> httpx.AsyncClient:
+    """Get the shared client for a provider, creating it on first use"""
+    client = _clients.get(provider)
+    if client is None or client.is_closed:
+        client = _build_client()
+        _clients[provider] = client
+    return client
+
+
+def init_http_clients(*providers: str):
+    """Open pooled clients for the given providers"""
+    for provider in providers:
+        get_http_client(provider)
+
+
+async def close_http_clients():
+    """Close all pooled clients"""
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        await client.aclose()
@@ -0,0 +1,107 @@
+"""
+Per-call LLM Instrumentation
+"""
+
+import asyncio
+import time
+from typing import Optional
+
+from app.metrics import (
+    LLM_CALLS,
+    LLM_CALL_SECONDS,
+    LLM_TIME_TO_FIRST_TOKEN_SECONDS,
+    LLM_TOKENS,
+    LLM_TOKENS_PER_SECOND,
+)
+from app.tracing import record_span
+
+
+class LLMCallTracker:
+    """
+    Times one provider call and records its usage.
+    Use as a context manager around the HTTP request; call first_token()
+    when a stream yields its first chunk and record_usage() with the
+    provider-reported token counts.
+    """
+
+    def __init__(self, provider: str, model: str, operation: str):
+        self.provider = provider
+        self.model = model
+        self.operation = operation
+        self.ttft: Optional[float] = None
+        self.prompt_tokens: Optional[int] = None
+        self.completion_tokens: Optional[int] = None
+        self.generation_seconds: Optional[float] = None
+        self._started = 0.0
+
+    def __enter__(self) -> "LLMCallTracker":
+        self._started = time.perf_counter()
+        return self
+
+    def first_token(self):
+        if self.ttft is None:
+            self.ttft = time.perf_counter() - self._started
+
+    def record_usage(
+        self,
+        prompt_tokens: Optional[int] = None,
+        completion_tokens: Optional[int] = None,
+        generation_seconds: Optional[float] = None,
+    ):
+        """Record token counts; later non-empty values win (streams report in parts)"""
+        if prompt_tokens is not None:
+            self.prompt_tokens = prompt_tokens
+        if completion_tokens is not None:
+            self.completion_tokens = completion_tokens
+        if generation_seconds:
+            self.generation_seconds = generation_seconds
+
+    def tokens_per_second(self, seconds: float) -> Optional[float]:
+        """Completion tokens per second of generation (excluding time to first token)"""
+        if not self.completion_tokens:
+            return None
+        generation = self.generation_seconds
+        if generation is None:
+            generation = seconds - self.ttft if self.ttft is not None else seconds
+        if generation <= 0:
+            return None
+        return self.completion_tokens / generation
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self._started
+        if exc_type is None:
+            outcome = "success"
+        elif issubclass(exc_type, (asyncio.CancelledError, GeneratorExit)):
+            outcome = "cancelled"
+        else:
+            outcome = "error"
+
+        labels = {"provider": self.provider, "model": self.model}
+        LLM_CALLS.labels(operation=self.operation, outcome=outcome, **labels).inc()
+        LLM_CALL_SECONDS.labels(operation=self.operation, **labels).observe(seconds)
+        if self.ttft is not None:
+            LLM_TIME_TO_FIRST_TOKEN_SECONDS.labels(**labels).observe(self.ttft)
+        if self.prompt_tokens:
+            LLM_TOKENS.labels(kind="prompt", **labels).inc(self.prompt_tokens)
+        if self.completion_tokens:
+            LLM_TOKENS.labels(kind="completion", **labels).inc(self.completion_tokens)
+        tokens_per_second = self.tokens_per_second(seconds)
+        if tokens_per_second is not None:
+            LLM_TOKENS_PER_SECOND.labels(**labels).observe(tokens_per_second)
+
+        record_span(
+            f"llm_{self.operation}",
+            seconds,
+            outcome=outcome,
+            ttft=self.ttft,
+            prompt_tokens=self.prompt_tokens,
+            completion_tokens=self.completion_tokens,
+            tokens_per_second=tokens_per_second,
+            **labels,
+        )
+        return False
+
+
+def track_llm_call(provider: str, model: str, operation: str) -> LLMCallTracker:
+    """Instrument one provider call (operation: generate, stream, embed)"""
+    return LLMCallTracker(provider, model, operation)
@@ -3,8 +3,9 @@ LLM Factory for Bizzer Agents
 Provides a unified interface for different LLM providers
 """
 
+import asyncio
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator
 
 from app.config import settings, LLMProvider
 
@@ -12,6 +13,12 @@ from app.config import settings, LLMProvider
 class BaseLLMClient(ABC):
     """Abstract base class for LLM clients"""
 
+    # Provider name, used for per-provider limits and metrics
+    provider: str = "unknown"
+
+    # Largest number of texts a provider accepts in one embedding request
+    max_embed_batch_size: int = 1
+
     @abstractmethod
     async def generate(
         self,
@@ -23,35 +30,143 @@ class BaseLLMClient(ABC):
         """Generate a response from the LLM"""
         pass
 
+    async def generate_stream(
+        self,
+        system_prompt: str,
+        user_message: str,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        **kwargs,
+    ) -> AsyncIterator[str]:
+        """
+        Generate a response as a stream of text chunks.
+        Providers without native streaming yield the full response once.
+        """
+        yield await self.generate(
+            system_prompt=system_prompt,
+            user_message=user_message,
+            conversation_history=conversation_history,
+            **kwargs,
+        )
+
     @abstractmethod
     async def embed(self, text: str) -> List[float]:
         """Generate embeddings for text"""
         pass
 
+    async def embed_many(
+        self,
+        texts: List[str],
+        batch_size: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+    ) -> List[List[float]]:
+        """
+        Generate embeddings for many texts.
+        Texts are packed into provider-sized batches, a bounded number of
+        batches run concurrently and vectors are returned in input order.
+        """
+        if not texts:
+            return []
+
+        batch_size = min(
+            batch_size or settings.embedding_batch_size,
+            self.max_embed_batch_size,
+        )
+        semaphore = asyncio.Semaphore(
+            max_concurrency or settings.embedding_max_concurrency
+        )
+        batches = [
+            texts[i:i + batch_size] for i in range(0, len(texts), batch_size)
+        ]
+
+        async def run_batch(batch: List[str]) -> List[List[float]]:
+            async with semaphore:
+                return await self._embed_batch(batch)
+
+        results = await asyncio.gather(*(run_batch(batch) for batch in batches))
+        return [vector for batch_vectors in results for vector in batch_vectors]
+
+    async def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Embed one batch; providers without a batch API embed one by one"""
+        return [await self.embed(text) for text in texts]
+
 
 class LLMFactory:
     """Factory for creating LLM clients"""
 
+    @staticmethod
+    def get_provider_chain() -> List[LLMProvider]:
+        """Configured provider followed by its fallbacks, without duplicates"""
+        chain = [settings.llm_provider]
+        for name in settings.llm_fallback_providers.split(","):
+            name = name.strip()
+            if name and LLMProvider(name) not in chain:
+                chain.append(LLMProvider(name))
+        return chain
+
     @staticmethod
     def get_client() -> BaseLLMClient:
         """Get the appropriate LLM client based on configuration"""
-        if settings.llm_provider == LLMProvider.OLLAMA:
+        from app.llm.admission import AdmissionControlledClient
+        from app.llm.coalescing import CoalescingLLMClient
+        from app.llm.retry import RetryingLLMClient
+
+        # Retries sit outside admission control so backoff does not hold a slot
+        clients = [
+            RetryingLLMClient(
+                AdmissionControlledClient(LLMFactory.get_provider_client(provider))
+            )
+            for provider in LLMFactory.get_provider_chain()
+        ]
+        if len(clients) > 1:
+            from app.llm.composite_client import FallbackLLMClient
+            client = FallbackLLMClient(clients)
+        else:
+            client = clients[0]
+
+        client = CoalescingLLMClient(client)
+
+        if settings.llm_cache_enabled:
+            from app.llm.response_cache import CachedLLMClient
+            client = CachedLLMClient(client)
+
+        return client
+
+    @staticmethod
+    def get_provider_client(provider: Optional[LLMProvider] = None) -> BaseLLMClient:
+        """Get the raw client for a provider (the configured one by default)"""
+        provider = provider or settings.llm_provider
+        if provider == LLMProvider.OLLAMA:
             from app.llm.ollama_client import OllamaClient
+            options = {
+                "num_ctx": settings.ollama_num_ctx,
+                "num_predict": settings.ollama_num_predict,
+                "num_thread": settings.ollama_num_thread,
+            }
             return OllamaClient(
                 base_url=settings.ollama_base_url,
                 model=settings.ollama_model,
+                keep_alive=settings.ollama_keep_alive,
+                options={k: v for k, v in options.items() if v is not None},
             )
-        elif settings.llm_provider == LLMProvider.CLAUDE:
+        elif provider == LLMProvider.CLAUDE:
             from app.llm.claude_client import ClaudeClient
             return ClaudeClient(
                 api_key=settings.anthropic_api_key,
                 model=settings.claude_model,
+                base_url=settings.anthropic_base_url,
             )
-        elif settings.llm_provider == LLMProvider.OPENAI:
+        elif provider == LLMProvider.OPENAI:
             from app.llm.openai_client import OpenAIClient
             return OpenAIClient(
                 api_key=settings.openai_api_key,
                 model=settings.openai_model,
+                base_url=settings.openai_base_url,
+            )
+        elif provider == LLMProvider.FAKE:
+            from app.llm.fake_client import FakeLLMClient
+            return FakeLLMClient(
+                latency=settings.fake_llm_latency,
+                failure_rate=settings.fake_llm_failure_rate,
             )
         else:
-            raise ValueError(f"Unknown LLM provider: {settings.llm_provider}")
+            raise ValueError(f"Unknown LLM provider: {provider}")
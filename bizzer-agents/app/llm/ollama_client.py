@@ -2,28 +2,49 @@
 Ollama Client for Bizzer Agents
 """
 
+import json
 import httpx
-from typing import List, Dict, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator
 from app.llm.llm_factory import BaseLLMClient
+from app.llm.http_pool import get_http_client
+from app.llm.deadline import request_timeout
+from app.llm.instrumentation import LLMCallTracker, track_llm_call
 
 
 class OllamaClient(BaseLLMClient):
     """Client for Ollama API (local LLMs)"""
 
-    def __init__(self, base_url: str, model: str):
+    provider = "ollama"
+    max_embed_batch_size = 256
+
+    def __init__(
+        self,
+        base_url: str,
+        model: str,
+        keep_alive: Optional[str] = None,
+        options: Optional[Dict[str, Any]] = None,
+    ):
         self.base_url = base_url.rstrip("/")
         self.model = model
         self.timeout = 120.0
+        self.keep_alive = keep_alive
+        # Runtime options (num_ctx, num_predict, num_thread, ...).
+        # Every request sends the same values: a different num_ctx makes
+        # Ollama reload the model.
+        self.options = options or {}
 
-    async def generate(
+    @property
+    def http(self) -> httpx.AsyncClient:
+        """Shared pooled HTTP client"""
+        return get_http_client("ollama")
+
+    def _build_messages(
         self,
         system_prompt: str,
         user_message: str,
         conversation_history: Optional[List[Dict[str, str]]] = None,
-        **kwargs,
-    ) -> str:
-        """Generate a response using Ollama"""
-        # Build messages
+    ) -> List[Dict[str, str]]:
+        """Build the chat messages payload"""
         messages = []
 
         if system_prompt:
@@ -36,41 +57,150 @@ class OllamaClient(BaseLLMClient):
         # Add current message
         messages.append({"role": "user", "content": user_message})
 
+        return messages
+
+    def _request_body(
+        self, max_tokens: Optional[int] = None, include_options: bool = True, **body
+    ) -> Dict[str, Any]:
+        """Add the model, keep-alive and runtime options to a request body
+
+        Embedding requests pass include_options=False: a different num_ctx or
+        num_thread would make Ollama reload the model, and num_predict does
+        not apply to them.
+        """
+        body["model"] = self.model
+        if self.keep_alive is not None:
+            body["keep_alive"] = self.keep_alive
+        if not include_options:
+            return body
+        options = dict(self.options)
+        if max_tokens and "num_predict" not in options:
+            options["num_predict"] = max_tokens
+        if options:
+            body["options"] = options
+        return body
+
+    @staticmethod
+    def _record_usage(call: LLMCallTracker, data: Dict[str, Any]):
+        """Token counts from a final chat response (eval_duration is in ns)"""
+        eval_duration = data.get("eval_duration")
+        call.record_usage(
+            prompt_tokens=data.get("prompt_eval_count"),
+            completion_tokens=data.get("eval_count"),
+            generation_seconds=eval_duration / 1e9 if eval_duration else None,
+        )
+
+    async def generate(
+        self,
+        system_prompt: str,
+        user_message: str,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        **kwargs,
+    ) -> str:
+        """Generate a response using Ollama"""
+        messages = self._build_messages(system_prompt, user_message, conversation_history)
+
         # Make request
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.post(
+        with track_llm_call(self.provider, self.model, "generate") as call:
+            response = await self.http.post(
                 f"{self.base_url}/api/chat",
-                json={
-                    "model": self.model,
-                    "messages": messages,
-                    "stream": False,
-                },
+                json=self._request_body(
+                    messages=messages, stream=False, max_tokens=kwargs.get("max_tokens")
+                ),
+                timeout=request_timeout(self.timeout, kwargs.get("deadline")),
             )
             response.raise_for_status()
             data = response.json()
+            self._record_usage(call, data)
+
+        return data.get("message", {}).get("content", "")
+
+    async def generate_stream(
+        self,
+        system_prompt: str,
+        user_message: str,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        **kwargs,
+    ) -> AsyncIterator[str]:
+        """Stream a response from Ollama (NDJSON, one object per line)"""
+        messages = self._build_messages(system_prompt, user_message, conversation_history)
 
-            return data.get("message", {}).get("content", "")
+        with track_llm_call(self.provider, self.model, "stream") as call:
+            async with self.http.stream(
+                "POST",
+                f"{self.base_url}/api/chat",
+                json=self._request_body(
+                    messages=messages, stream=True, max_tokens=kwargs.get("max_tokens")
+                ),
+                timeout=request_timeout(self.timeout, kwargs.get("deadline")),
+            ) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    data = json.loads(line)
+                    chunk = data.get("message", {}).get("content", "")
+                    if chunk:
+                        call.first_token()
+                        yield chunk
+                    if data.get("done"):
+                        self._record_usage(call, data)
+                        break
 
     async def embed(self, text: str) -> List[float]:
         """Generate embeddings using Ollama"""
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.post(
+        with track_llm_call(self.provider, self.model, "embed"):
+            response = await self.http.post(
                 f"{self.base_url}/api/embeddings",
-                json={
-                    "model": self.model,
-                    "prompt": text,
-                },
+                json=self._request_body(include_options=False, prompt=text),
+                timeout=self.timeout,
             )
             response.raise_for_status()
             data = response.json()
 
-            return data.get("embedding", [])
+        return data.get("embedding", [])
+
+    async def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Generate embeddings for a batch using Ollama's /api/embed"""
+        with track_llm_call(self.provider, self.model, "embed") as call:
+            response = await self.http.post(
+                f"{self.base_url}/api/embed",
+                json=self._request_body(include_options=False, input=texts),
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+            data = response.json()
+            call.record_usage(prompt_tokens=data.get("prompt_eval_count"))
+
+        return data.get("embeddings", [])
 
     async def health_check(self) -> bool:
         """Check if Ollama is available"""
         try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                response = await client.get(f"{self.base_url}/api/tags")
-                return response.status_code == 200
+            response = await self.http.get(f"{self.base_url}/api/tags", timeout=5.0)
+            return response.status_code == 200
         except:
             return False
+
+    async def warm_up(self) -> bool:
+        """
+        Load the model into memory with the configured keep-alive and options.
+        An empty chat request loads the model without generating anything.
+        """
+        response = await self.http.post(
+            f"{self.base_url}/api/chat",
+            json=self._request_body(messages=[], stream=False),
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        return True
+
+    async def is_model_loaded(self) -> bool:
+        """Check whether the model is currently loaded in Ollama"""
+        try:
+            response = await self.http.get(f"{self.base_url}/api/ps", timeout=5.0)
+            response.raise_for_status()
+        except httpx.HTTPError:
+            return False
+        models = response.json().get("models", [])
+        return any(m.get("name") == self.model or m.get("model") == self.model for m in models)
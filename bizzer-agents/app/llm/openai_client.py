@@ -2,30 +2,51 @@
 OpenAI Client for Bizzer Agents
 """
 
+import json
 import httpx
-from typing import List, Dict, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator
+from app.config import settings
 from app.llm.llm_factory import BaseLLMClient
+from app.llm.http_pool import get_http_client
+from app.llm.deadline import request_timeout
+from app.llm.instrumentation import LLMCallTracker, track_llm_call
 
 
 class OpenAIClient(BaseLLMClient):
     """Client for OpenAI API"""
 
-    def __init__(self, api_key: str, model: str):
+    provider = "openai"
+    max_embed_batch_size = 2048
+
+    def __init__(self, api_key: str, model: str, base_url: str = "https://api.openai.com/v1"):
         self.api_key = api_key
         self.model = model
-        self.base_url = "https://api.openai.com/v1"
+        self.base_url = base_url.rstrip("/")
         self.timeout = 120.0
         self.embedding_model = "text-embedding-3-small"
 
-    async def generate(
+    @property
+    def http(self) -> httpx.AsyncClient:
+        """Shared pooled HTTP client"""
+        return get_http_client("openai")
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        """Request headers for the OpenAI API"""
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        }
+
+    def _build_payload(
         self,
         system_prompt: str,
         user_message: str,
         conversation_history: Optional[List[Dict[str, str]]] = None,
-        **kwargs,
-    ) -> str:
-        """Generate a response using OpenAI"""
-        # Build messages
+        stream: bool = False,
+        max_tokens: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Build the chat completions request body"""
         messages = []
 
         if system_prompt:
@@ -38,46 +59,130 @@ class OpenAIClient(BaseLLMClient):
         # Add current message
         messages.append({"role": "user", "content": user_message})
 
-        # Make request
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.post(
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "max_tokens": max_tokens or settings.llm_max_output_tokens,
+        }
+        if stream:
+            payload["stream"] = True
+            # Ask for a final chunk carrying token usage
+            payload["stream_options"] = {"include_usage": True}
+        return payload
+
+    @staticmethod
+    def _record_usage(call: LLMCallTracker, usage: Optional[Dict[str, Any]]):
+        """Report token counts from a usage block"""
+        if usage:
+            call.record_usage(
+                prompt_tokens=usage.get("prompt_tokens"),
+                completion_tokens=usage.get("completion_tokens"),
+            )
+
+    async def generate(
+        self,
+        system_prompt: str,
+        user_message: str,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        **kwargs,
+    ) -> str:
+        """Generate a response using OpenAI"""
+        with track_llm_call(self.provider, self.model, "generate") as call:
+            response = await self.http.post(
                 f"{self.base_url}/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {self.api_key}",
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "model": self.model,
-                    "messages": messages,
-                    "max_tokens": 4096,
-                },
+                headers=self.headers,
+                json=self._build_payload(
+                    system_prompt,
+                    user_message,
+                    conversation_history,
+                    max_tokens=kwargs.get("max_tokens"),
+                ),
+                timeout=request_timeout(self.timeout, kwargs.get("deadline")),
             )
             response.raise_for_status()
             data = response.json()
+            self._record_usage(call, data.get("usage"))
+
+        choices = data.get("choices", [])
+        if choices and len(choices) > 0:
+            return choices[0].get("message", {}).get("content", "")
+        return ""
 
-            choices = data.get("choices", [])
-            if choices and len(choices) > 0:
-                return choices[0].get("message", {}).get("content", "")
-            return ""
+    async def generate_stream(
+        self,
+        system_prompt: str,
+        user_message: str,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        **kwargs,
+    ) -> AsyncIterator[str]:
+        """Stream a response from OpenAI (server-sent events)"""
+        with track_llm_call(self.provider, self.model, "stream") as call:
+            async with self.http.stream(
+                "POST",
+                f"{self.base_url}/chat/completions",
+                headers=self.headers,
+                json=self._build_payload(
+                    system_prompt,
+                    user_message,
+                    conversation_history,
+                    stream=True,
+                    max_tokens=kwargs.get("max_tokens"),
+                ),
+                timeout=request_timeout(self.timeout, kwargs.get("deadline")),
+            ) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    event = json.loads(data)
+                    self._record_usage(call, event.get("usage"))
+                    choices = event.get("choices", [])
+                    if choices:
+                        chunk = choices[0].get("delta", {}).get("content")
+                        if chunk:
+                            call.first_token()
+                            yield chunk
 
     async def embed(self, text: str) -> List[float]:
         """Generate embeddings using OpenAI"""
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.post(
+        with track_llm_call(self.provider, self.embedding_model, "embed") as call:
+            response = await self.http.post(
                 f"{self.base_url}/embeddings",
-                headers={
-                    "Authorization": f"Bearer {self.api_key}",
-                    "Content-Type": "application/json",
-                },
+                headers=self.headers,
                 json={
                     "model": self.embedding_model,
                     "input": text,
                 },
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+            data = response.json()
+            self._record_usage(call, data.get("usage"))
+
+        embeddings = data.get("data", [])
+        if embeddings and len(embeddings) > 0:
+            return embeddings[0].get("embedding", [])
+        return []
+
+    async def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Generate embeddings for a batch using OpenAI"""
+        with track_llm_call(self.provider, self.embedding_model, "embed") as call:
+            response = await self.http.post(
+                f"{self.base_url}/embeddings",
+                headers=self.headers,
+                json={
+                    "model": self.embedding_model,
+                    "input": texts,
+                },
+                timeout=self.timeout,
             )
             response.raise_for_status()
             data = response.json()
+            self._record_usage(call, data.get("usage"))
 
-            embeddings = data.get("data", [])
-            if embeddings and len(embeddings) > 0:
-                return embeddings[0].get("embedding", [])
-            return []
+        # Results carry their input index; keep input order
+        embeddings = sorted(data.get("data", []), key=lambda item: item.get("index", 0))
+        return [item.get("embedding", []) for item in embeddings]
@@ -0,0 +1,150 @@
+"""
+Token-budgeted Prompt Assembly
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from app.config import settings
+from app.metrics import PROMPT_TRUNCATIONS, PROMPT_TOKENS
+
+# Context windows in tokens, matched by model-name prefix (longest first)
+MODEL_CONTEXT_WINDOWS: Dict[str, int] = {
+    "gemma2": 8192,
+    "gemma": 8192,
+    "llama3": 8192,
+    "mistral": 32768,
+    "qwen2": 32768,
+    "claude": 200000,
+    "gpt-4o": 128000,
+    "gpt-4": 8192,
+    "gpt-3.5": 16385,
+}
+DEFAULT_CONTEXT_WINDOW = 4096
+
+# Word pieces and single punctuation marks, a cheap proxy for BPE tokens
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+# Tokens added by the chat template around each message
+MESSAGE_OVERHEAD = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Fast local token estimate (about 1.3 tokens per word piece)"""
+    if not text:
+        return 0
+    return int(len(_TOKEN_RE.findall(text)) * 1.3) + 1
+
+
+def get_context_window(provider: str, model: str) -> int:
+    """Context window for a model; Ollama is capped by the configured num_ctx"""
+    window = None
+    for prefix in sorted(MODEL_CONTEXT_WINDOWS, key=len, reverse=True):
+        if model.startswith(prefix):
+            window = MODEL_CONTEXT_WINDOWS[prefix]
+            break
+
+    # Ollama silently truncates prompts to num_ctx
+    if provider == "ollama" and settings.ollama_num_ctx:
+        return min(window or settings.ollama_num_ctx, settings.ollama_num_ctx)
+    return window or DEFAULT_CONTEXT_WINDOW
+
+
+@dataclass
+class AssembledPrompt:
+    history: List[Dict[str, str]]
+    documents: List[str]
+    max_output_tokens: int
+    prompt_tokens: int
+    truncated: Dict[str, int] = field(default_factory=dict)
+
+
+class PromptAssembler:
+    """
+    Fills a per-model token budget in priority order: system prompt, current
+    message, newest history, then the best-ranked documents. The output
+    reserve is taken off the context window first.
+    """
+
+    def __init__(self, context_window: int, max_output_tokens: int, min_document_tokens: int = 64):
+        self.context_window = context_window
+        self.max_output_tokens = min(max_output_tokens, context_window // 2)
+        self.min_document_tokens = min_document_tokens
+
+    @classmethod
+    def for_model(cls, provider: str, model: str) -> "PromptAssembler":
+        return cls(
+            context_window=get_context_window(provider, model),
+            max_output_tokens=settings.llm_max_output_tokens,
+        )
+
+    def assemble(
+        self,
+        system_prompt: str,
+        message: str,
+        history: List[Dict[str, str]],
+        documents: List[str],
+    ) -> AssembledPrompt:
+        """
+        Select history and documents that fit the budget.
+        system_prompt is the prompt without documents; it and the message
+        are always kept. Kept history always starts with a user turn.
+        """
+        budget = self.context_window - self.max_output_tokens
+        used = estimate_tokens(system_prompt) + estimate_tokens(message) + 2 * MESSAGE_OVERHEAD
+        truncated: Dict[str, int] = {}
+
+        # Newest history first, stop at the first message that does not fit
+        kept_history: List[Dict[str, str]] = []
+        for turn in reversed(history):
+            cost = estimate_tokens(turn.get("content", "")) + MESSAGE_OVERHEAD
+            if used + cost > budget:
+                break
+            kept_history.insert(0, turn)
+            used += cost
+        # The conversation must open with a user turn (Claude rejects others)
+        while kept_history and kept_history[0].get("role") != "user":
+            turn = kept_history.pop(0)
+            used -= estimate_tokens(turn.get("content", "")) + MESSAGE_OVERHEAD
+        if len(kept_history) < len(history):
+            truncated["history_messages"] = len(history) - len(kept_history)
+
+        # Documents in rank order; the last one may be cut to fit
+        kept_docs: List[str] = []
+        for doc in documents:
+            cost = estimate_tokens(doc) + 2
+            remaining = budget - used
+            if cost <= remaining:
+                kept_docs.append(doc)
+                used += cost
+                continue
+            if remaining >= self.min_document_tokens:
+                cut = self._cut_to_tokens(doc, remaining - 2)
+                kept_docs.append(cut)
+                used += estimate_tokens(cut) + 2
+                truncated["document_chars"] = len(doc) - len(cut)
+            break
+        dropped_docs = len(documents) - len(kept_docs)
+        if dropped_docs:
+            truncated["documents"] = dropped_docs
+
+        for part, amount in truncated.items():
+            PROMPT_TRUNCATIONS.labels(part=part).inc(amount)
+        PROMPT_TOKENS.observe(used)
+
+        return AssembledPrompt(
+            history=kept_history,
+            documents=kept_docs,
+            max_output_tokens=self.max_output_tokens,
+            prompt_tokens=used,
+            truncated=truncated,
+        )
+
+    @staticmethod
+    def _cut_to_tokens(text: str, tokens: int) -> str:
+        """Cut text at a word boundary so it fits roughly within tokens"""
+        ratio = tokens / max(estimate_tokens(text), 1)
+        end = int(len(text) * ratio)
+        space = text.rfind(" ", 0, end)
+        return text[:space if space > 0 else end].rstrip()
@@ -0,0 +1,190 @@
+"""
+Exact-match LLM Response Cache with Redis
+"""
+
+import hashlib
+import json
+import time
+from typing import List, Dict, Any, Optional, AsyncIterator
+from datetime import timedelta
+import redis.asyncio as redis
+
+from app.config import settings
+from app.llm.llm_factory import BaseLLMClient
+from app.metrics import LLM_CACHE_REQUESTS
+
+
+class ResponseCache:
+    """Stores LLM responses in Redis with a TTL and a size cap"""
+
+    def __init__(self):
+        self.redis = redis.from_url(settings.redis_url)
+        self.ttl = timedelta(seconds=settings.llm_cache_ttl)
+        self.max_entries = settings.llm_cache_max_entries
+        self.prefix = "llm_cache"
+        self.index_key = f"{self.prefix}:index"
+        self.stats_key = f"{self.prefix}:stats"
+
+    def make_key(
+        self,
+        model: str,
+        system_prompt: str,
+        user_message: str,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+    ) -> str:
+        """Build the cache key from the model, system prompt, history and message"""
+        system_hash = hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()
+        turns = json.dumps(
+            [conversation_history or [], user_message],
+            ensure_ascii=False,
+            sort_keys=True,
+        )
+        turns_hash = hashlib.sha256(turns.encode("utf-8")).hexdigest()
+        return f"{self.prefix}:{model}:{system_hash}:{turns_hash}"
+
+    async def get(self, key: str) -> Optional[str]:
+        """Get a cached response and count the hit or miss"""
+        try:
+            data = await self.redis.get(key)
+            result = "hit" if data is not None else "miss"
+            await self.redis.hincrby(
+                self.stats_key, "hits" if data is not None else "misses", 1
+            )
+        except redis.RedisError as e:
+            print(f"LLM cache read error: {e}")
+            LLM_CACHE_REQUESTS.labels(result="error").inc()
+            return None
+
+        LLM_CACHE_REQUESTS.labels(result=result).inc()
+        return data.decode("utf-8") if data is not None else None
+
+    async def set(self, key: str, response: str):
+        """
+        Cache a response, evicting the oldest entries above the size cap.
+        Index entries older than the TTL (their keys have expired) are pruned.
+        """
+        now = time.time()
+        try:
+            pipe = self.redis.pipeline()
+            pipe.setex(key, self.ttl, response)
+            pipe.zadd(self.index_key, {key: now})
+            pipe.zremrangebyscore(self.index_key, "-inf", now - self.ttl.total_seconds())
+            pipe.zcard(self.index_key)
+            results = await pipe.execute()
+
+            excess = results[-1] - self.max_entries
+            if excess > 0:
+                evicted = await self.redis.zpopmin(self.index_key, excess)
+                if evicted:
+                    await self.redis.delete(*[member for member, _ in evicted])
+        except redis.RedisError as e:
+            print(f"LLM cache write error: {e}")
+
+    async def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and the number of indexed entries"""
+        stats = await self.redis.hgetall(self.stats_key)
+        hits = int(stats.get(b"hits", 0))
+        misses = int(stats.get(b"misses", 0))
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else 0.0,
+            "entries": await self.redis.zcard(self.index_key),
+        }
+
+    async def close(self):
+        """Close Redis connection"""
+        await self.redis.close()
+
+
+class CachedLLMClient(BaseLLMClient):
+    """
+    Wraps an LLM client with an exact-match response cache.
+    Pass use_cache=False to generate() to bypass the cache for one request.
+    """
+
+    def __init__(self, client: BaseLLMClient, cache: Optional[ResponseCache] = None):
+        self.client = client
+        self.cache = cache or ResponseCache()
+
+    @property
+    def provider(self) -> str:
+        return self.client.provider
+
+    @property
+    def model(self) -> str:
+        return getattr(self.client, "model", "")
+
+    def __getattr__(self, name: str):
+        # Delegate provider-specific helpers (health_check, ...) to the wrapped client
+        return getattr(self.client, name)
+
+    async def generate(
+        self,
+        system_prompt: str,
+        user_message: str,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        **kwargs,
+    ) -> str:
+        """Generate a response, serving identical prompts from the cache"""
+        if not kwargs.pop("use_cache", True):
+            LLM_CACHE_REQUESTS.labels(result="bypass").inc()
+            return await self.client.generate(
+                system_prompt, user_message, conversation_history, **kwargs
+            )
+
+        key = self.cache.make_key(
+            self.model, system_prompt, user_message, conversation_history
+        )
+        cached = await self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        response = await self.client.generate(
+            system_prompt, user_message, conversation_history, **kwargs
+        )
+        if response:
+            await self.cache.set(key, response)
+        return response
+
+    async def generate_stream(
+        self,
+        system_prompt: str,
+        user_message: str,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        **kwargs,
+    ) -> AsyncIterator[str]:
+        """Stream a response; a cache hit is yielded as a single chunk"""
+        if not kwargs.pop("use_cache", True):
+            LLM_CACHE_REQUESTS.labels(result="bypass").inc()
+            async for chunk in self.client.generate_stream(
+                system_prompt, user_message, conversation_history, **kwargs
+            ):
+                yield chunk
+            return
+
+        key = self.cache.make_key(
+            self.model, system_prompt, user_message, conversation_history
+        )
+        cached = await self.cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+        chunks = []
+        async for chunk in self.client.generate_stream(
+            system_prompt, user_message, conversation_history, **kwargs
+        ):
+            chunks.append(chunk)
+            yield chunk
+
+        response = "".join(chunks)
+        if response:
+            await self.cache.set(key, response)
+
+    async def embed(self, text: str) -> List[float]:
+        return await self.client.embed(text)
+
+    async def embed_many(self, texts: List[str], **kwargs) -> List[List[float]]:
+        return await self.client.embed_many(texts, **kwargs)
@@ -0,0 +1,199 @@
+"""
+Deadline-aware Retries for LLM calls
+"""
+
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, List, Dict, Optional, AsyncIterator
+
+import httpx
+
+from app.config import settings
+from app.llm.llm_factory import BaseLLMClient
+from app.llm.deadline import LLMDeadlineExceededError, time_left
+from app.metrics import LLM_RETRIES, LLM_RETRY_GIVEUPS
+
+# 529 is Anthropic's "overloaded"
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504, 529}
+
+
+def retry_reason(error: Exception) -> Optional[str]:
+    """Why an error is worth retrying, or None if it is not"""
+    if isinstance(error, httpx.HTTPStatusError):
+        status_code = error.response.status_code
+        return str(status_code) if status_code in RETRYABLE_STATUS_CODES else None
+    if isinstance(error, httpx.TimeoutException):
+        return "timeout"
+    if isinstance(error, (httpx.NetworkError, httpx.RemoteProtocolError)):
+        return "transport"
+    return None
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Delay requested by the provider's Retry-After header (seconds or HTTP date)"""
+    if not isinstance(error, httpx.HTTPStatusError):
+        return None
+    value = error.response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+class RetryingLLMClient(BaseLLMClient):
+    """
+    Retries transient provider failures (429, 5xx, 529, connection errors and
+    timeouts) with jittered exponential backoff, waiting at least as long as
+    Retry-After. A retry only starts if the wait plus a typical attempt fits
+    in the time left before the call's deadline.
+    Streams are retried only until their first chunk.
+    """
+
+    def __init__(
+        self,
+        client: BaseLLMClient,
+        max_retries: Optional[int] = None,
+        base_delay: Optional[float] = None,
+        max_delay: Optional[float] = None,
+    ):
+        self.client = client
+        self.max_retries = settings.llm_max_retries if max_retries is None else max_retries
+        self.base_delay = settings.llm_retry_base_delay if base_delay is None else base_delay
+        self.max_delay = settings.llm_retry_max_delay if max_delay is None else max_delay
+        # Moving average of successful generation time, to judge whether a retry fits
+        self._attempt_seconds = settings.llm_retry_min_attempt_seconds
+
+    @property
+    def provider(self) -> str:
+        return self.client.provider
+
+    @property
+    def model(self) -> str:
+        return getattr(self.client, "model", "")
+
+    def __getattr__(self, name: str):
+        return getattr(self.client, name)
+
+    def _record_attempt(self, seconds: float):
+        self._attempt_seconds = max(
+            settings.llm_retry_min_attempt_seconds,
+            0.8 * self._attempt_seconds + 0.2 * seconds,
+        )
+
+    def _give_up(self, error: Exception, reason: str, deadline: Optional[float]) -> Exception:
+        LLM_RETRY_GIVEUPS.labels(provider=self.provider, reason=reason).inc()
+        if isinstance(error, httpx.TimeoutException) and (time_left(deadline) or 0) <= 0:
+            return LLMDeadlineExceededError("LLM call timed out at the request deadline")
+        return error
+
+    def _retry_delay(
+        self,
+        error: Exception,
+        attempt: int,
+        deadline: Optional[float],
+    ) -> Optional[float]:
+        """
+        Seconds to wait before retrying, or None if the error is not
+        retryable. Raises when a retryable error cannot be retried.
+        """
+        reason = retry_reason(error)
+        if reason is None:
+            return None
+        if attempt >= self.max_retries:
+            raise self._give_up(error, "attempts", deadline) from error
+
+        delay = backoff_delay(attempt, self.base_delay, self.max_delay)
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            if deadline is None and retry_after > self.max_delay:
+                raise self._give_up(error, "retry_after", deadline) from error
+            delay = max(delay, retry_after)
+
+        left = time_left(deadline)
+        if left is not None and delay + self._attempt_seconds > left:
+            raise self._give_up(error, "deadline", deadline) from error
+
+        LLM_RETRIES.labels(provider=self.provider, reason=reason).inc()
+        return delay
+
+    async def _with_retries(
+        self,
+        func: Callable[[], Awaitable[Any]],
+        deadline: Optional[float] = None,
+    ) -> Any:
+        attempt = 0
+        while True:
+            try:
+                return await func()
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, deadline)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    async def generate(
+        self,
+        system_prompt: str,
+        user_message: str,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        **kwargs,
+    ) -> str:
+        async def attempt() -> str:
+            started = time.monotonic()
+            result = await self.client.generate(
+                system_prompt, user_message, conversation_history, **kwargs
+            )
+            self._record_attempt(time.monotonic() - started)
+            return result
+
+        return await self._with_retries(attempt, kwargs.get("deadline"))
+
+    async def generate_stream(
+        self,
+        system_prompt: str,
+        user_message: str,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        **kwargs,
+    ) -> AsyncIterator[str]:
+        deadline = kwargs.get("deadline")
+        attempt = 0
+        while True:
+            started = time.monotonic()
+            streamed = False
+            try:
+                async for chunk in self.client.generate_stream(
+                    system_prompt, user_message, conversation_history, **kwargs
+                ):
+                    streamed = True
+                    yield chunk
+            except Exception as e:
+                if streamed:
+                    raise
+                delay = self._retry_delay(e, attempt, deadline)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            self._record_attempt(time.monotonic() - started)
+            return
+
+    async def embed(self, text: str) -> List[float]:
+        return await self._with_retries(lambda: self.client.embed(text))
+
+    async def embed_many(self, texts: List[str], **kwargs) -> List[List[float]]:
+        return await self._with_retries(lambda: self.client.embed_many(texts, **kwargs))
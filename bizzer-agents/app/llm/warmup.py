@@ -0,0 +1,60 @@
+"""
+Ollama Model Warm-up
+"""
+
+import asyncio
+from typing import Optional
+
+from app.config import settings, LLMProvider
+from app.llm.llm_factory import LLMFactory
+
+_rewarm_task: Optional[asyncio.Task] = None
+
+
+def warmup_required() -> bool:
+    """Whether the provider chain includes Ollama and warm-up is enabled"""
+    return (
+        settings.ollama_warmup_enabled
+        and LLMProvider.OLLAMA in LLMFactory.get_provider_chain()
+    )
+
+
+async def warm_up_ollama(ready: asyncio.Event, max_delay: float = 30.0):
+    """
+    Load the configured Ollama model, retrying with backoff until it succeeds
+    (Ollama may still be starting or pulling the model), then mark ready.
+    """
+    client = LLMFactory.get_provider_client(LLMProvider.OLLAMA)
+    delay = 1.0
+    while True:
+        try:
+            await client.warm_up()
+            print(f"Ollama model {client.model} loaded")
+            ready.set()
+            return
+        except Exception as e:
+            print(f"Ollama warm-up failed ({e}), retrying in {delay:.0f}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, max_delay)
+
+
+async def ensure_model_loaded() -> bool:
+    """
+    Check that the Ollama model is still loaded; if Ollama unloaded it,
+    start a background warm-up so the next chat does not pay the load time.
+    """
+    global _rewarm_task
+    client = LLMFactory.get_provider_client(LLMProvider.OLLAMA)
+    if await client.is_model_loaded():
+        return True
+
+    if _rewarm_task is None or _rewarm_task.done():
+        _rewarm_task = asyncio.create_task(_rewarm(client))
+    return False
+
+
+async def _rewarm(client):
+    try:
+        await client.warm_up()
+    except Exception as e:
+        print(f"Ollama re-warm failed: {e}")
@@ -3,12 +3,21 @@ Bizzer Agents - FastAPI Application
 Smart Agents with RAG for automated customer service
 """
 
-from fastapi import FastAPI
+import asyncio
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
 from app.config import settings
 from app.api.routes import chat, knowledge, health
+from app.agents.bizzer_agent import BizzerAgent
+from app.llm.http_pool import init_http_clients, close_http_clients
+from app.llm.llm_factory import LLMFactory
+from app.llm.warmup import warmup_required, warm_up_ollama
+from app.rag.embeddings import close_embedding_provider
+from app.rag.retriever import RAGRetriever
+from app.rag.thread_pools import shutdown_thread_pools
+from app.tracing import start_trace
 
 
 @asynccontextmanager
@@ -17,11 +26,33 @@ async def lifespan(app: FastAPI):
     # Startup
     print(f"Starting {settings.app_name}...")
     print(f"LLM Provider: {settings.llm_provider}")
+    init_http_clients(*[provider.value for provider in LLMFactory.get_provider_chain()])
+
+    # One retriever (one Chroma client) and one agent for the whole app
+    app.state.retriever = RAGRetriever()
+    # Documents ingested before language tagging join a language partition
+    await app.state.retriever.tag_languages()
+    app.state.agent = BizzerAgent(retriever=app.state.retriever)
+
+    # Warm up the Ollama model in the background; /ready waits for it
+    app.state.llm_ready = asyncio.Event()
+    warmup_task = None
+    if warmup_required():
+        warmup_task = asyncio.create_task(warm_up_ollama(app.state.llm_ready))
+    else:
+        app.state.llm_ready.set()
 
     yield
 
     # Shutdown
     print(f"Shutting down {settings.app_name}...")
+    if warmup_task and not warmup_task.done():
+        warmup_task.cancel()
+    await app.state.agent.close()
+    await app.state.retriever.close()
+    await close_http_clients()
+    close_embedding_provider()
+    shutdown_thread_pools()
 
 
 app = FastAPI(
@@ -40,6 +71,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.middleware("http")
+async def request_trace(request: Request, call_next):
+    """
+    Trace each request: LLM calls, queue waits and retrieval record spans,
+    returned as a Server-Timing header. Streaming responses send headers
+    before generation ends, so their header only covers the work done
+    before the first byte.
+    """
+    trace = start_trace(request.headers.get("x-request-id"))
+    response = await call_next(request)
+    response.headers["X-Request-ID"] = trace.request_id
+    server_timing = trace.server_timing()
+    if server_timing:
+        response.headers["Server-Timing"] = server_timing
+    if settings.debug and trace.spans:
+        print(trace.summary())
+    return response
+
+
 # Include routers
 app.include_router(health.router, tags=["Health"])
 app.include_router(chat.router, prefix="/chat", tags=["Chat"])
@@ -0,0 +1,214 @@
+"""
+Semantic Answer Cache for near-duplicate questions
+"""
+
+import random
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+from app.config import settings
+from app.metrics import (
+    SEMANTIC_CACHE_REQUESTS,
+    SEMANTIC_CACHE_SIMILARITY,
+    SEMANTIC_CACHE_ENTRIES,
+    SEMANTIC_CACHE_SAMPLED_HITS,
+)
+
+
+@dataclass
+class SemanticCacheEntry:
+    question: str
+    answer: str
+    partition: Tuple[str, str, str]
+    expires_at: float
+
+
+class SemanticCache:
+    """
+    Bounded in-memory cache of answers keyed by question embeddings.
+    An answer is reused only for a question within the similarity threshold
+    and with the same language, recommended solution and profile (a key of
+    the other user context the answer was personalized with).
+    Entries are evicted least-recently-used first and expire after a TTL.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        threshold: float,
+        ttl: int,
+        sample_rate: float,
+    ):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl = ttl
+        self.sample_rate = sample_rate
+
+        self._matrix: Optional[np.ndarray] = None  # (max_entries, dim), normalized rows
+        self._partitions = np.full(max_entries, -1, dtype=np.int32)
+        self._expires = np.zeros(max_entries, dtype=np.float64)
+        self._entries: List[Optional[SemanticCacheEntry]] = [None] * max_entries
+        self._lru: "OrderedDict[int, None]" = OrderedDict()
+        self._partition_codes: Dict[Tuple[str, str, str], int] = {}
+
+        # Recent hits kept for manual false-hit review
+        self.samples: deque = deque(maxlen=100)
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if not vector.size or norm == 0:
+            return None
+        return vector / norm
+
+    @staticmethod
+    def _partition_key(language: str, solution: Optional[str], profile: str) -> Tuple[str, str, str]:
+        return (language or "", solution or "", profile or "")
+
+    def _partition_code(self, key: Tuple[str, str, str]) -> int:
+        if key not in self._partition_codes:
+            if len(self._partition_codes) >= 4 * self.max_entries:
+                self._renumber_partitions()
+            self._partition_codes.setdefault(key, len(self._partition_codes))
+        return self._partition_codes[key]
+
+    def _renumber_partitions(self):
+        """Forget codes of partitions without live entries (one per profile adds up)"""
+        self._partition_codes = {}
+        for slot, entry in enumerate(self._entries):
+            if entry is not None:
+                code = self._partition_codes.setdefault(entry.partition, len(self._partition_codes))
+                self._partitions[slot] = code
+
+    def _evict(self, slot: int):
+        self._entries[slot] = None
+        self._partitions[slot] = -1
+        self._expires[slot] = 0.0
+        self._lru.pop(slot, None)
+
+    def clear(self):
+        """Drop all entries"""
+        self._matrix = None
+        self._partitions.fill(-1)
+        self._expires.fill(0.0)
+        self._partition_codes = {}
+        self._entries = [None] * self.max_entries
+        self._lru.clear()
+        SEMANTIC_CACHE_ENTRIES.set(0)
+
+    def lookup(
+        self,
+        embedding: List[float],
+        question: str,
+        language: str,
+        solution: Optional[str],
+        profile: str = "",
+    ) -> Optional[str]:
+        """Find a cached answer for a similar question in the same partition"""
+        vector = self._normalize(embedding)
+        if vector is None or self._matrix is None or vector.shape[0] != self._matrix.shape[1]:
+            SEMANTIC_CACHE_REQUESTS.labels(result="miss").inc()
+            return None
+
+        code = self._partition_codes.get(self._partition_key(language, solution, profile))
+        if code is None:
+            SEMANTIC_CACHE_REQUESTS.labels(result="miss").inc()
+            return None
+
+        mask = self._partitions == code
+        expired = mask & (self._expires < time.time())
+        if expired.any():
+            for slot in np.flatnonzero(expired):
+                self._evict(int(slot))
+            SEMANTIC_CACHE_ENTRIES.set(len(self._lru))
+            mask &= ~expired
+        if not mask.any():
+            SEMANTIC_CACHE_REQUESTS.labels(result="miss").inc()
+            return None
+
+        scores = np.where(mask, self._matrix @ vector, -1.0)
+        slot = int(np.argmax(scores))
+        similarity = float(scores[slot])
+        SEMANTIC_CACHE_SIMILARITY.observe(max(similarity, 0.0))
+
+        entry = self._entries[slot]
+        if entry is None or similarity < self.threshold:
+            SEMANTIC_CACHE_REQUESTS.labels(result="miss").inc()
+            return None
+
+        self._lru.move_to_end(slot)
+        SEMANTIC_CACHE_REQUESTS.labels(result="hit").inc()
+
+        if random.random() < self.sample_rate:
+            SEMANTIC_CACHE_SAMPLED_HITS.inc()
+            self.samples.append({
+                "question": question,
+                "cached_question": entry.question,
+                "similarity": similarity,
+                "partition": entry.partition,
+            })
+            print(
+                f"Semantic cache sample ({similarity:.3f}): "
+                f"{question!r} -> {entry.question!r}"
+            )
+
+        return entry.answer
+
+    def store(
+        self,
+        embedding: List[float],
+        question: str,
+        answer: str,
+        language: str,
+        solution: Optional[str],
+        profile: str = "",
+    ):
+        """Cache an answer, evicting the least recently used entry when full"""
+        vector = self._normalize(embedding)
+        if vector is None or not answer:
+            return
+
+        if self._matrix is None or vector.shape[0] != self._matrix.shape[1]:
+            # First entry, or the embedding model changed
+            self.clear()
+            self._matrix = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+
+        if len(self._lru) >= self.max_entries:
+            slot, _ = self._lru.popitem(last=False)
+            self._evict(slot)
+        else:
+            slot = self._entries.index(None)
+
+        partition = self._partition_key(language, solution, profile)
+        expires_at = time.time() + self.ttl
+        self._matrix[slot] = vector
+        self._entries[slot] = SemanticCacheEntry(
+            question=question,
+            answer=answer,
+            partition=partition,
+            expires_at=expires_at,
+        )
+        self._partitions[slot] = self._partition_code(partition)
+        self._expires[slot] = expires_at
+        self._lru[slot] = None
+        SEMANTIC_CACHE_ENTRIES.set(len(self._lru))
+
+
+_semantic_cache: Optional[SemanticCache] = None
+
+
+def get_semantic_cache() -> SemanticCache:
+    """Get the process-wide semantic cache"""
+    global _semantic_cache
+    if _semantic_cache is None:
+        _semantic_cache = SemanticCache(
+            max_entries=settings.semantic_cache_max_entries,
+            threshold=settings.semantic_cache_threshold,
+            ttl=settings.semantic_cache_ttl,
+            sample_rate=settings.semantic_cache_sample_rate,
+        )
+    return _semantic_cache
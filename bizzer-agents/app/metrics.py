@@ -0,0 +1,205 @@
+"""
+Prometheus Metrics for Bizzer Agents
+"""
+
+from prometheus_client import Counter, Gauge, Histogram
+
+# Per-call LLM instrumentation
+LLM_CALLS = Counter(
+    "llm_calls_total",
+    "Provider calls by operation and outcome",
+    ["provider", "model", "operation", "outcome"],  # success, error, cancelled
+)
+LLM_CALL_SECONDS = Histogram(
+    "llm_call_seconds",
+    "Wall time of provider calls",
+    ["provider", "model", "operation"],  # generate, stream, embed
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120),
+)
+LLM_TIME_TO_FIRST_TOKEN_SECONDS = Histogram(
+    "llm_time_to_first_token_seconds",
+    "Time from request to the first streamed chunk",
+    ["provider", "model"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30),
+)
+LLM_TOKENS = Counter(
+    "llm_tokens_total",
+    "Tokens reported by providers",
+    ["provider", "model", "kind"],  # prompt, completion
+)
+LLM_TOKENS_PER_SECOND = Histogram(
+    "llm_tokens_per_second",
+    "Completion tokens generated per second",
+    ["provider", "model"],
+    buckets=(1, 2, 5, 10, 20, 40, 60, 80, 100, 150, 200),
+)
+
+# LLM response cache
+LLM_CACHE_REQUESTS = Counter(
+    "llm_cache_requests_total",
+    "LLM response cache lookups",
+    ["result"],  # hit, miss, bypass, error
+)
+
+# LLM admission control
+LLM_QUEUE_DEPTH = Gauge(
+    "llm_queue_depth",
+    "LLM calls waiting for a concurrency slot",
+    ["provider"],
+)
+LLM_ACTIVE_CALLS = Gauge(
+    "llm_active_calls",
+    "LLM calls currently running",
+    ["provider"],
+)
+LLM_QUEUE_WAIT_SECONDS = Histogram(
+    "llm_queue_wait_seconds",
+    "Time LLM calls wait for a concurrency slot",
+    ["provider"],
+    buckets=(0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+LLM_ADMISSION_REJECTED = Counter(
+    "llm_admission_rejected_total",
+    "LLM calls rejected by admission control",
+    ["provider", "reason"],  # queue_full, queue_timeout, deadline
+)
+
+# Single-flight coalescing
+LLM_COALESCED_CALLS = Counter(
+    "llm_coalesced_calls_total",
+    "LLM calls that joined an identical in-flight call",
+    ["operation"],  # generate, embed
+)
+
+# Fallback chain and circuit breakers
+LLM_PROVIDER_OUTCOMES = Counter(
+    "llm_provider_outcomes_total",
+    "Outcomes of calls made through the provider fallback chain",
+    ["provider", "outcome"],  # success, failure, rejected, deadline, skipped, cancelled
+)
+LLM_CIRCUIT_STATE = Gauge(
+    "llm_circuit_state",
+    "Circuit breaker state per provider (1 for the current state)",
+    ["provider", "state"],
+)
+LLM_HEDGED_REQUESTS = Counter(
+    "llm_hedged_requests_total",
+    "Calls hedged with a second provider after the hedge delay",
+    ["provider"],
+)
+
+# Retries
+LLM_RETRIES = Counter(
+    "llm_retries_total",
+    "Provider calls retried after a transient failure",
+    ["provider", "reason"],  # status code, timeout, transport
+)
+LLM_RETRY_GIVEUPS = Counter(
+    "llm_retry_giveups_total",
+    "Retryable failures that were not retried",
+    ["provider", "reason"],  # attempts, deadline, retry_after
+)
+
+# Provider-side prompt caching
+LLM_PROMPT_CACHE_TOKENS = Counter(
+    "llm_prompt_cache_tokens_total",
+    "Input tokens read from or written to the provider prompt cache",
+    ["provider", "kind"],  # read, write
+)
+
+# Prompt assembly
+PROMPT_TOKENS = Histogram(
+    "prompt_estimated_tokens",
+    "Estimated prompt tokens after budgeting",
+    buckets=(256, 512, 1024, 2048, 4096, 8192, 16384, 32768),
+)
+PROMPT_TRUNCATIONS = Counter(
+    "prompt_truncations_total",
+    "Prompt content dropped to fit the token budget",
+    ["part"],  # history_messages, documents, document_chars
+)
+
+# RAG thread pools
+RAG_POOL_QUEUE_DEPTH = Gauge(
+    "rag_pool_queue_depth",
+    "Blocking RAG calls waiting for a worker thread",
+    ["pool"],  # query, ingest
+)
+RAG_POOL_ACTIVE = Gauge(
+    "rag_pool_active",
+    "Blocking RAG calls running on a worker thread",
+    ["pool"],
+)
+RAG_POOL_WAIT_SECONDS = Histogram(
+    "rag_pool_wait_seconds",
+    "Time blocking RAG calls wait for a worker thread",
+    ["pool"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+RAG_POOL_TASK_SECONDS = Histogram(
+    "rag_pool_task_seconds",
+    "Run time of blocking RAG calls",
+    ["pool"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+
+# Reranking
+RERANK_SECONDS = Histogram(
+    "rag_rerank_seconds",
+    "Time spent reranking retrieval candidates, including the pool wait",
+    ["reranker"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+)
+RERANK_TOP_K_CHANGE = Histogram(
+    "rag_rerank_top_k_change",
+    "Share of the reranked top k that was outside the retrieval top k",
+    ["reranker"],
+    buckets=(0, 0.2, 0.34, 0.5, 0.67, 0.8, 1.0),
+)
+RERANK_BUDGET_EXHAUSTED = Counter(
+    "rag_rerank_budget_exhausted_total",
+    "Reranks stopped by the latency budget before every candidate was scored",
+    ["reranker"],
+)
+
+# Retrieval result cache
+RETRIEVAL_CACHE_REQUESTS = Counter(
+    "retrieval_cache_requests_total",
+    "Retrieval result cache lookups",
+    ["result"],  # hit, shared_hit, miss, error
+)
+RETRIEVAL_CACHE_ENTRIES = Gauge(
+    "retrieval_cache_entries",
+    "Search results held in the in-process retrieval cache",
+)
+
+# Persistent embedding cache
+EMBEDDING_CACHE_REQUESTS = Counter(
+    "embedding_cache_requests_total",
+    "Embedding cache lookups per text",
+    ["result"],  # hit, miss
+)
+EMBEDDING_CACHE_ENTRIES = Gauge(
+    "embedding_cache_entries",
+    "Vectors held in the persistent embedding cache",
+)
+
+# Semantic answer cache
+SEMANTIC_CACHE_REQUESTS = Counter(
+    "semantic_cache_requests_total",
+    "Semantic answer cache lookups",
+    ["result"],  # hit, miss
+)
+SEMANTIC_CACHE_SIMILARITY = Histogram(
+    "semantic_cache_best_similarity",
+    "Best cosine similarity found per semantic cache lookup",
+    buckets=(0.5, 0.7, 0.8, 0.85, 0.9, 0.92, 0.94, 0.96, 0.98, 1.0),
+)
+SEMANTIC_CACHE_ENTRIES = Gauge(
+    "semantic_cache_entries",
+    "Entries held in the semantic answer cache",
+)
+SEMANTIC_CACHE_SAMPLED_HITS = Counter(
+    "semantic_cache_sampled_hits_total",
+    "Semantic cache hits sampled for false-hit review",
+)
@@ -3,20 +3,25 @@ Document Processor for RAG
 """
 
 import uuid
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from fastapi import UploadFile
+from app.rag.lexical_index import detect_language
 from app.rag.retriever import RAGRetriever
 
 
 class DocumentProcessor:
     """Processes documents for the knowledge base"""
 
-    def __init__(self):
-        self.retriever = RAGRetriever()
+    def __init__(self, retriever: Optional[RAGRetriever] = None):
+        self.retriever = retriever or RAGRetriever()
         self.chunk_size = 1000
         self.chunk_overlap = 200
 
-    async def process_file(self, file: UploadFile) -> Dict[str, Any]:
+    async def process_file(
+        self,
+        file: UploadFile,
+        metadata: Optional[Dict] = None,
+    ) -> Dict[str, Any]:
         """Process an uploaded file"""
         content = await file.read()
 
@@ -32,8 +37,10 @@ class DocumentProcessor:
         # Generate IDs and metadata
         file_id = str(uuid.uuid4())
         ids = [f"{file_id}_{i}" for i in range(len(chunks))]
+        base_metadata = self._base_metadata(text, metadata)
         metadatas = [
             {
+                **base_metadata,
                 "filename": file.filename,
                 "file_id": file_id,
                 "chunk_index": i,
@@ -55,6 +62,16 @@ class DocumentProcessor:
             "chunks_created": len(chunks),
         }
 
+    @staticmethod
+    def _base_metadata(text: str, metadata: Optional[Dict]) -> Dict[str, Any]:
+        """
+        Metadata shared by a document's chunks. The language partition
+        ("language") is detected from the whole text unless given.
+        """
+        base_metadata = {k: v for k, v in (metadata or {}).items() if v is not None}
+        base_metadata.setdefault("language", detect_language(text))
+        return base_metadata
+
     def _split_text(self, text: str) -> List[str]:
         """Split text into chunks"""
         chunks = []
@@ -95,7 +112,7 @@ class DocumentProcessor:
         doc_id = str(uuid.uuid4())
         ids = [f"{doc_id}_{i}" for i in range(len(chunks))]
 
-        base_metadata = metadata or {}
+        base_metadata = self._base_metadata(text, metadata)
         metadatas = [
             {**base_metadata, "doc_id": doc_id, "chunk_index": i}
             for i in range(len(chunks))
@@ -112,7 +129,3 @@ class DocumentProcessor:
             "doc_id": doc_id,
             "chunks_created": len(chunks),
         }
-
-
-# Make Optional available
-from typing import Optional
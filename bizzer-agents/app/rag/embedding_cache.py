@@ -0,0 +1,186 @@
+"""
+Persistent Embedding Cache keyed by model and content hash
+"""
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+
+from app.config import settings
+from app.metrics import EMBEDDING_CACHE_REQUESTS, EMBEDDING_CACHE_ENTRIES
+from app.rag.embeddings import EmbeddingProvider
+
+# SQLite limits the number of bound parameters per statement
+_MAX_KEYS_PER_QUERY = 500
+
+
+def content_key(model: str, text: str) -> str:
+    """Cache key: embedding model plus SHA-256 of the text"""
+    return f"{model}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+
+
+class EmbeddingCache:
+    """
+    Disk-backed map from (model, text hash) to a float32 vector.
+    SQLite with a memory-mapped file, so warm reads avoid syscalls.
+    When full, the least recently used tenth of the entries is evicted.
+    """
+
+    def __init__(self, path: str, max_entries: int, mmap_bytes: int = 256 * 1024 * 1024):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(f"PRAGMA mmap_size={int(mmap_bytes)}")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " vector BLOB NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_accessed_at ON embeddings (accessed_at)"
+        )
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        EMBEDDING_CACHE_ENTRIES.set(self._count)
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        """Vectors found for the given keys; refreshes their access time"""
+        found: Dict[str, List[float]] = {}
+        unique = list(dict.fromkeys(keys))
+        now = time.time()
+        with self._lock:
+            for i in range(0, len(unique), _MAX_KEYS_PER_QUERY):
+                chunk = unique[i:i + _MAX_KEYS_PER_QUERY]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+                if rows:
+                    self._conn.execute(
+                        f"UPDATE embeddings SET accessed_at = ? WHERE key IN ({placeholders})",
+                        [now, *chunk],
+                    )
+            self._conn.commit()
+
+        hits = sum(1 for key in keys if key in found)
+        self.hits += hits
+        self.misses += len(keys) - hits
+        EMBEDDING_CACHE_REQUESTS.labels(result="hit").inc(hits)
+        EMBEDDING_CACHE_REQUESTS.labels(result="miss").inc(len(keys) - hits)
+        return found
+
+    def set_many(self, items: Dict[str, List[float]]):
+        """Store vectors, evicting least recently used entries when over capacity"""
+        if not items:
+            return
+        now = time.time()
+        rows = [
+            (key, np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for key, vector in items.items()
+            if vector
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, accessed_at) VALUES (?, ?, ?)",
+                rows,
+            )
+            self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            if self._count > self.max_entries:
+                evict = self._count - self.max_entries + self.max_entries // 10
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN ("
+                    " SELECT key FROM embeddings ORDER BY accessed_at LIMIT ?)",
+                    (evict,),
+                )
+                self._count -= evict
+            self._conn.commit()
+        EMBEDDING_CACHE_ENTRIES.set(self._count)
+
+    def get_stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": self._count,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbeddingProvider(EmbeddingProvider):
+    """Wraps an embedding provider so each (model, text) is embedded once"""
+
+    def __init__(self, provider: EmbeddingProvider, cache: EmbeddingCache):
+        self.provider = provider
+        self.cache = cache
+        self.model_name = provider.model_name
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        return await self._embed_cached(texts, self.provider.embed)
+
+    async def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        return await self._embed_cached(texts, self.provider.embed_queries)
+
+    async def _embed_cached(
+        self,
+        texts: List[str],
+        compute: Callable[[List[str]], Awaitable[List[List[float]]]],
+    ) -> List[List[float]]:
+        if not texts:
+            return []
+
+        keys = [content_key(self.model_name, text) for text in texts]
+        found = await asyncio.to_thread(self.cache.get_many, keys)
+
+        # Embed each missing text once, even if it repeats in the batch
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+        if missing:
+            vectors = await compute(list(missing.values()))
+            if len(vectors) != len(missing):
+                # Nothing is cached from an incomplete batch
+                raise ValueError(
+                    f"Embedding provider {self.model_name} returned {len(vectors)} "
+                    f"vectors for {len(missing)} texts"
+                )
+            computed = dict(zip(missing.keys(), vectors))
+            await asyncio.to_thread(self.cache.set_many, computed)
+            found.update(computed)
+
+        return [found[key] for key in keys]
+
+    async def embed_query(self, text: str) -> List[float]:
+        key = content_key(self.model_name, text)
+        found = await asyncio.to_thread(self.cache.get_many, [key])
+        if key in found:
+            return found[key]
+        vector = await self.provider.embed_query(text)
+        await asyncio.to_thread(self.cache.set_many, {key: vector})
+        return vector
+
+    def close(self):
+        self.provider.close()
+        self.cache.close()
@@ -0,0 +1,144 @@
+"""
+Embedding Providers for RAG
+Decoupled from the chat provider so retrieval works with any LLM
+"""
+
+import asyncio
+from abc import ABC, abstractmethod
+from typing import List, Optional
+
+from app.config import settings, LLMProvider
+from app.llm.llm_factory import BaseLLMClient, LLMFactory
+from app.rag.thread_pools import get_thread_pool
+
+
+class EmbeddingProvider(ABC):
+    """Abstract base class for embedding backends"""
+
+    # Identifies the vector space; vectors from different models must not mix
+    model_name: str = "unknown"
+
+    @abstractmethod
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts, returning vectors in input order"""
+        pass
+
+    async def embed_query(self, text: str) -> List[float]:
+        """Embed a single search query"""
+        vectors = await self.embed([text])
+        return vectors[0] if vectors else []
+
+    async def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed a batch of live search queries"""
+        return await self.embed(texts)
+
+    def close(self):
+        """Release resources held by the backend"""
+        pass
+
+
+class LocalEmbeddingProvider(EmbeddingProvider):
+    """
+    In-process CPU embeddings with Chroma's bundled ONNX all-MiniLM-L6-v2,
+    the same model as Chroma's default embedding function, so collections
+    built before this backend existed stay valid.
+    Bulk batches run on the ingest thread pool and queries (single or
+    batched) on the query pool, so an upload does not delay live searches.
+    """
+
+    model_name = "all-MiniLM-L6-v2"
+
+    def __init__(self, batch_size: int):
+        from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
+
+        self.batch_size = batch_size
+        self._function = DefaultEmbeddingFunction()
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        return [[float(value) for value in vector] for vector in self._function(texts)]
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        return await self._embed_on("ingest", texts)
+
+    async def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        return await self._embed_on("query", texts)
+
+    async def _embed_on(self, pool_name: str, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+
+        pool = get_thread_pool(pool_name)
+        batches = [
+            texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)
+        ]
+        results = await asyncio.gather(*(pool.run(self._embed_batch, batch) for batch in batches))
+        return [vector for batch_vectors in results for vector in batch_vectors]
+
+    async def embed_query(self, text: str) -> List[float]:
+        vectors = await get_thread_pool("query").run(self._embed_batch, [text])
+        return vectors[0] if vectors else []
+
+
+class LLMEmbeddingProvider(EmbeddingProvider):
+    """Embeddings from an LLM provider's embedding API (Ollama, OpenAI)"""
+
+    def __init__(self, client: BaseLLMClient, model: str):
+        self.client = client
+        self.model_name = f"{client.provider}/{model}"
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        return await self.client.embed_many(texts)
+
+
+def _create_embedding_provider() -> EmbeddingProvider:
+    from app.llm.admission import AdmissionControlledClient
+    from app.llm.retry import RetryingLLMClient
+
+    backend = settings.embedding_provider
+    if backend == "local":
+        return LocalEmbeddingProvider(batch_size=settings.embedding_batch_size)
+    elif backend == LLMProvider.OLLAMA.value:
+        from app.llm.ollama_client import OllamaClient
+        client = OllamaClient(
+            base_url=settings.ollama_base_url,
+            model=settings.ollama_embedding_model,
+            keep_alive=settings.ollama_keep_alive,
+        )
+        model = settings.ollama_embedding_model
+    elif backend == LLMProvider.OPENAI.value:
+        client = LLMFactory.get_provider_client(LLMProvider.OPENAI)
+        model = client.embedding_model
+    else:
+        raise ValueError(f"Unsupported embedding provider: {backend}")
+
+    return LLMEmbeddingProvider(
+        RetryingLLMClient(AdmissionControlledClient(client)), model
+    )
+
+
+_embedding_provider: Optional[EmbeddingProvider] = None
+
+
+def get_embedding_provider() -> EmbeddingProvider:
+    """Get the process-wide embedding provider (behind the persistent cache if enabled)"""
+    global _embedding_provider
+    if _embedding_provider is None:
+        provider = _create_embedding_provider()
+        if settings.embedding_cache_enabled:
+            from app.rag.embedding_cache import EmbeddingCache, CachedEmbeddingProvider
+            provider = CachedEmbeddingProvider(
+                provider,
+                EmbeddingCache(
+                    path=settings.embedding_cache_path,
+                    max_entries=settings.embedding_cache_max_entries,
+                ),
+            )
+        _embedding_provider = provider
+    return _embedding_provider
+
+
+def close_embedding_provider():
+    global _embedding_provider
+    if _embedding_provider is not None:
+        _embedding_provider.close()
+        _embedding_provider = None
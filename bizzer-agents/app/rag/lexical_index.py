@@ -0,0 +1,452 @@
+"""
+BM25 Lexical Index for hybrid retrieval
+Catches product names and acronyms ("Deal Visor", ESG, DD) that
+embeddings rank poorly.
+"""
+
+import heapq
+import math
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter
+from typing import Container, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+STOPWORDS = {
+    "en": frozenset(
+        "a about after all also an and any are as at be been before but by can could "
+        "did do does for from had has have how i if in into is it its just may me more "
+        "most my no not of on or our out over so some such than that the their them then "
+        "there these they this those to up us was we were what when where which while who "
+        "why will with would you your".split()
+    ),
+    "es": frozenset(
+        "a al algo algun alguna algunas alguno algunos ante antes como con contra cual "
+        "cuales cuando de del desde donde durante e el ella ellas ellos en entre era eran "
+        "es esa esas ese eso esos esta estas este esto estos fue fueron ha han hasta hay "
+        "la las le les lo los mas me mi mis muy nada ni no nos nosotros o os otra otras "
+        "otro otros para pero poco por porque que quien se ser si sin sobre su sus tambien "
+        "te tiene tienen todo todos tu tus un una unas uno unos usted y ya yo".split()
+    ),
+}
+
+
+def _fold(text: str) -> str:
+    """Lowercase and strip accents, so "Auditoría" matches "auditoria" """
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def _stem_en(token: str) -> str:
+    """Light English stemmer: plurals and -ing/-ed"""
+    if len(token) <= 4:
+        return token
+    if token.endswith("ies"):
+        token = token[:-3] + "y"
+    elif token.endswith("sses"):
+        token = token[:-2]
+    elif token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        token = token[:-1]
+    if token.endswith("ing") and len(token) > 6:
+        token = token[:-3]
+    elif token.endswith("ed") and len(token) > 5:
+        token = token[:-2]
+    return token
+
+
+def _stem_es(token: str) -> str:
+    """Light Spanish stemmer: plurals and the final gender vowel"""
+    if len(token) <= 4:
+        return token
+    if token.endswith("ces"):
+        token = token[:-3] + "z"
+    elif token.endswith("es") and token[-3] not in "aeiou":
+        token = token[:-2]
+    elif token.endswith("s"):
+        token = token[:-1]
+    if len(token) > 4 and token[-1] in "aoe":
+        token = token[:-1]
+    return token
+
+
+_STEMMERS = {"en": _stem_en, "es": _stem_es}
+
+
+def detect_language(text: str) -> str:
+    """Spanish or English, by stopword counts; ties go to Spanish"""
+    tokens = _TOKEN_RE.findall(_fold(text))
+    es = sum(1 for token in tokens if token in STOPWORDS["es"])
+    en = sum(1 for token in tokens if token in STOPWORDS["en"])
+    return "en" if en > es else "es"
+
+
+def analyze(text: str, language: str) -> List[str]:
+    """Tokens of a document: folded, stopwords removed, stemmed for its language"""
+    stopwords = STOPWORDS.get(language, STOPWORDS["es"])
+    stem = _STEMMERS.get(language, _stem_es)
+    return [
+        stem(token)
+        for token in _TOKEN_RE.findall(_fold(text))
+        if token not in stopwords
+    ]
+
+
+def query_words(text: str) -> List[List[str]]:
+    """
+    Each word of a query as its stems in both languages, since a query may
+    target documents in either. Stopwords of either language are dropped.
+    """
+    words = []
+    for token in _TOKEN_RE.findall(_fold(text)):
+        if token in STOPWORDS["es"] or token in STOPWORDS["en"]:
+            continue
+        words.append(list(dict.fromkeys(stem(token) for stem in _STEMMERS.values())))
+    return words
+
+
+def analyze_query(text: str) -> List[str]:
+    """Distinct terms of a query (see query_words)"""
+    return list(dict.fromkeys(term for stems in query_words(text) for term in stems))
+
+
+class BM25Index:
+    """
+    Okapi BM25 inverted index that updates incrementally.
+
+    Documents live in two parts: a compact base segment, stored as CSR
+    posting arrays (per term, the rows and frequencies of the documents
+    that contain it), and a small dict of documents added since the last
+    compaction. Deletions from the base only clear an alive flag.
+    compact() merges both into a new base without holding the search lock;
+    writes made meanwhile are journaled and replayed onto the new base.
+    save() compacts and writes the base as one .npz of flat arrays, so
+    loading is a few array reads with nothing to rebuild.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._set_base([], [], np.zeros(1, dtype=np.int64),
+                       np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.uint16),
+                       np.zeros(0, dtype=np.float32))
+        self._docs: Dict[str, Dict[str, int]] = {}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        # Documents added or deleted since the last save
+        self.pending_changes = 0
+        # Writes made while a compaction runs, as (doc_id, term_freqs or None)
+        self._journal: Optional[List[Tuple[str, Optional[Dict[str, int]]]]] = None
+        self._compact_lock = threading.Lock()
+
+    def _set_base(
+        self,
+        doc_ids: List[str],
+        terms: List[str],
+        indptr: np.ndarray,
+        rows: np.ndarray,
+        freqs: np.ndarray,
+        lengths: np.ndarray,
+    ):
+        self._base_ids = doc_ids
+        self._base_rows = {doc_id: row for row, doc_id in enumerate(doc_ids)}
+        self._base_terms = {term: i for i, term in enumerate(terms)}
+        self._indptr = indptr
+        self._rows = rows
+        self._freqs = freqs
+        self._lengths = lengths
+        self._alive = np.ones(len(doc_ids), dtype=bool)
+        self._n_alive = len(doc_ids)
+        self._total_length = float(lengths.sum())
+
+    def __len__(self) -> int:
+        return self._n_alive + len(self._docs)
+
+    def _remove(self, doc_id: str):
+        row = self._base_rows.get(doc_id)
+        if row is not None and self._alive[row]:
+            self._alive[row] = False
+            self._n_alive -= 1
+            self._total_length -= float(self._lengths[row])
+            return
+
+        term_freqs = self._docs.pop(doc_id, None)
+        if term_freqs is None:
+            return
+        self._total_length -= sum(term_freqs.values())
+        for term in term_freqs:
+            posting = self._postings[term]
+            del posting[doc_id]
+            if not posting:
+                del self._postings[term]
+
+    def add(
+        self,
+        ids: List[str],
+        documents: List[str],
+        languages: Optional[List[Optional[str]]] = None,
+    ):
+        """Index documents, replacing any already indexed under the same id"""
+        languages = languages or [None] * len(documents)
+        analyzed = [
+            Counter(analyze(document, language or detect_language(document)))
+            for document, language in zip(documents, languages)
+        ]
+        with self._lock:
+            for doc_id, term_freqs in zip(ids, analyzed):
+                self._remove(doc_id)
+                self._insert(doc_id, dict(term_freqs))
+                if self._journal is not None:
+                    self._journal.append((doc_id, self._docs[doc_id]))
+            self.pending_changes += len(ids)
+
+    def _insert(self, doc_id: str, term_freqs: Dict[str, int]):
+        self._docs[doc_id] = term_freqs
+        self._total_length += sum(term_freqs.values())
+        for term, freq in term_freqs.items():
+            self._postings.setdefault(term, {})[doc_id] = freq
+
+    def delete(self, ids: Iterable[str]):
+        with self._lock:
+            for doc_id in ids:
+                self._remove(doc_id)
+                if self._journal is not None:
+                    self._journal.append((doc_id, None))
+                self.pending_changes += 1
+
+    def search(
+        self,
+        query: str,
+        top_k: int,
+        allowed: Optional[Container[str]] = None,
+    ) -> List[Tuple[str, float]]:
+        """
+        Best (doc_id, score) pairs for the query, highest score first.
+        allowed restricts results to those ids (e.g. a metadata partition);
+        matches are then taken in score order until top_k are allowed.
+        """
+        terms = analyze_query(query)
+        with self._lock:
+            n_docs = len(self)
+            if not n_docs or not terms:
+                return []
+            avg_length = self._total_length / n_docs
+            base_scores = np.zeros(len(self._base_ids), dtype=np.float32)
+            scores: Dict[str, float] = {}
+
+            for term in terms:
+                term_id = self._base_terms.get(term)
+                if term_id is not None:
+                    start, end = self._indptr[term_id], self._indptr[term_id + 1]
+                    rows = self._rows[start:end]
+                    freqs = self._freqs[start:end].astype(np.float32)
+                    base_df = int(np.count_nonzero(self._alive[rows]))
+                else:
+                    base_df = 0
+                posting = self._postings.get(term, {})
+                df = base_df + len(posting)
+                if not df:
+                    continue
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+
+                if base_df:
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[rows] / avg_length)
+                    base_scores[rows] += idf * freqs * (self.k1 + 1) / (freqs + norm)
+                for doc_id, freq in posting.items():
+                    length = sum(self._docs[doc_id].values())
+                    norm = self.k1 * (1 - self.b + self.b * length / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * freq * (self.k1 + 1) / (freq + norm)
+
+            base_scores[~self._alive] = 0
+            matched = np.flatnonzero(base_scores)
+            if allowed is not None:
+                scores = {doc_id: score for doc_id, score in scores.items() if doc_id in allowed}
+                kept = 0
+                for row in matched[np.argsort(-base_scores[matched], kind="stable")]:
+                    if kept == top_k:
+                        break
+                    doc_id = self._base_ids[row]
+                    if doc_id in allowed:
+                        scores[doc_id] = float(base_scores[row])
+                        kept += 1
+            else:
+                if len(matched) > top_k:
+                    matched = matched[np.argpartition(-base_scores[matched], top_k)[:top_k]]
+                for row in matched:
+                    scores[self._base_ids[row]] = float(base_scores[row])
+        return heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            new_terms = sum(1 for term in self._postings if term not in self._base_terms)
+            return {"documents": len(self), "terms": len(self._base_terms) + new_terms}
+
+    def compact(self):
+        """
+        Merge live base documents and recent additions into a new base.
+        The merge runs on a snapshot outside the search lock (base arrays
+        are never modified in place); writes made meanwhile are replayed.
+        """
+        with self._compact_lock:
+            with self._lock:
+                if not self._docs and self._n_alive == len(self._base_ids):
+                    return
+                snapshot = (
+                    self._base_ids, self._base_terms, self._indptr, self._rows,
+                    self._freqs, self._lengths, self._alive.copy(), dict(self._docs),
+                )
+                self._journal = []
+
+            try:
+                base = self._merge(*snapshot)
+            except BaseException:
+                with self._lock:
+                    self._journal = None
+                raise
+
+            with self._lock:
+                journal, self._journal = self._journal, None
+                self._set_base(*base)
+                self._docs = {}
+                self._postings = {}
+                for doc_id, term_freqs in journal:
+                    self._remove(doc_id)
+                    if term_freqs is not None:
+                        self._insert(doc_id, term_freqs)
+
+    @staticmethod
+    def _merge(
+        base_ids: List[str],
+        base_terms: Dict[str, int],
+        indptr: np.ndarray,
+        base_rows: np.ndarray,
+        base_freqs: np.ndarray,
+        base_lengths: np.ndarray,
+        alive: np.ndarray,
+        docs: Dict[str, Dict[str, int]],
+    ) -> tuple:
+        """Arrays of a new base holding the alive base documents and docs"""
+        # Base postings of documents still alive, renumbered
+        remap = np.cumsum(alive) - 1
+        entry_terms = np.repeat(
+            np.arange(len(base_terms), dtype=np.int64), np.diff(indptr)
+        )
+        keep = alive[base_rows] if len(base_rows) else np.zeros(0, dtype=bool)
+        entry_terms = entry_terms[keep]
+        entry_rows = remap[base_rows[keep]]
+        entry_freqs = base_freqs[keep].astype(np.int64)
+
+        doc_ids = [doc_id for doc_id, is_alive in zip(base_ids, alive) if is_alive]
+        lengths = [base_lengths[alive]]
+        terms = dict(base_terms)
+
+        # Recent additions
+        new_terms: List[int] = []
+        new_rows: List[int] = []
+        new_freqs: List[int] = []
+        new_lengths: List[float] = []
+        for doc_id, term_freqs in docs.items():
+            row = len(doc_ids)
+            doc_ids.append(doc_id)
+            new_lengths.append(sum(term_freqs.values()))
+            for term, freq in term_freqs.items():
+                new_terms.append(terms.setdefault(term, len(terms)))
+                new_rows.append(row)
+                new_freqs.append(freq)
+        lengths.append(np.asarray(new_lengths, dtype=np.float32))
+
+        entry_terms = np.concatenate([entry_terms, np.asarray(new_terms, dtype=np.int64)])
+        entry_rows = np.concatenate([entry_rows, np.asarray(new_rows, dtype=np.int64)])
+        entry_freqs = np.concatenate([entry_freqs, np.asarray(new_freqs, dtype=np.int64)])
+
+        # Drop terms no live document uses, then sort postings by term
+        counts = np.bincount(entry_terms, minlength=len(terms))
+        used = counts > 0
+        term_remap = np.cumsum(used) - 1
+        entry_terms = term_remap[entry_terms]
+        order = np.lexsort((entry_rows, entry_terms))
+        term_list = [term for term, i in sorted(terms.items(), key=lambda item: item[1]) if used[i]]
+        indptr = np.zeros(len(term_list) + 1, dtype=np.int64)
+        np.cumsum(counts[used], out=indptr[1:])
+
+        return (
+            doc_ids,
+            term_list,
+            indptr,
+            entry_rows[order].astype(np.int32),
+            np.minimum(entry_freqs[order], 65535).astype(np.uint16),
+            np.concatenate(lengths).astype(np.float32),
+        )
+
+    def save(self, path: str):
+        """
+        Compact the index and write its base atomically. Writes made while
+        saving stay pending for the next save (base deletions are kept in
+        the saved alive flags).
+        """
+        self.compact()
+        with self._lock:
+            self.pending_changes = len(self._docs)
+            base_ids, base_terms = self._base_ids, self._base_terms
+            arrays = {
+                "indptr": self._indptr,
+                "rows": self._rows,
+                "freqs": self._freqs,
+                "lengths": self._lengths,
+                "alive": self._alive.copy(),
+            }
+        arrays["doc_ids"] = np.frombuffer("\n".join(base_ids).encode("utf-8"), dtype=np.uint8)
+        arrays["terms"] = np.frombuffer("\n".join(base_terms).encode("utf-8"), dtype=np.uint8)
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        """Load a saved index, or return an empty one if there is none"""
+        index = cls()
+        if not os.path.exists(path):
+            return index
+
+        with np.load(path) as data:
+            lengths = data["lengths"]
+            if not len(lengths):
+                return index
+            index._set_base(
+                data["doc_ids"].tobytes().decode("utf-8").split("\n"),
+                data["terms"].tobytes().decode("utf-8").split("\n"),
+                data["indptr"],
+                data["rows"],
+                data["freqs"],
+                lengths,
+            )
+            if "alive" in data.files:
+                index._alive = data["alive"].copy()
+                index._n_alive = int(index._alive.sum())
+                index._total_length = float(lengths[index._alive].sum())
+        return index
+
+
+def reciprocal_rank_fusion(
+    rankings: List[List[str]],
+    k: int = 60,
+) -> List[Tuple[str, float]]:
+    """
+    Fuse ranked id lists: each id scores sum(1 / (k + rank)).
+    Scores are divided by the best possible score, so an id ranked first
+    in every list scores 1.0.
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    best = len(rankings) / (k + 1)
+    fused = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    return [(doc_id, score / best) for doc_id, score in fused]
@@ -0,0 +1,348 @@
+"""
+In-process NumPy Vector Store
+For knowledge bases small enough (under ~100k chunks) to fit one float32
+matrix: search is a single matrix-vector product.
+"""
+
+import json
+import operator
+import os
+import sqlite3
+import threading
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from app.config import settings
+from app.rag.vector_store import VectorStore
+
+_MIN_CAPACITY = 1024
+# Filter row sets kept between queries (e.g. language/solution partitions)
+_MAX_CACHED_PARTITIONS = 64
+
+_OPERATORS = {
+    "$eq": operator.eq,
+    "$ne": operator.ne,
+    "$gt": operator.gt,
+    "$gte": operator.ge,
+    "$lt": operator.lt,
+    "$lte": operator.le,
+    "$in": lambda value, options: value in options,
+    "$nin": lambda value, options: value not in options,
+}
+
+
+def matches_where(metadata: Dict[str, Any], where: Dict[str, Any]) -> bool:
+    """Evaluate a Chroma-style `where` filter against one metadata dict"""
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            for op, operand in condition.items():
+                if op not in _OPERATORS:
+                    raise ValueError(f"Unsupported filter operator: {op}")
+                if value is None and op not in ("$ne", "$nin"):
+                    return False
+                try:
+                    if not _OPERATORS[op](value, operand):
+                        return False
+                except TypeError:
+                    return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    Normalized embeddings in a memory-mapped .npy matrix, one row per chunk,
+    with chunk ids, zlib-compressed text and metadata in a SQLite side store.
+    Search scores every row at once and takes the top k with argpartition;
+    scores are cosine similarities. A filtered search scores only the rows
+    of its partition (the rows matching the filter, kept per recent filter
+    until the next write). Rows stay dense: a deleted row is filled with
+    the last one. Ids and metadata are also held in memory so filters
+    never touch the side store.
+    """
+
+    def __init__(self, collection_name: str, directory: Optional[str] = None):
+        directory = directory or settings.numpy_index_dir
+        os.makedirs(directory, exist_ok=True)
+        self.matrix_path = os.path.join(directory, f"{collection_name}.npy")
+        self._lock = threading.RLock()
+
+        self._conn = sqlite3.connect(
+            os.path.join(directory, f"{collection_name}.db"), check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            " row INTEGER PRIMARY KEY,"
+            " id TEXT UNIQUE NOT NULL,"
+            " document BLOB NOT NULL,"
+            " metadata TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+        stored = self._conn.execute("SELECT id, metadata FROM chunks ORDER BY row").fetchall()
+        self._ids: List[str] = [doc_id for doc_id, _ in stored]
+        self._metadatas: List[Dict[str, Any]] = [json.loads(metadata) for _, metadata in stored]
+        self._rows: Dict[str, int] = {doc_id: row for row, doc_id in enumerate(self._ids)}
+        self._partitions: Dict[str, np.ndarray] = {}
+
+        self._matrix: Optional[np.ndarray] = None
+        if os.path.exists(self.matrix_path):
+            self._matrix = open_memmap(self.matrix_path, mode="r+")
+            if self._matrix.shape[0] < len(self._ids):
+                raise ValueError(f"{self.matrix_path} has fewer rows than its side store")
+
+    @property
+    def dim(self) -> Optional[int]:
+        return None if self._matrix is None else self._matrix.shape[1]
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms > 0, norms, 1.0)
+
+    def _reserve(self, rows: int, dim: int):
+        """Make room for `rows` rows, doubling the file when it is full"""
+        if self._matrix is None:
+            self._matrix = open_memmap(
+                self.matrix_path, mode="w+", dtype=np.float32,
+                shape=(max(_MIN_CAPACITY, rows), dim),
+            )
+            return
+        if dim != self.dim:
+            raise ValueError(f"Embedding dimension {dim} does not match the index ({self.dim})")
+
+        capacity = self._matrix.shape[0]
+        if rows <= capacity:
+            return
+        tmp_path = f"{self.matrix_path}.tmp.npy"
+        grown = open_memmap(
+            tmp_path, mode="w+", dtype=np.float32,
+            shape=(max(rows, capacity * 2), dim),
+        )
+        grown[:len(self._ids)] = self._matrix[:len(self._ids)]
+        grown.flush()
+        os.replace(tmp_path, self.matrix_path)
+        self._matrix = grown
+
+    def _documents(self, ids: List[str]) -> Dict[str, str]:
+        found: Dict[str, str] = {}
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            for doc_id, blob in self._conn.execute(
+                f"SELECT id, document FROM chunks WHERE id IN ({placeholders})", chunk
+            ):
+                found[doc_id] = zlib.decompress(blob).decode("utf-8")
+        return found
+
+    def query(
+        self,
+        embedding: List[float],
+        top_k: int,
+        where: Optional[Dict] = None,
+    ) -> List[Dict[str, Any]]:
+        return self.query_many([embedding], [top_k], [where])[0]
+
+    def _partition(self, where: Dict) -> np.ndarray:
+        """Rows matching the filter, in ascending order"""
+        key = json.dumps(where, sort_keys=True)
+        rows = self._partitions.get(key)
+        if rows is None:
+            if len(self._partitions) >= _MAX_CACHED_PARTITIONS:
+                self._partitions.clear()
+            rows = self._partitions[key] = np.flatnonzero(np.fromiter(
+                (matches_where(metadata, where) for metadata in self._metadatas),
+                dtype=bool, count=len(self._ids),
+            ))
+        return rows
+
+    def query_many(
+        self,
+        embeddings: List[List[float]],
+        top_ks: List[int],
+        wheres: List[Optional[Dict]],
+    ) -> List[List[Dict[str, Any]]]:
+        """Queries grouped by filter, each group scored in one matrix product"""
+        batch: List[List[Dict[str, Any]]] = [[] for _ in embeddings]
+        with self._lock:
+            n = len(self._ids)
+            if not n or not len(embeddings):
+                return batch
+            queries = self._normalize(np.asarray(embeddings, dtype=np.float32))
+
+            groups: Dict[str, List[int]] = {}
+            for i, where in enumerate(wheres):
+                groups.setdefault(json.dumps(where or None, sort_keys=True), []).append(i)
+
+            picks: Dict[int, List[Tuple[int, float]]] = {}
+            for positions in groups.values():
+                where = wheres[positions[0]]
+                rows = self._partition(where) if where else None
+                if rows is not None and not len(rows):
+                    continue
+                if rows is None:
+                    all_scores = queries[positions] @ self._matrix[:n].T
+                elif len(rows) * 2 > n:
+                    # Copying most rows costs more than scoring them all
+                    all_scores = (queries[positions] @ self._matrix[:n].T)[:, rows]
+                else:
+                    all_scores = queries[positions] @ self._matrix[rows].T
+
+                for j, i in enumerate(positions):
+                    scores = all_scores[j]
+                    k = min(top_ks[i], len(scores))
+                    if k <= 0:
+                        continue
+                    top = np.argpartition(-scores, k - 1)[:k]
+                    top = top[np.argsort(-scores[top])]
+                    picked = top if rows is None else rows[top]
+                    picks[i] = [(int(row), float(score)) for row, score in zip(picked, scores[top])]
+
+            documents = self._documents(list({
+                self._ids[row] for picked in picks.values() for row, _ in picked
+            }))
+            for i, picked in picks.items():
+                batch[i] = [
+                    {
+                        "id": self._ids[row],
+                        "content": documents.get(self._ids[row], ""),
+                        "metadata": self._metadatas[row],
+                        "score": score,
+                    }
+                    for row, score in picked
+                ]
+        return batch
+
+    def ids(self, where: Optional[Dict] = None) -> List[str]:
+        with self._lock:
+            if not where:
+                return list(self._ids)
+            return [self._ids[row] for row in self._partition(where)]
+
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[Dict] = None,
+    ) -> List[Dict[str, Any]]:
+        with self._lock:
+            if ids is None:
+                ids = list(self._ids)
+            rows = [(doc_id, self._rows[doc_id]) for doc_id in ids if doc_id in self._rows]
+            if where:
+                rows = [(doc_id, row) for doc_id, row in rows if matches_where(self._metadatas[row], where)]
+            documents = self._documents([doc_id for doc_id, _ in rows])
+            return [
+                {"id": doc_id, "content": documents.get(doc_id, ""), "metadata": self._metadatas[row]}
+                for doc_id, row in rows
+            ]
+
+    def get_embeddings(self, ids: List[str]) -> Dict[str, List[float]]:
+        with self._lock:
+            return {
+                doc_id: self._matrix[self._rows[doc_id]].tolist()
+                for doc_id in ids
+                if doc_id in self._rows
+            }
+
+    def add(
+        self,
+        ids: List[str],
+        embeddings: List[List[float]],
+        documents: List[str],
+        metadatas: List[Dict],
+    ):
+        """Add documents; an existing id is overwritten in place"""
+        if not ids:
+            return
+        vectors = self._normalize(np.asarray(embeddings, dtype=np.float32))
+
+        with self._lock:
+            self._partitions.clear()
+            # Last occurrence wins for ids repeated in the batch
+            latest = {doc_id: i for i, doc_id in enumerate(ids)}
+            new_ids = [doc_id for doc_id in latest if doc_id not in self._rows]
+            self._reserve(len(self._ids) + len(new_ids), vectors.shape[1])
+            for doc_id in new_ids:
+                self._rows[doc_id] = len(self._ids)
+                self._ids.append(doc_id)
+                self._metadatas.append({})
+
+            records = []
+            for doc_id, i in latest.items():
+                row = self._rows[doc_id]
+                metadata = metadatas[i] or {}
+                self._matrix[row] = vectors[i]
+                self._metadatas[row] = metadata
+                records.append((
+                    row,
+                    doc_id,
+                    zlib.compress(documents[i].encode("utf-8")),
+                    json.dumps(metadata, ensure_ascii=False),
+                ))
+            self._matrix.flush()
+
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunks (row, id, document, metadata) VALUES (?, ?, ?, ?)",
+                records,
+            )
+            self._conn.commit()
+
+    def update_metadata(self, ids: List[str], metadatas: List[Dict]):
+        with self._lock:
+            self._partitions.clear()
+            records = []
+            for doc_id, metadata in zip(ids, metadatas):
+                row = self._rows.get(doc_id)
+                if row is None:
+                    continue
+                self._metadatas[row] = metadata or {}
+                records.append((json.dumps(metadata or {}, ensure_ascii=False), doc_id))
+            self._conn.executemany("UPDATE chunks SET metadata = ? WHERE id = ?", records)
+            self._conn.commit()
+
+    def delete(self, ids: List[str]):
+        with self._lock:
+            self._partitions.clear()
+            for doc_id in ids:
+                row = self._rows.pop(doc_id, None)
+                if row is None:
+                    continue
+                self._conn.execute("DELETE FROM chunks WHERE id = ?", (doc_id,))
+
+                # Fill the hole with the last row so the matrix stays dense
+                last = len(self._ids) - 1
+                if row != last:
+                    moved = self._ids[last]
+                    self._matrix[row] = self._matrix[last]
+                    self._ids[row] = moved
+                    self._metadatas[row] = self._metadatas[last]
+                    self._rows[moved] = row
+                    self._conn.execute("UPDATE chunks SET row = ? WHERE id = ?", (row, moved))
+                self._ids.pop()
+                self._metadatas.pop()
+
+            if self._matrix is not None:
+                self._matrix.flush()
+            self._conn.commit()
+
+    def count(self) -> int:
+        return len(self._ids)
+
+    def close(self):
+        with self._lock:
+            if self._matrix is not None:
+                self._matrix.flush()
+                self._matrix = None
+            self._conn.close()
@@ -0,0 +1,128 @@
+"""
+Post-retrieval processing: merge overlapping chunks, diversify with MMR
+"""
+
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# Longest overlap looked for between consecutive chunks (DocumentProcessor uses 200)
+_MAX_OVERLAP = 1000
+_PROBE_CHARS = 32
+
+
+def _source(result: Dict[str, Any]) -> Optional[str]:
+    """File (upload) or document (raw text) a chunk was cut from"""
+    metadata = result.get("metadata") or {}
+    return metadata.get("file_id") or metadata.get("doc_id")
+
+
+def _chunk_index(result: Dict[str, Any]) -> Optional[int]:
+    index = (result.get("metadata") or {}).get("chunk_index")
+    return index if isinstance(index, int) else None
+
+
+def overlap_length(left: str, right: str) -> int:
+    """Length of the longest suffix of left that is also a prefix of right"""
+    limit = min(len(left), len(right), _MAX_OVERLAP)
+    if not limit:
+        return 0
+    probe = right[:min(_PROBE_CHARS, limit)]
+    start = len(left) - limit
+    position = left.find(probe, start)
+    while position != -1:
+        if right.startswith(left[position:]):
+            return len(left) - position
+        position = left.find(probe, position + 1)
+    # Overlaps shorter than the probe
+    for length in range(min(len(probe), limit) - 1, 0, -1):
+        if left.endswith(right[:length]):
+            return length
+    return 0
+
+
+def merge_adjacent_chunks(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Merge results that are consecutive chunks of the same file into one,
+    keeping the overlapping text once. A merged result takes the place of
+    its best-ranked chunk, the best score, and lists its chunks' ids in
+    "merged_ids". Exact duplicate texts are dropped.
+    """
+    runs: Dict[int, List[Dict[str, Any]]] = {}
+    run_of: Dict[int, int] = {}
+    chunks: Dict[str, Dict[int, int]] = {}
+    for position, result in enumerate(results):
+        source, index = _source(result), _chunk_index(result)
+        if source is None or index is None:
+            continue
+        chunks.setdefault(source, {})[index] = position
+
+    # Group each file's positions into runs of consecutive chunk indexes
+    for indexes in chunks.values():
+        ordered = sorted(indexes)
+        run_start = None
+        for i, index in enumerate(ordered):
+            if i == 0 or index != ordered[i - 1] + 1:
+                run_start = indexes[index]
+                runs[run_start] = []
+            runs[run_start].append(results[indexes[index]])
+            run_of[indexes[index]] = run_start
+
+    merged: List[Dict[str, Any]] = []
+    emitted = set()
+    seen_texts = set()
+    for position, result in enumerate(results):
+        run_start = run_of.get(position)
+        if run_start is not None:
+            if run_start in emitted:
+                continue
+            emitted.add(run_start)
+            run = runs[run_start]
+            if len(run) > 1:
+                content = run[0]["content"]
+                for chunk in run[1:]:
+                    overlap = overlap_length(content, chunk["content"])
+                    content += chunk["content"][overlap:] if overlap else " " + chunk["content"]
+                result = {
+                    **run[0],
+                    "content": content,
+                    "score": max(chunk.get("score", 0.0) for chunk in run),
+                    "merged_ids": [chunk["id"] for chunk in run],
+                }
+
+        text = " ".join(result.get("content", "").split())
+        if text in seen_texts:
+            continue
+        seen_texts.add(text)
+        merged.append(result)
+    return merged
+
+
+def mmr_select(
+    results: List[Dict[str, Any]],
+    embeddings: np.ndarray,
+    query_embedding: np.ndarray,
+    top_k: int,
+    lambda_mult: float,
+) -> List[Dict[str, Any]]:
+    """
+    Maximal marginal relevance: repeatedly pick the result that best trades
+    similarity to the query (weight lambda_mult) against similarity to the
+    results already picked. Embeddings are normalized rows, one per result.
+    """
+    if len(results) <= 1:
+        return results[:top_k]
+
+    relevance = embeddings @ query_embedding
+    similarity = embeddings @ embeddings.T
+    selected: List[int] = []
+    redundancy = np.full(len(results), -np.inf)
+    remaining = np.ones(len(results), dtype=bool)
+    while len(selected) < min(top_k, len(results)):
+        penalty = np.where(np.isfinite(redundancy), redundancy, 0.0)
+        scores = np.where(remaining, lambda_mult * relevance - (1 - lambda_mult) * penalty, -np.inf)
+        best = int(np.argmax(scores))
+        selected.append(best)
+        remaining[best] = False
+        redundancy = np.maximum(redundancy, similarity[best])
+    return [results[i] for i in selected]
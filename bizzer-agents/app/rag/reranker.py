@@ -0,0 +1,136 @@
+"""
+Rerankers for RAG: rescore retrieved candidates against the query
+"""
+
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+from app.config import settings
+from app.rag.lexical_index import analyze, detect_language, query_words
+
+
+class Reranker(ABC):
+    """Abstract base class for rerankers (blocking; run on a RAG thread pool)"""
+
+    name: str = "unknown"
+    # Most documents scored between budget checks
+    batch_size: int = 16
+    # Moving average of scoring time per document, None until measured
+    _document_seconds: Optional[float] = None
+
+    @abstractmethod
+    def score(self, query: str, documents: List[str]) -> List[float]:
+        """Relevance of each document to the query, higher is better"""
+        pass
+
+    def score_until(self, query: str, documents: List[str], deadline: float) -> List[float]:
+        """
+        Score documents in order, batch by batch, until all are scored or
+        the next batch would end past the deadline (time.perf_counter()).
+        Batches shrink to what the measured time per document says still
+        fits; until that is measured, the first batch is one document.
+        Returns the scores of the first documents only when the budget ran out.
+        """
+        scores: List[float] = []
+        while len(scores) < len(documents):
+            remaining = deadline - time.perf_counter()
+            if self._document_seconds is None:
+                size = 1
+            else:
+                size = min(self.batch_size, int(remaining / self._document_seconds))
+            if remaining <= 0 or size < 1:
+                break
+
+            started = time.perf_counter()
+            batch = documents[len(scores):len(scores) + size]
+            scores.extend(self.score(query, batch))
+            seconds = (time.perf_counter() - started) / len(batch)
+            if self._document_seconds is None:
+                self._document_seconds = seconds
+            else:
+                self._document_seconds = 0.8 * self._document_seconds + 0.2 * seconds
+        return scores
+
+
+class LexicalOverlapReranker(Reranker):
+    """
+    Scores the share of query words a document contains (with the same
+    Spanish/English stemming as the BM25 index), plus a bonus for query
+    word pairs that appear next to each other, as in product names.
+    """
+
+    name = "lexical"
+    batch_size = 64
+
+    def score(self, query: str, documents: List[str]) -> List[float]:
+        words = query_words(query)
+        if not words:
+            return [0.0] * len(documents)
+
+        scores = []
+        for document in documents:
+            positions: Dict[str, List[int]] = {}
+            for position, term in enumerate(analyze(document, detect_language(document))):
+                positions.setdefault(term, []).append(position)
+
+            found = [
+                {p for stem in stems for p in positions.get(stem, ())}
+                for stems in words
+            ]
+            coverage = sum(1 for places in found if places) / len(words)
+            adjacent = sum(
+                1 for left, right in zip(found, found[1:])
+                if any(p + 1 in right for p in left)
+            )
+            scores.append(coverage + 0.5 * adjacent / max(1, len(words) - 1))
+        return scores
+
+
+class CrossEncoderReranker(Reranker):
+    """
+    Small CPU cross-encoder (sentence-transformers), which reads query and
+    document together. Needs the optional sentence-transformers package.
+    """
+
+    name = "cross-encoder"
+    batch_size = 8
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import CrossEncoder
+
+        self.model_name = model_name
+        self._model = CrossEncoder(model_name, device="cpu")
+
+    def score(self, query: str, documents: List[str]) -> List[float]:
+        pairs = [(query, document) for document in documents]
+        return [float(value) for value in self._model.predict(pairs, batch_size=self.batch_size)]
+
+
+def _create_reranker() -> Optional[Reranker]:
+    backend = settings.reranker
+    if not backend:
+        return None
+    elif backend == "lexical":
+        return LexicalOverlapReranker()
+    elif backend == "cross-encoder":
+        return CrossEncoderReranker(settings.rerank_model)
+    else:
+        raise ValueError(f"Unsupported reranker: {backend}")
+
+
+_reranker: Optional[Reranker] = None
+_reranker_loaded = False
+
+
+def get_reranker() -> Optional[Reranker]:
+    """Get the process-wide reranker, or None when reranking is disabled or unavailable"""
+    global _reranker, _reranker_loaded
+    if not _reranker_loaded:
+        _reranker_loaded = True
+        try:
+            _reranker = _create_reranker()
+        except Exception as e:
+            print(f"Reranker disabled: {e}")
+            _reranker = None
+    return _reranker
@@ -0,0 +1,226 @@
+"""
+Retrieval Result Cache scoped by collection version
+"""
+
+import hashlib
+import json
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import redis.asyncio as redis
+
+from app.metrics import RETRIEVAL_CACHE_REQUESTS, RETRIEVAL_CACHE_ENTRIES
+
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive form of a query"""
+    return re.sub(r"\s+", " ", query).strip().casefold()
+
+
+class RetrievalCache:
+    """
+    Caches RAGRetriever.search results, keyed by normalized query, top_k,
+    filter and search mode.
+    Every key includes the collection version, which the retriever bumps on
+    each add or delete, so results from before a change are never served.
+    Results are held in an in-process LRU. With Redis sharing, the version
+    lives in Redis and results are shared across workers, so a change made
+    by one worker invalidates every worker's cache.
+    """
+
+    def __init__(
+        self,
+        collection_name: str,
+        max_entries: int,
+        ttl: int,
+        redis_url: Optional[str] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.prefix = f"retrieval_cache:{collection_name}"
+        self.version_key = f"{self.prefix}:version"
+        self.redis = redis.from_url(redis_url) if redis_url else None
+        self.hits = 0
+        self.misses = 0
+
+        self._version = 0
+        self._entries: "OrderedDict[str, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+
+    async def _current_version(self) -> int:
+        if self.redis is None:
+            return self._version
+        return int(await self.redis.get(self.version_key) or 0)
+
+    def make_key(
+        self,
+        version: int,
+        query: str,
+        top_k: int,
+        filter_metadata: Optional[Dict],
+        mode: str,
+    ) -> str:
+        params = json.dumps(
+            [normalize_query(query), top_k, filter_metadata, mode],
+            ensure_ascii=False,
+            sort_keys=True,
+        )
+        return f"{self.prefix}:{version}:{hashlib.sha256(params.encode('utf-8')).hexdigest()}"
+
+    def _record(self, result: str):
+        if result == "miss":
+            self.misses += 1
+        elif result != "error":
+            self.hits += 1
+        RETRIEVAL_CACHE_REQUESTS.labels(result=result).inc()
+
+    async def get(
+        self,
+        query: str,
+        top_k: int,
+        filter_metadata: Optional[Dict],
+        mode: str,
+    ) -> Tuple[Optional[str], Optional[List[Dict[str, Any]]]]:
+        """
+        Cached results for the search, if any, and the key to store fresh
+        results under. The key is None when the version cannot be read,
+        in which case nothing should be cached.
+        """
+        try:
+            version = await self._current_version()
+        except redis.RedisError as e:
+            print(f"Retrieval cache version error: {e}")
+            self._record("error")
+            return None, None
+        key = self.make_key(version, query, top_k, filter_metadata, mode)
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, results = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self._record("hit")
+                return key, [dict(r) for r in results]
+            del self._entries[key]
+
+        if self.redis is not None:
+            try:
+                data = await self.redis.get(key)
+            except redis.RedisError as e:
+                print(f"Retrieval cache read error: {e}")
+                data = None
+            if data is not None:
+                results = json.loads(data)
+                self._store_local(key, results)
+                self._record("shared_hit")
+                return key, [dict(r) for r in results]
+
+        self._record("miss")
+        return key, None
+
+    async def get_many(
+        self,
+        searches: List[Tuple[str, int, Optional[Dict]]],
+        mode: str,
+    ) -> Tuple[List[Optional[str]], List[Optional[List[Dict[str, Any]]]]]:
+        """
+        get() for many (query, top_k, filter) searches, with the version read
+        once and one MGET for the results not held locally
+        """
+        keys: List[Optional[str]] = [None] * len(searches)
+        found: List[Optional[List[Dict[str, Any]]]] = [None] * len(searches)
+        try:
+            version = await self._current_version()
+        except redis.RedisError as e:
+            print(f"Retrieval cache version error: {e}")
+            for _ in searches:
+                self._record("error")
+            return keys, found
+
+        now = time.monotonic()
+        remote: List[int] = []
+        for i, (query, top_k, filter_metadata) in enumerate(searches):
+            key = keys[i] = self.make_key(version, query, top_k, filter_metadata, mode)
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, results = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._record("hit")
+                    found[i] = [dict(r) for r in results]
+                    continue
+                del self._entries[key]
+            remote.append(i)
+
+        values: List[Optional[bytes]] = [None] * len(remote)
+        if self.redis is not None and remote:
+            try:
+                values = await self.redis.mget([keys[i] for i in remote])
+            except redis.RedisError as e:
+                print(f"Retrieval cache read error: {e}")
+        for i, data in zip(remote, values):
+            if data is not None:
+                results = json.loads(data)
+                self._store_local(keys[i], results)
+                self._record("shared_hit")
+                found[i] = [dict(r) for r in results]
+            else:
+                self._record("miss")
+        return keys, found
+
+    def _store_local(self, key: str, results: List[Dict[str, Any]]):
+        self._entries[key] = (time.monotonic() + self.ttl, results)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        RETRIEVAL_CACHE_ENTRIES.set(len(self._entries))
+
+    async def set(self, key: str, results: List[Dict[str, Any]]):
+        """Cache results under a key returned by get()"""
+        results = [dict(r) for r in results]
+        self._store_local(key, results)
+        if self.redis is not None:
+            try:
+                await self.redis.setex(key, self.ttl, json.dumps(results, ensure_ascii=False))
+            except redis.RedisError as e:
+                print(f"Retrieval cache write error: {e}")
+
+    async def set_many(self, items: List[Tuple[str, List[Dict[str, Any]]]]):
+        """set() for many keys, with one Redis pipeline"""
+        items = [(key, [dict(r) for r in results]) for key, results in items]
+        for key, results in items:
+            self._store_local(key, results)
+        if self.redis is not None and items:
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                for key, results in items:
+                    pipe.setex(key, self.ttl, json.dumps(results, ensure_ascii=False))
+                await pipe.execute()
+            except redis.RedisError as e:
+                print(f"Retrieval cache write error: {e}")
+
+    async def bump_version(self):
+        """Invalidate every cached result for the collection"""
+        self._version += 1
+        self._entries.clear()
+        RETRIEVAL_CACHE_ENTRIES.set(0)
+        if self.redis is not None:
+            try:
+                await self.redis.incr(self.version_key)
+            except redis.RedisError as e:
+                print(f"Retrieval cache version bump error: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "shared": self.redis is not None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    async def close(self):
+        if self.redis is not None:
+            await self.redis.close()
@@ -2,72 +2,499 @@
 RAG Retriever for Bizzer Agents
 """
 
-from typing import List, Dict, Any, Optional
-import chromadb
-from chromadb.config import Settings as ChromaSettings
+import asyncio
+import json
+import os
+import re
+import time
+from typing import List, Dict, Any, FrozenSet, Optional, Tuple
+
+import numpy as np
+
 from app.config import settings
+from app.metrics import RERANK_SECONDS, RERANK_TOP_K_CHANGE, RERANK_BUDGET_EXHAUSTED
+from app.rag.embeddings import EmbeddingProvider, LocalEmbeddingProvider, get_embedding_provider
+from app.rag.lexical_index import BM25Index, STOPWORDS, detect_language, reciprocal_rank_fusion
+from app.rag.postprocess import merge_adjacent_chunks, mmr_select
+from app.rag.reranker import Reranker, get_reranker
+from app.rag.result_cache import RetrievalCache
+from app.rag.thread_pools import get_thread_pool
+from app.rag.vector_store import VectorStore, create_vector_store
+from app.tracing import record_span
+
+SEARCH_MODES = ("vector", "lexical", "hybrid")
+
+# Metadata partitions whose document ids are kept for lexical search
+_MAX_CACHED_PARTITIONS = 64
 
 
 class RAGRetriever:
-    """Retriever for RAG using ChromaDB"""
+    """
+    Retriever for RAG over a vector store (ChromaDB or in-process NumPy,
+    per settings.vector_db_type), with a BM25 index kept alongside the
+    store for lexical and hybrid search
+    """
 
-    def __init__(self):
-        self.client = chromadb.PersistentClient(
-            path=settings.chroma_persist_dir,
-            settings=ChromaSettings(anonymized_telemetry=False),
+    def __init__(
+        self,
+        embedding_provider: Optional[EmbeddingProvider] = None,
+        store: Optional[VectorStore] = None,
+        reranker: Optional[Reranker] = None,
+    ):
+        self.embeddings = embedding_provider or get_embedding_provider()
+        self.reranker = reranker or get_reranker()
+        self.collection_name = self._collection_name()
+        self.store = store or self._open_store()
+        self.result_cache: Optional[RetrievalCache] = None
+        if settings.retrieval_cache_enabled:
+            self.result_cache = RetrievalCache(
+                self.collection_name,
+                max_entries=settings.retrieval_cache_max_entries,
+                ttl=settings.retrieval_cache_ttl,
+                redis_url=settings.redis_url if settings.retrieval_cache_shared else None,
+            )
+        self.lexical_index_path = os.path.join(
+            settings.lexical_index_dir, f"{settings.vector_db_type}_{self.collection_name}.npz"
         )
-        self.collection_name = "bizzer_knowledge"
-        self._ensure_collection()
+        self._load_lexical_index()
+        # where filter (JSON) -> (expiry, ids of the matching documents)
+        self._partitions: Dict[str, Tuple[float, FrozenSet[str]]] = {}
 
-    def _ensure_collection(self):
-        """Ensure the collection exists"""
+    async def close(self):
+        """
+        Save pending lexical index changes and close the vector store and
+        result cache; the embedding provider is closed with the app
+        """
+        if self.lexical_index.pending_changes:
+            try:
+                await get_thread_pool("ingest").run(self._save_lexical_index)
+            except Exception as e:
+                print(f"Error saving lexical index: {e}")
+        if self.store:
+            self.store.close()
+        self.store = None
+        if self.result_cache:
+            await self.result_cache.close()
+
+    def _collection_name(self) -> str:
+        """
+        One collection per embedding model, since vectors from different
+        models cannot be compared. The local model keeps the original name.
+        """
+        if self.embeddings.model_name == LocalEmbeddingProvider.model_name:
+            return "bizzer_knowledge"
+        slug = re.sub(r"[^a-zA-Z0-9_-]", "_", self.embeddings.model_name)
+        return f"bizzer_knowledge_{slug}"
+
+    def _open_store(self) -> Optional[VectorStore]:
+        """Open (or create) the collection in the configured vector store"""
         try:
-            self.collection = self.client.get_or_create_collection(
-                name=self.collection_name,
-                metadata={"description": "Bizzer knowledge base"},
-            )
+            return create_vector_store(self.collection_name)
         except Exception as e:
             print(f"Error creating collection: {e}")
-            self.collection = None
+            return None
+
+    def _load_lexical_index(self):
+        """
+        Load the saved BM25 index, rebuilding it from the collection when it
+        is missing or out of step (e.g. documents added before it existed)
+        """
+        self._lexical_saved_at = time.monotonic()
+        try:
+            self.lexical_index = BM25Index.load(self.lexical_index_path)
+        except Exception as e:
+            print(f"Error loading lexical index, rebuilding: {e}")
+            self.lexical_index = BM25Index()
+
+        if not self.store:
+            return
+        try:
+            if len(self.lexical_index) == self.store.count():
+                return
+            stored = self.store.get()
+            self.lexical_index = BM25Index()
+            self.lexical_index.add(
+                [doc["id"] for doc in stored],
+                [doc["content"] for doc in stored],
+                [doc["metadata"].get("language") for doc in stored],
+            )
+            self._save_lexical_index()
+        except Exception as e:
+            print(f"Error rebuilding lexical index: {e}")
 
     async def search(
         self,
         query: str,
         top_k: int = 5,
         filter_metadata: Optional[Dict] = None,
+        query_embedding: Optional[List[float]] = None,
+        mode: Optional[str] = None,
+        use_cache: bool = True,
     ) -> List[Dict[str, Any]]:
-        """Search for relevant documents"""
-        if not self.collection:
+        """
+        Search for relevant documents.
+        mode is "vector", "lexical" or "hybrid" (both, fused by reciprocal
+        rank); it defaults to settings.rag_search_mode.
+        Pass query_embedding when the query has already been embedded.
+        Candidates are reranked if a reranker is configured, adjacent chunks
+        of one file are merged and, if enabled, results are diversified with
+        MMR (see _postprocess).
+        Results are cached until documents are next added or deleted;
+        pass use_cache=False to bypass the cache.
+        """
+        if not self.store:
             return []
 
+        mode = mode or settings.rag_search_mode
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unsupported search mode: {mode}")
+
+        cache_key = None
+        if self.result_cache and use_cache:
+            cache_key, cached = await self.result_cache.get(query, top_k, filter_metadata, mode)
+            if cached is not None:
+                return cached
+
         try:
-            # Query the collection
-            results = self.collection.query(
-                query_texts=[query],
-                n_results=top_k,
-                where=filter_metadata,
+            if not query_embedding and (mode != "lexical" or settings.rag_mmr_enabled):
+                query_embedding = await self.embeddings.embed_query(query)
+            results = await self._search(
+                query, self._candidates(top_k), filter_metadata, query_embedding, mode
+            )
+            results = await self._postprocess(query, results, top_k, query_embedding)
+        except Exception as e:
+            print(f"Search error: {e}")
+            return []
+
+        if cache_key:
+            await self.result_cache.set(cache_key, results)
+        return results
+
+    async def search_partitioned(
+        self,
+        query: str,
+        partitions: List[Optional[Dict]],
+        top_k: int = 5,
+        query_embedding: Optional[List[float]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Search metadata partitions (`where` filters), narrowest first, until
+        at least settings.rag_partition_min_results results are found. The
+        results of a narrower partition rank ahead of those that complete
+        them from a wider one. End with None to fall back to the whole corpus.
+        Partitions with fewer documents than that are skipped unsearched,
+        so usually only one search runs.
+        """
+        min_results = min(top_k, settings.rag_partition_min_results)
+        results: List[Dict[str, Any]] = []
+        seen = set()
+        for position, where in enumerate(partitions):
+            if where and position < len(partitions) - 1:
+                try:
+                    size = len(await self._partition_ids(where))
+                except Exception as e:
+                    print(f"Partition lookup error: {e}")
+                    continue
+                if size < min_results - len(results):
+                    continue
+            found = await self.search(
+                query, top_k=top_k, filter_metadata=where, query_embedding=query_embedding
             )
+            for result in found:
+                ids = result.get("merged_ids") or [result["id"]]
+                if any(doc_id in seen for doc_id in ids):
+                    continue
+                seen.update(ids)
+                results.append(result)
+            if len(results) >= min_results:
+                break
+        return results[:top_k]
+
+    async def _partition_ids(self, where: Dict) -> FrozenSet[str]:
+        """
+        Ids of the documents in a metadata partition, cached until the next
+        write here (or settings.rag_partition_cache_ttl, for other workers' writes)
+        """
+        key = json.dumps(where, sort_keys=True)
+        cached = self._partitions.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
 
-            # Format results
-            formatted_results = []
-            if results and results.get("documents"):
-                documents = results["documents"][0]
-                metadatas = results.get("metadatas", [[]])[0]
-                distances = results.get("distances", [[]])[0]
+        ids = frozenset(await get_thread_pool("query").run(self.store.ids, where))
+        if len(self._partitions) >= _MAX_CACHED_PARTITIONS:
+            self._partitions.clear()
+        self._partitions[key] = (time.monotonic() + settings.rag_partition_cache_ttl, ids)
+        return ids
 
-                for i, doc in enumerate(documents):
-                    formatted_results.append({
-                        "content": doc,
-                        "metadata": metadatas[i] if i < len(metadatas) else {},
-                        "score": 1 - distances[i] if i < len(distances) else 0,
-                    })
+    async def _search(
+        self,
+        query: str,
+        top_k: int,
+        filter_metadata: Optional[Dict],
+        query_embedding: Optional[List[float]],
+        mode: str,
+    ) -> List[Dict[str, Any]]:
+        if mode == "vector":
+            return await self._vector_search(query, top_k, filter_metadata, query_embedding)
+        if mode == "lexical":
+            return await self._lexical_search(query, top_k, filter_metadata)
 
-            return formatted_results
+        candidates = max(top_k, settings.rag_hybrid_candidates)
+        vector_results, lexical_results = await asyncio.gather(
+            self._vector_search(query, candidates, filter_metadata, query_embedding),
+            self._lexical_search(query, candidates, filter_metadata),
+        )
+        return self._fuse(vector_results, lexical_results, top_k)
+
+    def _candidates(self, top_k: int) -> int:
+        """Results to retrieve so that reranking, merging and MMR still leave top_k"""
+        candidates = top_k
+        if settings.rag_merge_adjacent_chunks or settings.rag_mmr_enabled:
+            candidates = top_k * settings.rag_candidate_multiplier
+        if self.reranker:
+            candidates = max(candidates, settings.rerank_candidates)
+        return candidates
 
+    async def _postprocess(
+        self,
+        query: str,
+        results: List[Dict[str, Any]],
+        top_k: int,
+        query_embedding: Optional[List[float]],
+        rerank_deadline: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Rerank the candidates if a reranker is configured, merge consecutive
+        chunks of one file (DocumentProcessor overlaps them) so their shared
+        text is sent once, then optionally pick a diverse top_k with maximal
+        marginal relevance over the stored embeddings.
+        """
+        if self.reranker and len(results) > 1:
+            results = await self._rerank(query, results, top_k, rerank_deadline)
+        if settings.rag_merge_adjacent_chunks:
+            results = merge_adjacent_chunks(results)
+        if settings.rag_mmr_enabled and query_embedding and len(results) > top_k:
+            results = await get_thread_pool("query").run(
+                self._mmr, results, query_embedding, top_k
+            )
+        return results[:top_k]
+
+    async def _rerank(
+        self,
+        query: str,
+        results: List[Dict[str, Any]],
+        top_k: int,
+        deadline: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Rescore candidates on the query pool until the deadline (by default
+        settings.rerank_budget_ms from now). Candidates left unscored when
+        the budget runs out keep their order after the scored ones. Each
+        scored result gets a rerank_score.
+        """
+        name = self.reranker.name
+        started = time.perf_counter()
+        scores = await get_thread_pool("query").run(
+            self.reranker.score_until,
+            query,
+            [r.get("content", "") for r in results],
+            deadline or started + settings.rerank_budget_ms / 1000,
+        )
+        scored = [{**r, "rerank_score": score} for r, score in zip(results, scores)]
+        scored.sort(key=lambda r: r["rerank_score"], reverse=True)
+        reranked = scored + results[len(scores):]
+
+        seconds = time.perf_counter() - started
+        before = {r["id"] for r in results[:top_k]}
+        after = reranked[:top_k]
+        change = sum(1 for r in after if r["id"] not in before) / len(after)
+        RERANK_SECONDS.labels(reranker=name).observe(seconds)
+        RERANK_TOP_K_CHANGE.labels(reranker=name).observe(change)
+        if len(scores) < len(results):
+            RERANK_BUDGET_EXHAUSTED.labels(reranker=name).inc()
+        record_span("rerank", seconds, scored=len(scores), top_k_change=round(change, 2))
+        return reranked
+
+    def _mmr(
+        self,
+        results: List[Dict[str, Any]],
+        query_embedding: List[float],
+        top_k: int,
+    ) -> List[Dict[str, Any]]:
+        members = [r.get("merged_ids") or [r["id"]] for r in results]
+        stored = self.store.get_embeddings([doc_id for ids in members for doc_id in ids])
+        if any(doc_id not in stored for ids in members for doc_id in ids):
+            return results
+
+        # A merged result is represented by the mean of its chunks
+        vectors = np.asarray(
+            [np.mean([stored[doc_id] for doc_id in ids], axis=0) for ids in members],
+            dtype=np.float32,
+        )
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query /= max(float(np.linalg.norm(query)), 1e-12)
+        return mmr_select(results, vectors, query, top_k, settings.rag_mmr_lambda)
+
+    @staticmethod
+    def _fuse(
+        vector_results: List[Dict[str, Any]],
+        lexical_results: List[Dict[str, Any]],
+        top_k: int,
+    ) -> List[Dict[str, Any]]:
+        """Hybrid results: both lists fused by reciprocal rank"""
+        by_id = {r["id"]: r for r in lexical_results}
+        by_id.update({r["id"]: r for r in vector_results})
+        fused = reciprocal_rank_fusion(
+            [[r["id"] for r in vector_results], [r["id"] for r in lexical_results]],
+            k=settings.rag_rrf_k,
+        )
+        return [{**by_id[doc_id], "score": score} for doc_id, score in fused[:top_k]]
+
+    async def search_batch(
+        self,
+        queries: List[Dict[str, Any]],
+        mode: Optional[str] = None,
+        use_cache: bool = True,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Search for many queries at once, returning results in query order.
+        Each query is a dict with "query" and optional "top_k" and "filter".
+        Uncached queries are embedded in one batch and run against the
+        vector store in one call.
+        """
+        if not self.store:
+            return [[] for _ in queries]
+
+        mode = mode or settings.rag_search_mode
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unsupported search mode: {mode}")
+
+        texts = [q["query"] for q in queries]
+        top_ks = [q.get("top_k") or 5 for q in queries]
+        filters = [q.get("filter") for q in queries]
+
+        results: List[Optional[List[Dict[str, Any]]]] = [None] * len(queries)
+        cache_keys: List[Optional[str]] = [None] * len(queries)
+        if self.result_cache and use_cache:
+            cache_keys, results = await self.result_cache.get_many(
+                list(zip(texts, top_ks, filters)), mode
+            )
+        pending = [i for i, cached in enumerate(results) if cached is None]
+        if not pending:
+            return results
+
+        try:
+            wanted = [self._candidates(top_ks[i]) for i in pending]
+            embeddings: List[Optional[List[float]]] = [None] * len(pending)
+            if mode != "lexical" or settings.rag_mmr_enabled:
+                embeddings = await self.embeddings.embed_queries([texts[i] for i in pending])
+
+            vector_results: List[List[Dict[str, Any]]] = [[] for _ in pending]
+            if mode != "lexical":
+                candidates = [
+                    n if mode == "vector" else max(n, settings.rag_hybrid_candidates)
+                    for n in wanted
+                ]
+                vector_results = await get_thread_pool("query").run(
+                    self.store.query_many, embeddings, candidates, [filters[i] for i in pending]
+                )
+
+            lexical_results: List[List[Dict[str, Any]]] = [[] for _ in pending]
+            if mode != "vector":
+                lexical_results = await asyncio.gather(*(
+                    self._lexical_search(
+                        texts[i],
+                        n if mode == "lexical" else max(n, settings.rag_hybrid_candidates),
+                        filters[i],
+                    )
+                    for i, n in zip(pending, wanted)
+                ))
+
+            if mode == "vector":
+                found = vector_results
+            elif mode == "lexical":
+                found = lexical_results
+            else:
+                found = [
+                    self._fuse(vector_results[j], lexical_results[j], wanted[j])
+                    for j in range(len(pending))
+                ]
+
+            # Postprocessed concurrently; reranking shares one budget for the batch
+            rerank_deadline = time.perf_counter() + settings.rerank_batch_budget_ms / 1000
+            processed = await asyncio.gather(*(
+                self._postprocess(texts[i], found[j], top_ks[i], embeddings[j], rerank_deadline)
+                for j, i in enumerate(pending)
+            ))
+            for i, query_results in zip(pending, processed):
+                results[i] = query_results
         except Exception as e:
-            print(f"Search error: {e}")
+            print(f"Batch search error: {e}")
+            return [r if r is not None else [] for r in results]
+
+        fresh = [(cache_keys[i], results[i]) for i in pending if cache_keys[i]]
+        if fresh:
+            await self.result_cache.set_many(fresh)
+        return results
+
+    async def _vector_search(
+        self,
+        query: str,
+        top_k: int,
+        filter_metadata: Optional[Dict],
+        query_embedding: Optional[List[float]],
+    ) -> List[Dict[str, Any]]:
+        """Nearest neighbours by embedding"""
+        if not query_embedding:
+            query_embedding = await self.embeddings.embed_query(query)
+
+        # Query the store off the event loop
+        return await get_thread_pool("query").run(
+            self.store.query, query_embedding, top_k, filter_metadata
+        )
+
+    async def _lexical_search(
+        self,
+        query: str,
+        top_k: int,
+        filter_metadata: Optional[Dict],
+    ) -> List[Dict[str, Any]]:
+        """BM25 matches; score is the raw BM25 score"""
+        pool = get_thread_pool("query")
+        # A filter restricts the matches to its partition's documents
+        allowed = await self._partition_ids(filter_metadata) if filter_metadata else None
+        hits = await pool.run(self.lexical_index.search, query, top_k, allowed)
+        if not hits:
             return []
 
+        # Text and metadata live in the vector store, which also applies the filter
+        stored = await pool.run(self.store.get, [doc_id for doc_id, _ in hits], filter_metadata)
+        found = {doc["id"]: doc for doc in stored}
+
+        formatted_results = [
+            {**found[doc_id], "score": score}
+            for doc_id, score in hits
+            if doc_id in found
+        ]
+        return formatted_results[:top_k]
+
+    def _update_lexical_index(self, update, *args):
+        """
+        Apply an update to the lexical index (ingest pool). Updates stay in
+        memory; the index is saved once enough changes or time accumulate.
+        """
+        update(*args)
+        if (
+            self.lexical_index.pending_changes >= settings.lexical_save_changes
+            or time.monotonic() - self._lexical_saved_at >= settings.lexical_save_interval
+        ):
+            self._save_lexical_index()
+
+    def _save_lexical_index(self):
+        self.lexical_index.save(self.lexical_index_path)
+        self._lexical_saved_at = time.monotonic()
+
     async def add_documents(
         self,
         documents: List[str],
@@ -75,17 +502,29 @@ class RAGRetriever:
         ids: Optional[List[str]] = None,
     ) -> bool:
         """Add documents to the collection"""
-        if not self.collection:
+        if not self.store:
             return False
 
         try:
             if not ids:
                 ids = [f"doc_{i}" for i in range(len(documents))]
 
-            self.collection.add(
-                documents=documents,
-                metadatas=metadatas or [{}] * len(documents),
-                ids=ids,
+            embeddings = await self.embeddings.embed(documents)
+
+            pool = get_thread_pool("ingest")
+            await pool.run(
+                self.store.add,
+                ids,
+                embeddings,
+                documents,
+                metadatas or [{}] * len(documents),
+            )
+            await pool.run(
+                self._update_lexical_index,
+                self.lexical_index.add,
+                ids,
+                documents,
+                [(metadata or {}).get("language") for metadata in metadatas or [{}] * len(documents)],
             )
             return True
 
@@ -93,30 +532,94 @@ class RAGRetriever:
             print(f"Add documents error: {e}")
             return False
 
+        finally:
+            await self._invalidate_results()
+
     async def delete_documents(self, ids: List[str]) -> bool:
         """Delete documents from the collection"""
-        if not self.collection:
+        if not self.store:
             return False
 
         try:
-            self.collection.delete(ids=ids)
+            pool = get_thread_pool("ingest")
+            await pool.run(self.store.delete, ids)
+            await pool.run(self._update_lexical_index, self.lexical_index.delete, ids)
             return True
 
         except Exception as e:
             print(f"Delete documents error: {e}")
             return False
 
+        finally:
+            await self._invalidate_results()
+
+    async def _invalidate_results(self):
+        """Bump the collection version, after a write, so no cached result outlives it"""
+        self._partitions.clear()
+        if self.result_cache:
+            await self.result_cache.bump_version()
+
+    async def tag_languages(self):
+        """
+        Tag documents stored without a language (ingested before
+        DocumentProcessor detected it), so they fall in a language partition
+        """
+        if not self.store:
+            return
+        try:
+            tagged = await get_thread_pool("ingest").run(self._tag_languages)
+        except Exception as e:
+            print(f"Error tagging document languages: {e}")
+            return
+        if tagged:
+            print(f"Tagged the language of {tagged} documents")
+            await self._invalidate_results()
+
+    def _tag_languages(self) -> int:
+        """Each untagged file or document gets one language, detected from all its chunks"""
+        tagged = {"language": {"$in": list(STOPWORDS)}}
+        if len(self.store.ids(tagged)) == self.store.count():
+            return 0
+
+        sources: Dict[str, List[Dict[str, Any]]] = {}
+        for doc in self.store.get():
+            metadata = doc["metadata"]
+            if "language" not in metadata:
+                source = metadata.get("file_id") or metadata.get("doc_id") or doc["id"]
+                sources.setdefault(source, []).append(doc)
+
+        ids: List[str] = []
+        metadatas: List[Dict] = []
+        for docs in sources.values():
+            language = detect_language(" ".join(doc["content"] for doc in docs))
+            for doc in docs:
+                ids.append(doc["id"])
+                metadatas.append({**doc["metadata"], "language": language})
+        for i in range(0, len(ids), 500):
+            self.store.update_metadata(ids[i:i + 500], metadatas[i:i + 500])
+        return len(ids)
+
     async def get_stats(self) -> Dict[str, Any]:
         """Get collection statistics"""
-        if not self.collection:
+        if not self.store:
             return {"error": "Collection not available"}
 
         try:
-            count = self.collection.count()
-            return {
+            count = await get_thread_pool("query").run(self.store.count)
+            stats = {
+                "vector_db": settings.vector_db_type,
                 "collection_name": self.collection_name,
                 "document_count": count,
+                "embedding_model": self.embeddings.model_name,
+                "search_mode": settings.rag_search_mode,
+                "lexical_index": self.lexical_index.get_stats(),
             }
+            cache = getattr(self.embeddings, "cache", None)
+            if cache is not None:
+                stats["embedding_cache"] = cache.get_stats()
+            if self.result_cache:
+                stats["result_cache"] = self.result_cache.get_stats()
+            return stats
 
         except Exception as e:
             return {"error": str(e)}
@@ -0,0 +1,90 @@
+"""
+Bounded Thread Pools for blocking RAG work
+"""
+
+import asyncio
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from app.config import settings
+from app.metrics import (
+    RAG_POOL_QUEUE_DEPTH,
+    RAG_POOL_ACTIVE,
+    RAG_POOL_WAIT_SECONDS,
+    RAG_POOL_TASK_SECONDS,
+)
+
+
+class BoundedThreadPool:
+    """
+    Runs blocking calls (vector store, local embeddings) off the event loop.
+    Calls wait for a worker on the event loop rather than in the executor's
+    queue, so the wait is measurable and a cancelled request never leaves
+    queued work behind.
+    """
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.waiting = 0
+        self.active = 0
+        self._slots = asyncio.Semaphore(max_workers)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix=f"rag-{name}"
+        )
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run func(*args, **kwargs) on a worker thread"""
+        self.waiting += 1
+        RAG_POOL_QUEUE_DEPTH.labels(pool=self.name).set(self.waiting)
+        started = time.perf_counter()
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+            RAG_POOL_QUEUE_DEPTH.labels(pool=self.name).set(self.waiting)
+            RAG_POOL_WAIT_SECONDS.labels(pool=self.name).observe(
+                time.perf_counter() - started
+            )
+
+        self.active += 1
+        RAG_POOL_ACTIVE.labels(pool=self.name).set(self.active)
+        task_started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._executor, functools.partial(func, *args, **kwargs)
+            )
+        finally:
+            self.active -= 1
+            RAG_POOL_ACTIVE.labels(pool=self.name).set(self.active)
+            RAG_POOL_TASK_SECONDS.labels(pool=self.name).observe(
+                time.perf_counter() - task_started
+            )
+            self._slots.release()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# "query" serves live searches; "ingest" serves uploads and bulk embedding,
+# so a large ingestion cannot take the threads live chats depend on
+_pools: Dict[str, BoundedThreadPool] = {}
+
+
+def get_thread_pool(name: str) -> BoundedThreadPool:
+    """Get the process-wide pool by name (query or ingest)"""
+    pool = _pools.get(name)
+    if pool is None:
+        pool = BoundedThreadPool(name, getattr(settings, f"rag_{name}_threads"))
+        _pools[name] = pool
+    return pool
+
+
+def shutdown_thread_pools():
+    """Stop all pools, dropping work that has not started"""
+    pools = list(_pools.values())
+    _pools.clear()
+    for pool in pools:
+        pool.shutdown()
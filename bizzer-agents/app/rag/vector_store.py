@@ -0,0 +1,260 @@
+"""
+Vector Store Backends for RAG
+Selected by settings.vector_db_type; the retriever runs their (blocking)
+methods on the RAG thread pools.
+"""
+
+import json
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+
+from app.config import settings
+
+# Scores are 1 - distance, so collections must use cosine distance
+_COLLECTION_METADATA = {"description": "Bizzer knowledge base", "hnsw:space": "cosine"}
+# Collection an old squared-L2 collection is copied into before taking its name
+_MIGRATION_SUFFIX = "_cosine_migration"
+_MIGRATION_BATCH = 1000
+
+
+class VectorStore(ABC):
+    """
+    Abstract base class for vector stores.
+    Results are dicts with id, content, metadata and, for queries, score.
+    Filters use Chroma's `where` syntax.
+    """
+
+    @abstractmethod
+    def query(
+        self,
+        embedding: List[float],
+        top_k: int,
+        where: Optional[Dict] = None,
+    ) -> List[Dict[str, Any]]:
+        """Nearest documents to the embedding, best first"""
+        pass
+
+    def query_many(
+        self,
+        embeddings: List[List[float]],
+        top_ks: List[int],
+        wheres: List[Optional[Dict]],
+    ) -> List[List[Dict[str, Any]]]:
+        """query() for several embeddings, each with its own top_k and filter"""
+        return [
+            self.query(embedding, top_k, where)
+            for embedding, top_k, where in zip(embeddings, top_ks, wheres)
+        ]
+
+    @abstractmethod
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[Dict] = None,
+    ) -> List[Dict[str, Any]]:
+        """Stored documents by id (all documents when ids is None)"""
+        pass
+
+    def ids(self, where: Optional[Dict] = None) -> List[str]:
+        """Ids of the documents matching the filter (all when where is None)"""
+        return [doc["id"] for doc in self.get(where=where)]
+
+    @abstractmethod
+    def get_embeddings(self, ids: List[str]) -> Dict[str, List[float]]:
+        """Stored embeddings by id"""
+        pass
+
+    @abstractmethod
+    def add(
+        self,
+        ids: List[str],
+        embeddings: List[List[float]],
+        documents: List[str],
+        metadatas: List[Dict],
+    ):
+        pass
+
+    @abstractmethod
+    def update_metadata(self, ids: List[str], metadatas: List[Dict]):
+        """Replace the metadata of stored documents"""
+        pass
+
+    @abstractmethod
+    def delete(self, ids: List[str]):
+        pass
+
+    @abstractmethod
+    def count(self) -> int:
+        pass
+
+    def close(self):
+        """Release resources held by the backend"""
+        pass
+
+
+class ChromaVectorStore(VectorStore):
+    """
+    Persistent ChromaDB collection in cosine space, so scores are cosine
+    similarities as with the NumPy store. A collection created before that
+    (Chroma's squared-L2 default) is migrated when opened.
+    """
+
+    def __init__(self, collection_name: str, directory: Optional[str] = None):
+        import chromadb
+        from chromadb.config import Settings as ChromaSettings
+
+        self.client = chromadb.PersistentClient(
+            path=directory or settings.chroma_persist_dir,
+            settings=ChromaSettings(anonymized_telemetry=False),
+        )
+        self.collection = self._open_collection(collection_name)
+
+    @staticmethod
+    def _space(collection) -> str:
+        space = (collection.metadata or {}).get("hnsw:space")
+        if space is None:
+            configuration = getattr(collection, "configuration", None) or {}
+            space = (configuration.get("hnsw") or {}).get("space")
+        return space or "l2"
+
+    def _open_collection(self, name: str):
+        """Open (or create) the collection, migrating it to cosine space if needed"""
+        staging_name = f"{name}{_MIGRATION_SUFFIX}"
+        existing = {getattr(c, "name", c) for c in self.client.list_collections()}
+        if staging_name in existing:
+            if name in existing:
+                # Interrupted while copying: the original is intact
+                self.client.delete_collection(staging_name)
+            else:
+                # Interrupted after the copy replaced the original
+                self.client.get_collection(staging_name).modify(name=name)
+
+        collection = self.client.get_or_create_collection(name=name, metadata=_COLLECTION_METADATA)
+        if self._space(collection) == "cosine":
+            return collection
+
+        print(f"Migrating collection {name} to cosine distance...")
+        staging = self.client.create_collection(name=staging_name, metadata=_COLLECTION_METADATA)
+        for offset in range(0, collection.count(), _MIGRATION_BATCH):
+            batch = collection.get(
+                include=["embeddings", "documents", "metadatas"],
+                limit=_MIGRATION_BATCH,
+                offset=offset,
+            )
+            staging.add(
+                ids=batch["ids"],
+                embeddings=batch["embeddings"],
+                documents=batch["documents"],
+                metadatas=[metadata or None for metadata in batch["metadatas"]],
+            )
+        self.client.delete_collection(name)
+        staging.modify(name=name)
+        return staging
+
+    def query(
+        self,
+        embedding: List[float],
+        top_k: int,
+        where: Optional[Dict] = None,
+    ) -> List[Dict[str, Any]]:
+        return self.query_many([embedding], [top_k], [where])[0]
+
+    def query_many(
+        self,
+        embeddings: List[List[float]],
+        top_ks: List[int],
+        wheres: List[Optional[Dict]],
+    ) -> List[List[Dict[str, Any]]]:
+        """One collection.query per distinct filter, for all its embeddings"""
+        groups: Dict[str, List[int]] = {}
+        for i, where in enumerate(wheres):
+            groups.setdefault(json.dumps(where, sort_keys=True), []).append(i)
+
+        batch: List[List[Dict[str, Any]]] = [[] for _ in embeddings]
+        for positions in groups.values():
+            results = self.collection.query(
+                query_embeddings=[embeddings[i] for i in positions],
+                n_results=max(top_ks[i] for i in positions),
+                where=wheres[positions[0]],
+            )
+            for j, i in enumerate(positions):
+                batch[i] = self._format(results, j)[:top_ks[i]]
+        return batch
+
+    @staticmethod
+    def _format(results: Dict[str, Any], j: int) -> List[Dict[str, Any]]:
+        """Results of the j-th query embedding"""
+        formatted_results = []
+        if results and results.get("documents"):
+            ids = results["ids"][j]
+            documents = results["documents"][j]
+            metadatas = (results.get("metadatas") or [[]] * (j + 1))[j]
+            distances = (results.get("distances") or [[]] * (j + 1))[j]
+
+            for i, doc in enumerate(documents):
+                formatted_results.append({
+                    "id": ids[i],
+                    "content": doc,
+                    "metadata": metadatas[i] if i < len(metadatas) else {},
+                    "score": 1 - distances[i] if i < len(distances) else 0,
+                })
+
+        return formatted_results
+
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[Dict] = None,
+    ) -> List[Dict[str, Any]]:
+        stored = self.collection.get(ids=ids, where=where, include=["documents", "metadatas"])
+        return [
+            {"id": doc_id, "content": document, "metadata": metadata or {}}
+            for doc_id, document, metadata in zip(
+                stored["ids"], stored["documents"], stored["metadatas"]
+            )
+        ]
+
+    def ids(self, where: Optional[Dict] = None) -> List[str]:
+        return self.collection.get(where=where, include=[])["ids"]
+
+    def get_embeddings(self, ids: List[str]) -> Dict[str, List[float]]:
+        stored = self.collection.get(ids=ids, include=["embeddings"])
+        return {
+            doc_id: [float(value) for value in embedding]
+            for doc_id, embedding in zip(stored["ids"], stored["embeddings"])
+        }
+
+    def add(
+        self,
+        ids: List[str],
+        embeddings: List[List[float]],
+        documents: List[str],
+        metadatas: List[Dict],
+    ):
+        self.collection.add(
+            embeddings=embeddings,
+            documents=documents,
+            metadatas=metadatas,
+            ids=ids,
+        )
+
+    def update_metadata(self, ids: List[str], metadatas: List[Dict]):
+        self.collection.update(ids=ids, metadatas=metadatas)
+
+    def delete(self, ids: List[str]):
+        self.collection.delete(ids=ids)
+
+    def count(self) -> int:
+        return self.collection.count()
+
+
+def create_vector_store(collection_name: str) -> VectorStore:
+    """Vector store for the configured vector_db_type"""
+    backend = settings.vector_db_type
+    if backend == "chroma":
+        return ChromaVectorStore(collection_name)
+    elif backend == "numpy":
+        from app.rag.numpy_store import NumpyVectorStore
+        return NumpyVectorStore(collection_name)
+    else:
+        raise ValueError(f"Unsupported vector DB type: {backend}")
@@ -0,0 +1,78 @@
+"""
+Per-request Tracing for Bizzer Agents
+"""
+
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+
+@dataclass
+class Span:
+    name: str
+    seconds: float
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class RequestTrace:
+    """Timed spans recorded while serving one request"""
+
+    request_id: str
+    started: float = field(default_factory=time.perf_counter)
+    spans: List[Span] = field(default_factory=list)
+
+    def add(self, name: str, seconds: float, **attributes):
+        self.spans.append(Span(name, seconds, attributes))
+
+    def totals(self) -> Dict[str, float]:
+        """Total seconds per span name"""
+        totals: Dict[str, float] = {}
+        for span in self.spans:
+            totals[span.name] = totals.get(span.name, 0.0) + span.seconds
+        return totals
+
+    def server_timing(self) -> str:
+        """Span totals as a Server-Timing header value"""
+        return ", ".join(
+            f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.totals().items()
+        )
+
+    def summary(self) -> str:
+        elapsed = time.perf_counter() - self.started
+        parts = [f"{name}={seconds * 1000:.0f}ms" for name, seconds in self.totals().items()]
+        return f"[{self.request_id}] total={elapsed * 1000:.0f}ms " + " ".join(parts)
+
+
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("request_trace", default=None)
+
+
+def start_trace(request_id: Optional[str] = None) -> RequestTrace:
+    """Start a trace for the current request"""
+    trace = RequestTrace(request_id=request_id or uuid.uuid4().hex)
+    _current_trace.set(trace)
+    return trace
+
+
+def get_current_trace() -> Optional[RequestTrace]:
+    return _current_trace.get()
+
+
+def record_span(name: str, seconds: float, **attributes):
+    """Add a span to the current trace, if any"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(name, seconds, **attributes)
+
+
+@contextmanager
+def trace_span(name: str, **attributes):
+    """Time a block and record it as a span of the current trace"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, time.perf_counter() - started, **attributes)
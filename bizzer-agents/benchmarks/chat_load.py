@@ -0,0 +1,133 @@
+"""
+Chat Load Generator
+
+Sends concurrent chat requests to the agents service and reports latency
+percentiles, time to first token (streaming) and throughput. Pair with
+benchmarks/fake_llm_server.py to benchmark the full chat path offline.
+
+Run:
+    JWT_SECRET=... python -m benchmarks.chat_load --url http://localhost:8001 \
+        --requests 200 --concurrency 20 --stream
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+import uuid
+from typing import List, Optional
+
+import httpx
+import jwt
+
+QUESTIONS = [
+    "¿Qué es Smart Data Room?",
+    "¿Cómo preparo una due diligence?",
+    "What is Deal Teaser?",
+    "How does Bizzer help with audits?",
+    "¿Qué diferencia hay entre Deal Visor y Deal Teaser?",
+]
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(q * len(ordered)))
+    return ordered[index]
+
+
+def _token(secret: str, user_id: int) -> str:
+    return jwt.encode({"user_id": user_id, "exp": int(time.time()) + 3600}, secret, algorithm="HS256")
+
+
+async def _one_request(
+    client: httpx.AsyncClient,
+    url: str,
+    token: str,
+    message: str,
+    stream: bool,
+    no_cache: bool,
+) -> tuple:
+    """Returns (ok, total_seconds, ttft_seconds or None)"""
+    headers = {"Authorization": f"Bearer {token}"}
+    if no_cache:
+        headers["Cache-Control"] = "no-cache"
+    body = {"message": message, "session_id": str(uuid.uuid4())}
+    started = time.perf_counter()
+    ttft: Optional[float] = None
+
+    try:
+        if stream:
+            async with client.stream("POST", f"{url}/chat/stream", json=body, headers=headers) as response:
+                ok = response.status_code == 200
+                async for line in response.aiter_lines():
+                    if line.startswith("event: error"):
+                        ok = False
+                    if ttft is None and line.startswith("data:") and '"delta"' in line:
+                        ttft = time.perf_counter() - started
+        else:
+            response = await client.post(f"{url}/chat/", json=body, headers=headers)
+            ok = response.status_code == 200
+    except httpx.HTTPError:
+        ok = False
+
+    return ok, time.perf_counter() - started, ttft
+
+
+async def run(args):
+    secret = args.jwt_secret or os.environ.get("JWT_SECRET", "")
+    semaphore = asyncio.Semaphore(args.concurrency)
+    results = []
+
+    async with httpx.AsyncClient(timeout=args.timeout) as client:
+        async def worker(i: int):
+            async with semaphore:
+                result = await _one_request(
+                    client,
+                    args.url.rstrip("/"),
+                    _token(secret, 1000 + i % args.users),
+                    QUESTIONS[i % len(QUESTIONS)],
+                    args.stream,
+                    args.no_cache,
+                )
+                results.append(result)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(args.requests)))
+        elapsed = time.perf_counter() - started
+
+    ok = [r for r in results if r[0]]
+    latencies = [r[1] for r in ok]
+    ttfts = [r[2] for r in ok if r[2] is not None]
+
+    print(f"requests:    {len(results)} ({len(results) - len(ok)} failed)")
+    print(f"throughput:  {len(ok) / elapsed:.1f} req/s over {elapsed:.1f}s")
+    if latencies:
+        print(
+            f"latency:     p50 {_percentile(latencies, 0.5) * 1000:.0f}ms  "
+            f"p95 {_percentile(latencies, 0.95) * 1000:.0f}ms  "
+            f"p99 {_percentile(latencies, 0.99) * 1000:.0f}ms  "
+            f"mean {statistics.mean(latencies) * 1000:.0f}ms"
+        )
+    if ttfts:
+        print(
+            f"ttft:        p50 {_percentile(ttfts, 0.5) * 1000:.0f}ms  "
+            f"p95 {_percentile(ttfts, 0.95) * 1000:.0f}ms"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chat endpoint load generator")
+    parser.add_argument("--url", default="http://localhost:8001")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--no-cache", action="store_true", help="send Cache-Control: no-cache")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--jwt-secret", default=None)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+"""
+Fake LLM Server for offline benchmarking
+
+Speaks the wire formats used in app/llm/:
+- Ollama:    POST /api/chat, /api/embeddings, /api/embed; GET /api/tags, /api/ps
+- Anthropic: POST /v1/messages
+- OpenAI:    POST /v1/chat/completions, /v1/embeddings
+
+Point the agents service at it:
+    OLLAMA_BASE_URL=http://localhost:11500
+    ANTHROPIC_BASE_URL=http://localhost:11500/v1
+    OPENAI_BASE_URL=http://localhost:11500/v1
+
+Run:
+    python -m benchmarks.fake_llm_server --port 11500 --latency 0.3 --tokens-per-second 40
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+WORDS = (
+    "Bizzer ayuda a preparar la documentación corporativa para auditorías, "
+    "due diligence y licitaciones con un data room seguro y trazable. "
+    "Our team can walk you through Deal Teaser, Deal Visor and Smart Data Room "
+    "so you can pick the solution that fits your compliance needs."
+).split()
+
+
+@dataclass
+class FakeConfig:
+    latency: float = 0.2            # seconds before the first token
+    tokens_per_second: float = 50.0  # generation speed after the first token
+    response_tokens: int = 60       # tokens per completion
+    error_rate: float = 0.0         # probability of an error response
+    embedding_dim: int = 384
+    embedding_latency: float = 0.01
+
+
+config = FakeConfig()
+app = FastAPI(title="Fake LLM Server")
+
+
+# ============ Helpers ============
+
+def _completion_tokens() -> List[str]:
+    words = [WORDS[i % len(WORDS)] for i in range(config.response_tokens)]
+    return [word if i == 0 else f" {word}" for i, word in enumerate(words)]
+
+
+def _count_prompt_tokens(texts: List[str]) -> int:
+    return sum(len(text.split()) for text in texts)
+
+
+def _should_fail() -> bool:
+    return random.random() < config.error_rate
+
+
+async def _stream_tokens() -> AsyncIterator[str]:
+    await asyncio.sleep(config.latency)
+    delay = 1.0 / config.tokens_per_second if config.tokens_per_second > 0 else 0
+    for token in _completion_tokens():
+        yield token
+        if delay:
+            await asyncio.sleep(delay)
+
+
+async def _full_completion() -> str:
+    return "".join([token async for token in _stream_tokens()])
+
+
+def _fake_embedding(text: str) -> List[float]:
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+    rng = random.Random(seed)
+    return [rng.uniform(-1.0, 1.0) for _ in range(config.embedding_dim)]
+
+
+def _sse(data: Dict[str, Any], event: Optional[str] = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+
+# ============ Ollama ============
+
+@app.get("/api/tags")
+async def ollama_tags():
+    return {"models": [{"name": "gemma2:2b", "model": "gemma2:2b"}]}
+
+
+@app.get("/api/ps")
+async def ollama_ps():
+    return {"models": [{"name": "gemma2:2b", "model": "gemma2:2b"}]}
+
+
+@app.post("/api/chat")
+async def ollama_chat(request: Request):
+    body = await request.json()
+    model = body.get("model", "gemma2:2b")
+    messages = body.get("messages", [])
+    if not messages:
+        # Warm-up request: load the model
+        return {"model": model, "message": {"role": "assistant", "content": ""}, "done": True}
+    if _should_fail():
+        return JSONResponse(status_code=503, content={"error": "server busy"})
+
+    prompt_tokens = _count_prompt_tokens([m.get("content", "") for m in messages])
+
+    def final(started: float) -> Dict[str, Any]:
+        eval_duration = int((time.perf_counter() - started) * 1e9)
+        return {
+            "model": model,
+            "message": {"role": "assistant", "content": ""},
+            "done": True,
+            "prompt_eval_count": prompt_tokens,
+            "eval_count": config.response_tokens,
+            "eval_duration": eval_duration,
+            "total_duration": eval_duration,
+        }
+
+    if body.get("stream", True):
+        async def stream():
+            started = time.perf_counter()
+            async for token in _stream_tokens():
+                yield json.dumps({
+                    "model": model,
+                    "message": {"role": "assistant", "content": token},
+                    "done": False,
+                }) + "\n"
+            yield json.dumps(final(started)) + "\n"
+
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+    started = time.perf_counter()
+    content = await _full_completion()
+    data = final(started)
+    data["message"]["content"] = content
+    return data
+
+
+@app.post("/api/embeddings")
+async def ollama_embeddings(request: Request):
+    body = await request.json()
+    await asyncio.sleep(config.embedding_latency)
+    if _should_fail():
+        return JSONResponse(status_code=503, content={"error": "server busy"})
+    return {"embedding": _fake_embedding(body.get("prompt", ""))}
+
+
+@app.post("/api/embed")
+async def ollama_embed(request: Request):
+    body = await request.json()
+    texts = body.get("input", [])
+    if isinstance(texts, str):
+        texts = [texts]
+    await asyncio.sleep(config.embedding_latency)
+    if _should_fail():
+        return JSONResponse(status_code=503, content={"error": "server busy"})
+    return {
+        "model": body.get("model"),
+        "embeddings": [_fake_embedding(text) for text in texts],
+        "prompt_eval_count": _count_prompt_tokens(texts),
+    }
+
+
+# ============ Anthropic ============
+
+@app.post("/v1/messages")
+async def anthropic_messages(request: Request):
+    body = await request.json()
+    model = body.get("model", "claude-fake")
+    if _should_fail():
+        return JSONResponse(
+            status_code=529,
+            content={"type": "error", "error": {"type": "overloaded_error", "message": "Overloaded"}},
+        )
+
+    system = body.get("system", "")
+    if isinstance(system, list):
+        system = " ".join(block.get("text", "") for block in system)
+    input_tokens = _count_prompt_tokens(
+        [system] + [m.get("content", "") for m in body.get("messages", [])]
+    )
+    message_id = f"msg_{uuid.uuid4().hex[:24]}"
+    usage = {
+        "input_tokens": input_tokens,
+        "output_tokens": config.response_tokens,
+        "cache_creation_input_tokens": 0,
+        "cache_read_input_tokens": 0,
+    }
+
+    if body.get("stream"):
+        async def stream():
+            yield _sse({
+                "type": "message_start",
+                "message": {
+                    "id": message_id, "type": "message", "role": "assistant",
+                    "model": model, "content": [],
+                    "usage": {**usage, "output_tokens": 0},
+                },
+            }, event="message_start")
+            yield _sse({
+                "type": "content_block_start", "index": 0,
+                "content_block": {"type": "text", "text": ""},
+            }, event="content_block_start")
+            async for token in _stream_tokens():
+                yield _sse({
+                    "type": "content_block_delta", "index": 0,
+                    "delta": {"type": "text_delta", "text": token},
+                }, event="content_block_delta")
+            yield _sse({"type": "content_block_stop", "index": 0}, event="content_block_stop")
+            yield _sse({
+                "type": "message_delta",
+                "delta": {"stop_reason": "end_turn"},
+                "usage": {"output_tokens": config.response_tokens},
+            }, event="message_delta")
+            yield _sse({"type": "message_stop"}, event="message_stop")
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    return {
+        "id": message_id,
+        "type": "message",
+        "role": "assistant",
+        "model": model,
+        "content": [{"type": "text", "text": await _full_completion()}],
+        "stop_reason": "end_turn",
+        "usage": usage,
+    }
+
+
+# ============ OpenAI ============
+
+@app.post("/v1/chat/completions")
+async def openai_chat_completions(request: Request):
+    body = await request.json()
+    model = body.get("model", "gpt-fake")
+    if _should_fail():
+        return JSONResponse(
+            status_code=503,
+            content={"error": {"message": "The server is overloaded", "type": "server_error"}},
+        )
+
+    prompt_tokens = _count_prompt_tokens([m.get("content", "") for m in body.get("messages", [])])
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+    created = int(time.time())
+    usage = {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": config.response_tokens,
+        "total_tokens": prompt_tokens + config.response_tokens,
+    }
+
+    if body.get("stream"):
+        include_usage = body.get("stream_options", {}).get("include_usage", False)
+
+        async def stream():
+            base = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model}
+            yield _sse({**base, "choices": [{"index": 0, "delta": {"role": "assistant"}}]})
+            async for token in _stream_tokens():
+                yield _sse({**base, "choices": [{"index": 0, "delta": {"content": token}}]})
+            yield _sse({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+            if include_usage:
+                yield _sse({**base, "choices": [], "usage": usage})
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": created,
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": await _full_completion()},
+            "finish_reason": "stop",
+        }],
+        "usage": usage,
+    }
+
+
+@app.post("/v1/embeddings")
+async def openai_embeddings(request: Request):
+    body = await request.json()
+    texts = body.get("input", [])
+    if isinstance(texts, str):
+        texts = [texts]
+    await asyncio.sleep(config.embedding_latency)
+    if _should_fail():
+        return JSONResponse(
+            status_code=503,
+            content={"error": {"message": "The server is overloaded", "type": "server_error"}},
+        )
+    tokens = _count_prompt_tokens(texts)
+    return {
+        "object": "list",
+        "model": body.get("model"),
+        "data": [
+            {"object": "embedding", "index": i, "embedding": _fake_embedding(text)}
+            for i, text in enumerate(texts)
+        ],
+        "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+    }
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Fake LLM server for offline benchmarking")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--latency", type=float, default=config.latency, help="seconds to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=config.tokens_per_second)
+    parser.add_argument("--response-tokens", type=int, default=config.response_tokens)
+    parser.add_argument("--error-rate", type=float, default=config.error_rate)
+    parser.add_argument("--embedding-dim", type=int, default=config.embedding_dim)
+    parser.add_argument("--embedding-latency", type=float, default=config.embedding_latency)
+    args = parser.parse_args()
+
+    config.latency = args.latency
+    config.tokens_per_second = args.tokens_per_second
+    config.response_tokens = args.response_tokens
+    config.error_rate = args.error_rate
+    config.embedding_dim = args.embedding_dim
+    config.embedding_latency = args.embedding_latency
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Vector Index Benchmark
+
+Compares the vector store backends (Chroma and the in-process NumPy
+store) on synthetic clustered embeddings: ingest throughput, reopen time,
+query latency percentiles and recall@k against exact cosine search.
+Each backend writes to its own temporary directory.
+
+Run:
+    python -m benchmarks.vector_index_benchmark --docs 20000 --dim 384 --queries 500
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from app.rag.vector_store import ChromaVectorStore, VectorStore
+
+COLLECTION = "benchmark"
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(q * len(ordered)))
+    return ordered[index]
+
+
+def _dir_size(path: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path)
+        for name in names
+    )
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.linalg.norm(vectors, axis=-1, keepdims=True)
+
+
+def _dataset(args) -> tuple:
+    """Clustered document vectors and queries near random documents, normalized"""
+    rng = np.random.default_rng(args.seed)
+    centers = rng.normal(size=(args.clusters, args.dim)).astype(np.float32)
+    labels = rng.integers(0, args.clusters, size=args.docs)
+    docs = _normalize(centers[labels] + 0.5 * rng.normal(size=(args.docs, args.dim)).astype(np.float32))
+    picks = rng.integers(0, args.docs, size=args.queries)
+    queries = _normalize(docs[picks] + 0.3 * rng.normal(size=(args.queries, args.dim)).astype(np.float32))
+    return docs, queries
+
+
+def _open_numpy(directory: str) -> VectorStore:
+    from app.rag.numpy_store import NumpyVectorStore
+    return NumpyVectorStore(COLLECTION, directory=directory)
+
+
+def _open_chroma(directory: str) -> VectorStore:
+    return ChromaVectorStore(COLLECTION, directory=directory)
+
+
+BACKENDS: Dict[str, Callable[[str], VectorStore]] = {
+    "chroma": _open_chroma,
+    "numpy": _open_numpy,
+}
+
+
+def bench_backend(name: str, docs: np.ndarray, queries: np.ndarray, truth: List[set], args):
+    directory = tempfile.mkdtemp(prefix=f"vector-bench-{name}-")
+    try:
+        store = BACKENDS[name](directory)
+        ids = [f"doc_{i}" for i in range(len(docs))]
+
+        started = time.perf_counter()
+        for i in range(0, len(docs), args.batch_size):
+            end = i + args.batch_size
+            store.add(
+                ids[i:end],
+                docs[i:end].tolist(),
+                [f"chunk {j}" for j in range(i, min(end, len(docs)))],
+                [{"chunk_index": j} for j in range(i, min(end, len(docs)))],
+            )
+        ingest_seconds = time.perf_counter() - started
+        store.close()
+
+        started = time.perf_counter()
+        store = BACKENDS[name](directory)
+        open_seconds = time.perf_counter() - started
+
+        # Warm up, then time queries one at a time as the retriever issues them
+        for query in queries[: min(10, len(queries))]:
+            store.query(query.tolist(), args.top_k)
+
+        latencies = []
+        hits = 0
+        for query, expected in zip(queries, truth):
+            started = time.perf_counter()
+            results = store.query(query.tolist(), args.top_k)
+            latencies.append(time.perf_counter() - started)
+            hits += len(expected & {r["id"] for r in results})
+        store.close()
+
+        print(f"[{name}]")
+        print(f"  ingest:    {len(docs) / ingest_seconds:.0f} docs/s ({ingest_seconds:.1f}s)")
+        print(f"  reopen:    {open_seconds * 1000:.0f}ms")
+        print(f"  disk:      {_dir_size(directory) / 1e6:.1f} MB")
+        print(
+            f"  query:     p50 {_percentile(latencies, 0.5) * 1000:.2f}ms  "
+            f"p95 {_percentile(latencies, 0.95) * 1000:.2f}ms  "
+            f"p99 {_percentile(latencies, 0.99) * 1000:.2f}ms  "
+            f"({1 / statistics.mean(latencies):.0f} q/s)"
+        )
+        print(f"  recall@{args.top_k}: {hits / (len(queries) * args.top_k):.3f}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vector store backend benchmark")
+    parser.add_argument("--docs", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--backends", default="chroma,numpy")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    docs, queries = _dataset(args)
+    # Exact top-k by cosine similarity
+    scores = queries @ docs.T
+    top = np.argpartition(-scores, args.top_k - 1, axis=1)[:, :args.top_k]
+    truth = [{f"doc_{i}" for i in row} for row in top]
+
+    print(f"{args.docs} docs, dim {args.dim}, {args.queries} queries, top {args.top_k}")
+    for name in args.backends.split(","):
+        bench_backend(name.strip(), docs, queries, truth, args)
+
+
+if __name__ == "__main__":
+    main()
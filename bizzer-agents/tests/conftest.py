@@ -0,0 +1,17 @@
+"""
+Test settings: data directories go to a temporary directory, and the
+retrieval cache stays in process, so no service needs to be running.
+Set before any app module reads the settings.
+"""
+
+import os
+import tempfile
+
+_DATA_DIR = tempfile.mkdtemp(prefix="bizzer-tests-")
+
+os.environ.setdefault("JWT_SECRET", "test-secret")
+os.environ.setdefault("RETRIEVAL_CACHE_SHARED", "false")
+os.environ.setdefault("CHROMA_PERSIST_DIR", os.path.join(_DATA_DIR, "chroma"))
+os.environ.setdefault("NUMPY_INDEX_DIR", os.path.join(_DATA_DIR, "vectors"))
+os.environ.setdefault("LEXICAL_INDEX_DIR", os.path.join(_DATA_DIR, "lexical"))
+os.environ.setdefault("EMBEDDING_CACHE_PATH", os.path.join(_DATA_DIR, "embedding_cache.db"))
@@ -0,0 +1,140 @@
+"""
+AdmissionController: every way out of slot() (rejection, timeout,
+deadline, cancellation) leaves the semaphore back at its limit.
+"""
+
+import asyncio
+
+import pytest
+
+from app.llm.admission import AdmissionController, LLMQueueFullError
+from app.llm.deadline import LLMDeadlineExceededError, deadline_after
+
+
+def _controller(max_concurrency=1, max_queue_size=2, queue_timeout=5.0) -> AdmissionController:
+    return AdmissionController("test", max_concurrency, max_queue_size, queue_timeout)
+
+
+def _assert_idle(controller: AdmissionController):
+    assert controller._semaphore._value == controller.max_concurrency
+    assert controller.active == 0
+    assert controller.waiting == 0
+
+
+async def _hold(controller: AdmissionController, release: asyncio.Event, **kwargs):
+    async with controller.slot(**kwargs):
+        await release.wait()
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_queue_full_rejects_and_releases():
+    async def scenario():
+        controller = _controller(max_concurrency=1, max_queue_size=1)
+        release = asyncio.Event()
+        holder = asyncio.create_task(_hold(controller, release))
+        waiter = asyncio.create_task(_hold(controller, release))
+        await _settle()
+        assert (controller.active, controller.waiting) == (1, 1)
+
+        with pytest.raises(LLMQueueFullError) as rejected:
+            async with controller.slot():
+                pass
+        assert rejected.value.retry_after >= 1
+
+        release.set()
+        await asyncio.gather(holder, waiter)
+        _assert_idle(controller)
+
+    asyncio.run(scenario())
+
+
+def test_queue_timeout_rejects_and_releases():
+    async def scenario():
+        controller = _controller(queue_timeout=0.05)
+        release = asyncio.Event()
+        holder = asyncio.create_task(_hold(controller, release))
+        await _settle()
+
+        with pytest.raises(LLMQueueFullError):
+            async with controller.slot():
+                pass
+        assert controller.waiting == 0
+
+        release.set()
+        await holder
+        _assert_idle(controller)
+
+    asyncio.run(scenario())
+
+
+def test_deadline_ends_the_wait_and_releases():
+    async def scenario():
+        controller = _controller(queue_timeout=5.0)
+        release = asyncio.Event()
+        holder = asyncio.create_task(_hold(controller, release))
+        await _settle()
+
+        with pytest.raises(LLMDeadlineExceededError):
+            async with controller.slot(deadline=deadline_after(0.05)):
+                pass
+        # A deadline already passed is rejected without queueing
+        with pytest.raises(LLMDeadlineExceededError):
+            async with controller.slot(deadline=deadline_after(-1)):
+                pass
+        assert controller.waiting == 0
+
+        release.set()
+        await holder
+        _assert_idle(controller)
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_releases():
+    async def scenario():
+        controller = _controller()
+        release = asyncio.Event()
+        holder = asyncio.create_task(_hold(controller, release))
+        waiter = asyncio.create_task(_hold(controller, release))
+        await _settle()
+        assert controller.waiting == 1
+
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert controller.waiting == 0
+
+        release.set()
+        await holder
+        await _settle()
+        _assert_idle(controller)
+
+    asyncio.run(scenario())
+
+
+def test_waiter_cancelled_as_its_permit_is_granted_gives_it_back():
+    async def scenario():
+        controller = _controller()
+        slot = controller.slot()
+        await slot.__aenter__()
+        waiter = asyncio.create_task(_hold(controller, asyncio.Event()))
+        await _settle()
+
+        # Releasing hands the permit to the waiter, which is cancelled
+        # before it gets to run
+        await slot.__aexit__(None, None, None)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        await _settle()
+        _assert_idle(controller)
+
+        async with controller.slot(deadline=deadline_after(0.05)):
+            assert controller.active == 1
+        _assert_idle(controller)
+
+    asyncio.run(scenario())
@@ -0,0 +1,87 @@
+"""
+SingleFlight: callers share one call per key, and cancelling the last
+caller cancels the call without handing the cancellation to later callers.
+"""
+
+import asyncio
+
+import pytest
+
+from app.llm.coalescing import SingleFlight
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_concurrent_callers_share_one_call():
+    async def scenario():
+        flights = SingleFlight("test")
+        calls = 0
+
+        async def call():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "shared"
+
+        results = await asyncio.gather(*(flights.do("key", call) for _ in range(5)))
+        assert results == ["shared"] * 5
+        assert calls == 1
+        assert not flights._flights
+
+    asyncio.run(scenario())
+
+
+def test_cancelling_one_of_several_callers_keeps_the_call():
+    async def scenario():
+        flights = SingleFlight("test")
+
+        async def call():
+            await asyncio.sleep(0.01)
+            return "shared"
+
+        first = asyncio.create_task(flights.do("key", call))
+        second = asyncio.create_task(flights.do("key", call))
+        await _settle()
+        first.cancel()
+        assert await second == "shared"
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    asyncio.run(scenario())
+
+
+def test_caller_after_last_waiter_cancels_starts_a_new_call():
+    async def scenario():
+        flights = SingleFlight("test")
+        started = []
+        first_call_cancelled = asyncio.Event()
+
+        async def slow_call():
+            started.append("slow")
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                first_call_cancelled.set()
+                raise
+
+        async def new_call():
+            started.append("new")
+            return "fresh"
+
+        waiter = asyncio.create_task(flights.do("key", slow_call))
+        await _settle()
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+        # Called while the cancelled call may still be unwinding
+        assert await flights.do("key", new_call) == "fresh"
+        assert started == ["slow", "new"]
+        await asyncio.wait_for(first_call_cancelled.wait(), timeout=1)
+        assert not flights._flights
+
+    asyncio.run(scenario())
+
@@ -0,0 +1,202 @@
+"""
+BM25Index against a naive BM25 over the live documents, through
+incremental writes, compaction (including writes made during a merge)
+and save/load.
+"""
+
+import math
+import random
+from collections import Counter
+from typing import Dict
+
+import pytest
+
+from app.rag.lexical_index import BM25Index, analyze, analyze_query, detect_language
+
+_WORDS = (
+    "deal visor esg due diligence auditoria auditorias empresa empresas riesgo "
+    "riesgos report reports compliance growth market markets valuation valoracion "
+    "crecimiento mercado inversion investor investors fund funds"
+).split()
+_FILLER = {"en": "the and of with for".split(), "es": "el la de con para".split()}
+_QUERIES = [
+    "deal visor",
+    "ESG report",
+    "auditoría de riesgos",
+    "due diligence for investors",
+    "valoración de empresas en el mercado",
+    "growth funds compliance",
+]
+
+
+def _document(rng: random.Random) -> str:
+    language = rng.choice(["en", "es"])
+    words = rng.choices(_WORDS, k=rng.randint(3, 12)) + rng.choices(_FILLER[language], k=6)
+    rng.shuffle(words)
+    return " ".join(words)
+
+
+class NaiveBM25:
+    """Textbook BM25, recomputed from scratch on every search"""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.docs: Dict[str, Counter] = {}
+
+    def add(self, ids, documents):
+        for doc_id, document in zip(ids, documents):
+            self.docs[doc_id] = Counter(analyze(document, detect_language(document)))
+
+    def delete(self, ids):
+        for doc_id in ids:
+            self.docs.pop(doc_id, None)
+
+    def scores(self, query: str) -> Dict[str, float]:
+        n_docs = len(self.docs)
+        if not n_docs:
+            return {}
+        avg_length = sum(sum(tf.values()) for tf in self.docs.values()) / n_docs
+        scores: Dict[str, float] = {}
+        for term in analyze_query(query):
+            df = sum(1 for tf in self.docs.values() if term in tf)
+            if not df:
+                continue
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            for doc_id, tf in self.docs.items():
+                freq = tf.get(term)
+                if freq:
+                    length = sum(tf.values())
+                    norm = self.k1 * (1 - self.b + self.b * length / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * freq * (self.k1 + 1) / (freq + norm)
+        return scores
+
+
+def _assert_matches(index: BM25Index, reference: NaiveBM25):
+    assert len(index) == len(reference.docs)
+    for query in _QUERIES:
+        expected = reference.scores(query)
+        found = dict(index.search(query, top_k=len(reference.docs) + 1))
+        assert found.keys() == expected.keys(), query
+        for doc_id, score in expected.items():
+            assert found[doc_id] == pytest.approx(score, rel=1e-5), (query, doc_id)
+
+
+def _random_writes(rng, index, reference, next_id, rounds):
+    for _ in range(rounds):
+        ids = [f"doc-{next_id + i}" for i in range(rng.randint(1, 20))]
+        # Some writes replace existing documents
+        if reference.docs:
+            ids += rng.sample(sorted(reference.docs), k=min(3, len(reference.docs)))
+        documents = [_document(rng) for _ in ids]
+        index.add(ids, documents)
+        reference.add(ids, documents)
+        next_id += len(ids)
+
+        if reference.docs:
+            deleted = rng.sample(sorted(reference.docs), k=min(rng.randint(0, 8), len(reference.docs)))
+            deleted.append("never-indexed")
+            index.delete(deleted)
+            reference.delete(deleted)
+    return next_id
+
+
+def test_incremental_writes_and_compaction_match_reference():
+    rng = random.Random(7)
+    index, reference = BM25Index(), NaiveBM25()
+    next_id = 0
+    for _ in range(5):
+        next_id = _random_writes(rng, index, reference, next_id, rounds=6)
+        _assert_matches(index, reference)
+        index.compact()
+        _assert_matches(index, reference)
+
+
+def test_writes_during_compaction_are_replayed():
+    rng = random.Random(11)
+    index, reference = BM25Index(), NaiveBM25()
+    _random_writes(rng, index, reference, 0, rounds=10)
+    index.compact()
+    _random_writes(rng, index, reference, 1000, rounds=3)
+
+    # Delete a base document and a recent addition, replace another and
+    # add a new one while the merge is running
+    base_doc = next(doc_id for doc_id in index._base_ids if doc_id in reference.docs)
+    recent_doc = next(iter(index._docs))
+    replaced = next(doc_id for doc_id in reference.docs if doc_id not in (base_doc, recent_doc))
+    merge = BM25Index._merge
+
+    def merge_with_writes(*snapshot):
+        index.delete([base_doc, recent_doc])
+        reference.delete([base_doc, recent_doc])
+        documents = [_document(rng), _document(rng)]
+        index.add([replaced, "added-during-merge"], documents)
+        reference.add([replaced, "added-during-merge"], documents)
+        return merge(*snapshot)
+
+    index._merge = merge_with_writes
+    index.compact()
+    del index._merge
+
+    assert index._journal is None
+    assert base_doc not in index._base_rows or not index._alive[index._base_rows[base_doc]]
+    _assert_matches(index, reference)
+    index.compact()
+    _assert_matches(index, reference)
+
+
+def test_save_and_load_match_reference(tmp_path):
+    rng = random.Random(3)
+    index, reference = BM25Index(), NaiveBM25()
+    path = str(tmp_path / "lexical.npz")
+    next_id = _random_writes(rng, index, reference, 0, rounds=8)
+
+    index.save(path)
+    assert index.pending_changes == 0
+    loaded = BM25Index.load(path)
+    _assert_matches(loaded, reference)
+
+    # Writes on a loaded index, then a second save of base deletions only
+    next_id = _random_writes(rng, loaded, reference, next_id, rounds=4)
+    _assert_matches(loaded, reference)
+    loaded.save(path)
+    loaded.delete(loaded._base_ids[:5])
+    reference.delete(loaded._base_ids[:5])
+    loaded.save(path)
+    _assert_matches(BM25Index.load(path), reference)
+
+
+def test_save_keeps_deletions_made_while_saving(tmp_path):
+    rng = random.Random(5)
+    index, reference = BM25Index(), NaiveBM25()
+    path = str(tmp_path / "lexical.npz")
+    _random_writes(rng, index, reference, 0, rounds=5)
+    index.compact()
+    _random_writes(rng, index, reference, 500, rounds=2)
+
+    deleted = [doc_id for doc_id in index._base_ids if doc_id in reference.docs][:3]
+    merge = BM25Index._merge
+
+    def merge_with_delete(*snapshot):
+        index.delete(deleted)
+        reference.delete(deleted)
+        return merge(*snapshot)
+
+    index._merge = merge_with_delete
+    index.save(path)
+    del index._merge
+
+    _assert_matches(index, reference)
+    _assert_matches(BM25Index.load(path), reference)
+
+
+def test_empty_index_round_trip(tmp_path):
+    path = str(tmp_path / "lexical.npz")
+    assert BM25Index.load(path).search("deal visor", top_k=5) == []
+    index = BM25Index()
+    index.add(["a"], ["Deal Visor report"])
+    index.delete(["a"])
+    index.save(path)
+    loaded = BM25Index.load(path)
+    assert len(loaded) == 0
+    assert loaded.search("deal visor", top_k=5) == []
@@ -0,0 +1,239 @@
+"""
+Metadata partitions: a filtered search returns the full-corpus results
+that fall in the partition, on both vector stores and for lexical search,
+and partition caches never outlive a write.
+"""
+
+import asyncio
+import hashlib
+from typing import Dict, List
+
+import numpy as np
+import pytest
+
+from app.config import settings
+from app.rag.embeddings import EmbeddingProvider
+from app.rag.numpy_store import NumpyVectorStore, matches_where
+from app.rag.retriever import RAGRetriever
+from app.rag.vector_store import ChromaVectorStore, VectorStore
+
+DIM = 16
+# Spanish is most of the corpus, so the NumPy store scores its partition
+# from the full product rather than gathering its rows
+_PARTITIONS = [
+    {"language": "en"},
+    {"language": "es"},
+    {"$and": [{"language": "es"}, {"solution": "deal-visor"}]},
+    {"solution": {"$in": ["esg", "due-diligence"]}},
+]
+
+
+def _open_store(backend: str, directory: str) -> VectorStore:
+    if backend == "numpy":
+        return NumpyVectorStore("partition_test", directory)
+    return ChromaVectorStore("partition_test", directory)
+
+
+@pytest.fixture(params=["numpy", "chroma"])
+def store(request, tmp_path):
+    store = _open_store(request.param, str(tmp_path))
+    yield store
+    store.close()
+
+
+def _corpus(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    ids = [f"chunk-{i}" for i in range(n)]
+    embeddings = rng.normal(size=(n, DIM)).astype(np.float32).tolist()
+    solutions = ["deal-visor", "esg", "due-diligence"]
+    metadatas = [
+        {"language": "en" if i % 5 == 0 else "es", "solution": solutions[i % 3]}
+        for i in range(n)
+    ]
+    documents = [f"document {i}" for i in range(n)]
+    return ids, embeddings, documents, metadatas
+
+
+def _assert_same_results(found: List[Dict], expected: List[Dict]):
+    assert [r["id"] for r in found] == [r["id"] for r in expected]
+    for result, reference in zip(found, expected):
+        assert result["score"] == pytest.approx(reference["score"], abs=1e-5)
+
+
+def test_partition_results_equal_filtered_full_corpus(store):
+    ids, embeddings, documents, metadatas = _corpus(300)
+    store.add(ids, embeddings, documents, metadatas)
+    queries = np.random.default_rng(1).normal(size=(5, DIM)).astype(np.float32).tolist()
+    assert len(store.ids({"language": "es"})) * 2 > store.count()
+
+    for query in queries:
+        full = store.query(query, top_k=store.count())
+        for where in _PARTITIONS:
+            expected = [r for r in full if matches_where(r["metadata"], where)][:10]
+            _assert_same_results(store.query(query, top_k=10, where=where), expected)
+
+    # A batch mixing filters groups the queries per partition
+    wheres = [_PARTITIONS[i % len(_PARTITIONS)] for i in range(len(queries))]
+    batch = store.query_many(queries, [10] * len(queries), wheres)
+    for query, where, found in zip(queries, wheres, batch):
+        _assert_same_results(found, store.query(query, top_k=10, where=where))
+
+
+def test_partition_follows_writes(store):
+    ids, embeddings, documents, metadatas = _corpus(50)
+    store.add(ids, embeddings, documents, metadatas)
+    english = {"language": "en"}
+    query = np.random.default_rng(2).normal(size=DIM).astype(np.float32).tolist()
+    before = store.query(query, top_k=5, where=english)
+
+    # A new document identical to the query ranks first in its partition
+    store.add(["new-en"], [query], ["new"], [{"language": "en", "solution": "esg"}])
+    assert "new-en" in store.ids(english)
+    assert store.query(query, top_k=5, where=english)[0]["id"] == "new-en"
+
+    store.delete(["new-en"])
+    assert "new-en" not in store.ids(english)
+    _assert_same_results(store.query(query, top_k=5, where=english), before)
+
+    # Moving a document to another partition
+    moved = before[0]["id"]
+    store.update_metadata([moved], [{"language": "es", "solution": "esg"}])
+    assert moved not in store.ids(english)
+    assert moved in store.ids({"language": "es"})
+    assert moved not in [r["id"] for r in store.query(query, top_k=5, where=english)]
+
+
+class HashEmbeddingProvider(EmbeddingProvider):
+    """Deterministic bag-of-words vectors, so no model is needed"""
+
+    model_name = "test/hash"
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        vectors = []
+        for text in texts:
+            vector = np.zeros(DIM, dtype=np.float32)
+            for word in text.lower().split():
+                vector[hashlib.md5(word.encode()).digest()[0] % DIM] += 1.0
+            vectors.append(vector.tolist())
+        return vectors
+
+
+_TEXTS = {
+    "en": [
+        "Deal Visor report for the investors",
+        "ESG compliance report and growth",
+        "Due diligence of the market valuation",
+    ],
+    "es": [
+        "Informe de Deal Visor para los inversores",
+        "Auditoría ESG de la empresa y sus riesgos",
+        "Due diligence y valoración de empresas en el mercado",
+        "Informe de riesgos ESG del fondo",
+    ],
+}
+
+
+@pytest.fixture(params=["numpy", "chroma"])
+def retriever(request, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "lexical_index_dir", str(tmp_path / "lexical"))
+    monkeypatch.setattr(settings, "vector_db_type", request.param)
+    store = _open_store(request.param, str(tmp_path / "store"))
+    retriever = RAGRetriever(HashEmbeddingProvider(), store=store)
+    yield retriever
+    asyncio.run(retriever.close())
+
+
+def _add_corpus(retriever: RAGRetriever, copies: int = 3):
+    documents, metadatas, ids = [], [], []
+    for copy in range(copies):
+        for language, texts in _TEXTS.items():
+            for i, text in enumerate(texts):
+                documents.append(f"{text} {copy}")
+                metadatas.append({"language": language})
+                ids.append(f"{language}-{copy}-{i}")
+    assert asyncio.run(retriever.add_documents(documents, metadatas, ids))
+
+
+def test_lexical_partition_equals_filtered_full_corpus(retriever):
+    _add_corpus(retriever)
+
+    async def scenario():
+        total = retriever.store.count()
+        for query in ["deal visor report", "ESG riesgos", "due diligence valoración"]:
+            full = await retriever._lexical_search(query, total, None)
+            for where in [{"language": "en"}, {"language": "es"}]:
+                expected = [r for r in full if matches_where(r["metadata"], where)][:4]
+                found = await retriever._lexical_search(query, 4, where)
+                _assert_same_results(found, expected)
+
+    asyncio.run(scenario())
+
+
+def test_retriever_partition_cache_cleared_by_writes(retriever, monkeypatch):
+    monkeypatch.setattr(settings, "rag_partition_cache_ttl", 3600)
+    _add_corpus(retriever, copies=1)
+    english = {"language": "en"}
+
+    async def scenario():
+        assert len(await retriever._partition_ids(english)) == len(_TEXTS["en"])
+        assert await retriever.add_documents(
+            ["Deal Visor onboarding guide"], [{"language": "en"}], ["en-new"]
+        )
+        assert "en-new" in await retriever._partition_ids(english)
+        found = await retriever.search(
+            "onboarding guide", top_k=3, filter_metadata=english, mode="lexical"
+        )
+        assert found and found[0]["id"] == "en-new"
+
+        assert await retriever.delete_documents(["en-new"])
+        assert "en-new" not in await retriever._partition_ids(english)
+        found = await retriever.search(
+            "onboarding guide", top_k=3, filter_metadata=english, mode="lexical"
+        )
+        assert "en-new" not in [r["id"] for r in found]
+
+    asyncio.run(scenario())
+
+
+def test_tag_languages_updates_metadata(retriever):
+    english, spanish = _TEXTS["en"], _TEXTS["es"]
+    # Two files of several chunks and a single-chunk document, all untagged,
+    # next to one document that already has a language
+    documents = english + spanish + ["Informe anual de la empresa", "Deal Visor"]
+    metadatas = (
+        [{"file_id": "file-en", "chunk_index": i} for i in range(len(english))]
+        + [{"file_id": "file-es", "chunk_index": i} for i in range(len(spanish))]
+        + [{"doc_id": "note"}, {"language": "en"}]
+    )
+    ids = [f"chunk-{i}" for i in range(len(documents))]
+    # The short English-looking last chunk of a Spanish file takes the file's language
+    documents[len(english) + len(spanish) - 1] = "The ESG report"
+
+    async def scenario():
+        assert await retriever.add_documents(documents, metadatas, ids)
+        # Cache the partitions, which tagging must invalidate
+        assert not await retriever._partition_ids({"language": "es"})
+        assert not retriever.store.ids({"language": "es"})
+
+        await retriever.tag_languages()
+
+        stored = {doc["id"]: doc["metadata"] for doc in retriever.store.get()}
+        assert all(stored[f"chunk-{i}"]["language"] == "en" for i in range(len(english)))
+        spanish_ids = {f"chunk-{len(english) + i}" for i in range(len(spanish))}
+        assert all(stored[doc_id]["language"] == "es" for doc_id in spanish_ids)
+        assert stored[ids[-2]]["language"] == "es"
+        assert stored[ids[-1]] == {"language": "en"}
+        # Other metadata is kept
+        assert stored[f"chunk-{len(english)}"]["file_id"] == "file-es"
+
+        spanish_ids.add(ids[-2])
+        assert set(retriever.store.ids({"language": "es"})) == spanish_ids
+        assert await retriever._partition_ids({"language": "es"}) == spanish_ids
+        found = await retriever.search(
+            "informe anual", top_k=3, filter_metadata={"language": "es"}, mode="lexical"
+        )
+        assert found and found[0]["id"] == ids[-2]
+        # Nothing left to tag
+        assert retriever._tag_languages() == 0
+
+    asyncio.run(scenario())